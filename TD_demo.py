@@ -1,7 +1,6 @@
-import pandas as pd
-import json
 import streamlit as st
 import src.demo.constants as constants
+from src.utils import load_df_from_file
 from src.demo.tabs.train_tab import TrainTab
 from src.demo.tabs.predict_rt_tab import PredictRealTimeTab
 from src.demo.tabs.predict_tab import PredictTab
@@ -16,21 +15,26 @@ st.image("src/demo/logo.png", width=200)
 st.title("TimeDetect")
 st.caption("By Resolve")
 
+def find_data_file(file_name: str):
+    """
+    Finds the data file with the given name, preferring columnar formats over JSON.
+    """
+    for extension in constants.DATA_FILE_EXTENSIONS:
+        path = constants.DATA_FILE_PATH + file_name + extension
+        if os.path.exists(path):
+            return path
+    return None
+
 @st.cache_data
 def load_data():
-    train_path = constants.DATA_FILE_PATH + "train_data.json"
-    predict_path = constants.DATA_FILE_PATH + "predict_data.json"
+    train_path = find_data_file(constants.TRAIN_DATA_FILE_NAME)
+    predict_path = find_data_file(constants.PREDICT_DATA_FILE_NAME)
 
-    if not os.path.exists(train_path) or not os.path.exists(predict_path):
+    if train_path is None or predict_path is None:
         return None, None
 
-    with open(train_path, "r") as json_file:
-        train_data = json.load(json_file)
-    train_df = pd.DataFrame.from_records(train_data)
-
-    with open(predict_path, "r") as json_file:
-        test_data = json.load(json_file)
-    test_df = pd.DataFrame.from_records(test_data)
+    train_df = load_df_from_file(train_path, columns=constants.TRAIN_TAB_COLUMNS)
+    test_df = load_df_from_file(predict_path)
 
     return train_df, test_df
 
@@ -0,0 +1,95 @@
+"""
+Benchmarks preparing and serializing a prediction request body, the old way (records,
+a dict per registration, projected with a list lookup, then json.dumps) against the
+columnar way (RegistrationBatch projection fed straight to the serializer).
+
+Run from the repository root:
+    python -m benchmarks.bench_prepare_registrations --registrations 1000000
+"""
+import json
+import time
+import argparse
+import pandas as pd
+from typing import Callable, Dict, List
+
+from src.generate_data import DataGenerator
+from src.registration_batch import RegistrationBatch
+from src.demo.api.api_caller import ApiCaller
+from src.demo.api.constants import REG_FIELDS
+from src.demo.api.serialization import iter_prediction_payload
+
+DAYS = 100
+
+
+def generate_df(num_registrations: int):
+    num_employees = max(1, num_registrations // DAYS)
+    generator = DataGenerator(
+        num_employees,
+        projects=[f"project-{i}" for i in range(20)],
+        work_categories=["work", "sick", "vacation", "overtime"],
+        departments=[f"department-{i}" for i in range(10)],
+        numericals=[f"numerical-{i}" for i in range(3)],
+        seed=0,
+    )
+    dates = pd.date_range("2023-01-01", periods=DAYS).strftime("%Y-%m-%d")
+    return generator.generate_df(dates[0], dates[-1])
+
+
+def records_body(df, employee_ids: List[str]) -> bytes:
+    """
+    How the body was built before: records, projected dict by dict with a list lookup.
+    """
+    registrations = [
+        {key: val for key, val in registration.items() if key in REG_FIELDS}
+        for registration in df.to_dict("records")
+    ]
+    payload = {
+        "parameters": [
+            {
+                "datasetId": "benchmark",
+                "registrations": registrations,
+                "aggregateForEmployeeIds": employee_ids,
+            }
+        ]
+    }
+    return json.dumps(payload).encode()
+
+
+def columnar_body(api_caller: ApiCaller, df, employee_ids: List[str]) -> bytes:
+    registrations = api_caller._prepare_registrations(df)
+    return b"".join(iter_prediction_payload("benchmark", registrations, employee_ids))
+
+
+def timed(func: Callable, *args) -> Dict:
+    started = time.perf_counter()
+    result = func(*args)
+    return {"seconds": time.perf_counter() - started, "result": result}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--registrations", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    df = generate_df(args.registrations)
+    employee_ids = list(df["employeeId"].unique())
+    print(f"{len(df)} registrations")
+
+    old = timed(records_body, df, employee_ids)
+    new = timed(columnar_body, ApiCaller("benchmark"), df, employee_ids)
+    if json.loads(old["result"]) != json.loads(new["result"]):
+        print("Warning: the bodies differ")
+
+    for name, run in [("records", old), ("columnar", new)]:
+        rate = len(df) / run["seconds"]
+        print(f"{name:>10}: {run['seconds']:7.2f} s  {rate:12,.0f} registrations/s")
+    print(f"speedup: {old['seconds'] / new['seconds']:.2f}x")
+
+    batch = RegistrationBatch.from_df(df)
+    print(
+        f"RegistrationBatch: {batch.table.nbytes / len(batch):.0f} bytes/registration"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+The cases of the benchmark suite (see benchmarks/run_suite.py).
+
+Every case is set up once for a number of registrations, and then timed one iteration
+at a time. The client cases expect the environment to point src.demo.api.constants to
+a mock server before they are set up, which run_suite takes care of.
+"""
+import os
+import tempfile
+import pandas as pd
+from dataclasses import dataclass
+from typing import Callable, List
+
+from src.generate_data import DataGenerator
+from src.utils import load_data_from_file, save_data_to_file
+
+DAYS = 10
+FILE_FORMATS = ["json", "parquet", "arrow"]
+
+# Setup of a case: number of registrations -> one iteration of the case
+Setup = Callable[[int], Callable[[], None]]
+
+
+@dataclass
+class Case:
+    name: str
+    setup: Setup
+    # Number of registrations of one iteration, relative to the scale of the run
+    size_factor: float = 1.0
+    # Whether the case calls the (mock) API
+    needs_server: bool = False
+
+
+def make_generator(num_registrations: int, seed: int = 0) -> DataGenerator:
+    return DataGenerator(
+        max(1, num_registrations // DAYS),
+        projects=[f"project-{i}" for i in range(20)],
+        work_categories=["work", "sick", "vacation", "overtime"],
+        departments=[f"department-{i}" for i in range(10)],
+        numericals=[f"numerical-{i}" for i in range(3)],
+        seed=seed,
+    )
+
+
+def make_df(num_registrations: int, start_date: str = "2023-01-01") -> pd.DataFrame:
+    dates = pd.date_range(start_date, periods=DAYS).strftime("%Y-%m-%d")
+    return make_generator(num_registrations).generate_df(dates[0], dates[-1])
+
+
+def generate_data(num_registrations: int) -> Callable[[], None]:
+    generator = make_generator(num_registrations)
+    return lambda: generator.generate_data(
+        "2023-01-01", f"2023-01-{DAYS:02d}", vectorized=True
+    )
+
+
+def file_round_trip(file_format: str) -> Setup:
+    def setup(num_registrations: int) -> Callable[[], None]:
+        registrations = make_df(num_registrations).to_dict("records")
+        file_path = os.path.join(tempfile.mkdtemp(), f"registrations.{file_format}")
+
+        def run() -> None:
+            save_data_to_file(registrations, file_path)
+            load_data_from_file(file_path)
+
+        return run
+
+    return setup
+
+
+def prepare_registrations(num_registrations: int) -> Callable[[], None]:
+    from src.demo.api.api_caller import ApiCaller
+    from src.demo.api.serialization import iter_prediction_payload
+
+    api_caller = ApiCaller("benchmark")
+    df = make_df(num_registrations)
+    employee_ids = list(df["employeeId"].unique())
+
+    def run() -> None:
+        registrations = api_caller._prepare_registrations(df)
+        for _ in iter_prediction_payload("benchmark", registrations, employee_ids):
+            pass
+
+    return run
+
+
+def _client(dataset_id: str):
+    from src.demo.client_simulator.client_simulator import ClientSimulator
+    from src.demo.client_simulator.job_waiter import JobWaiter
+
+    job_waiter = JobWaiter(initial_delay=0.001, max_interval=0.01, jitter=0)
+    return ClientSimulator("benchmark", dataset_id, job_waiter=job_waiter)
+
+
+def client_upload(num_registrations: int) -> Callable[[], None]:
+    client = _client("upload")
+    df = make_df(num_registrations)
+    return lambda: client.upload_data(df)
+
+
+def client_predict(num_registrations: int) -> Callable[[], None]:
+    client = _client("predict")
+    df = make_df(num_registrations)
+    return lambda: client.predict(df)
+
+
+def client_predict_to_file(num_registrations: int) -> Callable[[], None]:
+    client = _client("predict_to_file")
+    df = make_df(num_registrations)
+    file_path = os.path.join(tempfile.mkdtemp(), "predictions.parquet")
+    return lambda: client.predict_to_file(df, file_path)
+
+
+def client_stream(num_registrations: int) -> Callable[[], None]:
+    client = _client("stream")
+    df = make_df(num_registrations)
+    return lambda: client.stream_and_predict_day_by_day(df)
+
+
+def table_prepare_data(num_registrations: int) -> Callable[[], None]:
+    from src.demo.components.table import Table
+
+    table = Table.__new__(Table)
+    df = make_df(num_registrations)
+    # _prepare_data replaces the numericals column, so every run gets its own
+    # (shallow) copy of the data
+    return lambda: table._prepare_data(df.copy(deep=False))
+
+
+CASES: List[Case] = [
+    Case("generate_data_1%", generate_data, size_factor=0.01),
+    Case("generate_data_10%", generate_data, size_factor=0.1),
+    Case("generate_data", generate_data),
+    *[
+        Case(f"file_round_trip_{file_format}", file_round_trip(file_format))
+        for file_format in FILE_FORMATS
+    ],
+    Case("prepare_registrations", prepare_registrations),
+    Case("client_upload", client_upload, needs_server=True),
+    Case("client_predict", client_predict, needs_server=True),
+    Case("client_predict_to_file", client_predict_to_file, needs_server=True),
+    Case("client_stream", client_stream, needs_server=True),
+    Case("table_prepare_data", table_prepare_data),
+]
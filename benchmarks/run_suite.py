@@ -0,0 +1,308 @@
+"""
+Benchmark suite of the data pipeline and the client: data generation, file round
+trips, registration preparation and serialization, the ClientSimulator upload, predict
+(into a DataFrame or a file) and stream flows against a local mock server, and
+Table._prepare_data.
+
+Every case runs in its own process, so that its peak RSS is its own. The client cases
+run against a MockTimeDetectServer in a separate process. For every case the suite
+reports the throughput in registrations per second, the p50 and p99 latency of one
+iteration, and the peak RSS of the process, after the setup and overall.
+
+Run from the repository root:
+    python -m benchmarks.run_suite --scale small
+    python -m benchmarks.run_suite --scale small --save-baseline small
+    python -m benchmarks.run_suite --scale small --compare small --threshold 0.2
+
+Baselines are saved to benchmarks/baselines/{name}.json, which is not committed: they
+are only comparable on the same machine. The first --compare run on a machine saves
+its results as the baseline. Afterwards, the exit code is 1 if any metric regressed by
+more than the threshold. Failed cases are left out of baselines.
+"""
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+import numpy as np
+from contextlib import redirect_stdout
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from benchmarks.cases import CASES, Case
+
+# Number of registrations of the cases at each scale
+SCALES = {"small": 10_000, "medium": 100_000, "large": 1_000_000}
+
+BASELINES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+
+# Metrics compared against the baseline, and whether higher values are better
+COMPARED_METRICS = {
+    "throughput": True,
+    "p50_ms": False,
+    "p99_ms": False,
+    "peak_rss_mb": False,
+}
+
+# Seconds to wait for a case, or for the mock server to start
+CASE_TIMEOUT = 3600
+SERVER_START_TIMEOUT = 30
+
+
+def max_rss_mb() -> Optional[float]:
+    """
+    Peak resident set size of this process so far, in MB.
+    """
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return max_rss / (1024**2 if sys.platform == "darwin" else 1024)
+
+
+def measure(case: Case, num_registrations: int, repeat: int, warmup: int) -> Dict:
+    """
+    Sets the case up and times its iterations, in this process.
+    """
+    # The client and the pipeline print progress, which would distort the timings
+    with redirect_stdout(io.StringIO()):
+        run = case.setup(num_registrations)
+        setup_rss_mb = max_rss_mb()
+        for _ in range(warmup):
+            run()
+        seconds = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            seconds.append(time.perf_counter() - start)
+    return {
+        "registrations": num_registrations,
+        "iterations": repeat,
+        "throughput": num_registrations * repeat / sum(seconds),
+        "p50_ms": float(np.percentile(seconds, 50)) * 1000,
+        "p99_ms": float(np.percentile(seconds, 99)) * 1000,
+        "setup_rss_mb": setup_rss_mb,
+        "peak_rss_mb": max_rss_mb(),
+    }
+
+
+def run_case(
+    case: Case, scale: int, repeat: int, warmup: int, env: Dict[str, str] = None
+) -> Dict:
+    """
+    Runs the case in a new process. Returns its results, or the reason it failed.
+    """
+    num_registrations = max(1, int(scale * case.size_factor))
+    command = [
+        sys.executable,
+        "-m",
+        "benchmarks.run_suite",
+        "--worker",
+        case.name,
+        "--registrations",
+        str(num_registrations),
+        "--repeat",
+        str(repeat),
+        "--warmup",
+        str(warmup),
+    ]
+    try:
+        process = subprocess.run(
+            command,
+            capture_output=True,
+            text=True,
+            timeout=CASE_TIMEOUT,
+            env={**os.environ, **(env or {})},
+        )
+    except subprocess.TimeoutExpired:
+        return {"error": f"timed out after {CASE_TIMEOUT} s"}
+    if process.returncode != 0:
+        lines = process.stderr.strip().splitlines()
+        return {"error": lines[-1] if lines else f"exit code {process.returncode}"}
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def start_mock_server() -> Tuple[subprocess.Popen, Dict[str, str]]:
+    """
+    Starts a MockTimeDetectServer on a free port in a new process.
+    Returns the process, and the environment that points the client to it.
+    """
+    server = subprocess.Popen(
+        [sys.executable, "-u", "-m", "src.demo.api.mock_server", "--port", "0"],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    env = {}
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    # The server prints one "export KEY=value" line per environment variable
+    while len(env) < 3 and time.monotonic() < deadline:
+        line = server.stdout.readline()
+        if not line:
+            break
+        key, value = line.strip().split(" ", 1)[1].split("=", 1)
+        env[key] = value
+    if len(env) < 3:
+        server.kill()
+        raise RuntimeError("The mock server did not start")
+    return server, env
+
+
+def run_suite(
+    cases: List[Case], scale: int, repeat: int, warmup: int
+) -> Dict[str, Dict]:
+    server, env = None, {}
+    if any(case.needs_server for case in cases):
+        server, env = start_mock_server()
+    results = {}
+    try:
+        for case in cases:
+            print(f"Running {case.name}", file=sys.stderr)
+            results[case.name] = run_case(case, scale, repeat, warmup, env)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+    return results
+
+
+def print_results(results: Dict[str, Dict]) -> None:
+    print(
+        f"{'case':<26} {'registrations':>13} {'regs/s':>12} {'p50 ms':>10} "
+        f"{'p99 ms':>10} {'setup MB':>9} {'peak MB':>9}"
+    )
+    for name, result in results.items():
+        if "error" in result:
+            print(f"{name:<26} failed: {result['error']}")
+            continue
+        print(
+            f"{name:<26} {result['registrations']:>13,} {result['throughput']:>12,.0f} "
+            f"{result['p50_ms']:>10.1f} {result['p99_ms']:>10.1f} "
+            f"{_format_mb(result['setup_rss_mb']):>9} "
+            f"{_format_mb(result['peak_rss_mb']):>9}"
+        )
+
+
+def compare(
+    results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float
+) -> List[str]:
+    """
+    Prints the change of every metric against the baseline, and returns the
+    regressions: metrics that got worse by more than threshold (a fraction).
+    """
+    regressions = []
+    print(f"\n{'case':<26} {'metric':<12} {'baseline':>12} {'now':>12} {'change':>8}")
+    for name, result in results.items():
+        old = baseline.get(name)
+        if old is None or "error" in old or "error" in result:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            if not old.get(metric) or result.get(metric) is None:
+                continue
+            change = result[metric] / old[metric] - 1
+            worse = -change if higher_is_better else change
+            flag = ""
+            if worse > threshold:
+                flag = "REGRESSION"
+                regressions.append(f"{name} {metric} {change:+.1%}")
+            print(
+                f"{name:<26} {metric:<12} {old[metric]:>12,.1f} "
+                f"{result[metric]:>12,.1f} {change:>+8.1%} {flag}"
+            )
+    return regressions
+
+
+def baseline_path(name: str) -> str:
+    if name.endswith(".json"):
+        return name
+    return os.path.join(BASELINES_DIR, f"{name}.json")
+
+
+def save_baseline(name: str, scale: str, results: Dict[str, Dict]) -> None:
+    path = baseline_path(name)
+    failed = [case for case, result in results.items() if "error" in result]
+    if failed:
+        print(f"\nLeaving the failed cases out of the baseline: {', '.join(failed)}")
+        results = {
+            case: result for case, result in results.items() if "error" not in result
+        }
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    baseline = {
+        "scale": scale,
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPUs",
+        "results": results,
+    }
+    with open(path, "w") as f:
+        json.dump(baseline, f, indent=4)
+    print(f"\nSaved the baseline to {path}")
+
+
+def load_baseline(name: str, scale: str) -> Dict[str, Dict]:
+    with open(baseline_path(name), "r") as f:
+        baseline = json.load(f)
+    if baseline["scale"] != scale:
+        print(
+            f"Warning: the baseline was measured at scale {baseline['scale']}, "
+            f"not {scale}"
+        )
+    return baseline["results"]
+
+
+def _format_mb(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:,.0f}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale", choices=list(SCALES), default="small")
+    parser.add_argument("--cases", nargs="*", help="names of the cases to run")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--save-baseline", metavar="NAME")
+    parser.add_argument("--compare", metavar="NAME")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--registrations", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    cases = {case.name: case for case in CASES}
+    if args.worker is not None:
+        result = measure(
+            cases[args.worker], args.registrations, args.repeat, args.warmup
+        )
+        print(json.dumps(result))
+        return
+
+    unknown = set(args.cases or []).difference(cases)
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(sorted(unknown))}")
+    selected = [cases[name] for name in args.cases] if args.cases else CASES
+    results = run_suite(selected, SCALES[args.scale], args.repeat, args.warmup)
+    print_results(results)
+    if args.save_baseline is not None:
+        save_baseline(args.save_baseline, args.scale, results)
+    if args.compare is not None:
+        if not os.path.exists(baseline_path(args.compare)):
+            print(f"\nNo baseline {args.compare} yet on this machine")
+            save_baseline(args.compare, args.scale, results)
+            return
+        regressions = compare(
+            results, load_baseline(args.compare, args.scale), args.threshold
+        )
+        if regressions:
+            print(f"\n{len(regressions)} regressions beyond {args.threshold:.0%}:")
+            for regression in regressions:
+                print(" ", regression)
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,77 +1,564 @@
 import json
+import time
+import threading
 import requests
 import boto3
-from typing import List, Dict
+import pandas as pd
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Iterable, Iterator, List, Dict, Optional, Tuple, Union
 
+from src.utils import batched, save_batches_to_file
+from src.registration_batch import RegistrationBatch
+from src.demo.api.session import create_session
+from src.demo.api.rate_limiter import RateLimiter
+from src.demo.api.compression import ACCEPT_ENCODING, check_encoding, compress
+from src.demo.api.serialization import (
+    SpooledBody,
+    iter_array_items,
+    iter_prediction_payload,
+    iter_upload_payload,
+)
 from src.demo.api.token_handler import TokenHandler
+from src.demo.api.errors import (
+    MAX_BODY_LENGTH,
+    ApiError,
+    InvalidResponseError,
+    RateLimitedError,
+    TimeDetectError,
+    TransportError,
+    error_for_exception,
+    error_for_response,
+)
+from src.demo.api.resilience import (
+    CircuitBreakers,
+    RetryPolicy,
+    default_circuit_breakers,
+)
+from src.demo.api.instrumentation import (
+    NULL_INSTRUMENTATION,
+    SUCCESS,
+    ERROR,
+    EXCEPTION,
+    Instrumentation,
+    RequestRecord,
+)
 from src.demo.api.constants import (
     BASE_URL,
     REG_FIELDS,
     MODEL_BUCKET,
+    MODEL_STORE_URL,
+    VISMA_CONNECT_TOKEN_URL,
     VISMA_CONNECT_CLIENT_ID,
+    POOL_CONNECTIONS,
+    POOL_MAXSIZE,
+    REQUEST_TIMEOUT,
+    UPLOAD_BATCH_SIZE,
+    UPLOAD_MAX_WORKERS,
+    REQUEST_COMPRESSION,
+    COMPRESSION_LEVEL,
+    RESULTS_BATCH_SIZE,
+    RESULTS_CHUNK_SIZE,
+    JOB_LABELS_MAX,
 )
 
+_REG_FIELDS = set(REG_FIELDS)
+
 class ApiCaller:
     """
     Class for handling logic related to calling the Time Detect API.
     """
 
-    def __init__(self, tenant_id: str) -> None:
+    def __init__(
+        self,
+        tenant_id: str,
+        session: requests.Session = None,
+        pool_connections: int = POOL_CONNECTIONS,
+        pool_maxsize: int = POOL_MAXSIZE,
+        timeout=REQUEST_TIMEOUT,
+        compression: str = REQUEST_COMPRESSION,
+        compression_level: int = COMPRESSION_LEVEL,
+        rate_limiter: RateLimiter = None,
+        base_url: str = BASE_URL,
+        token_url: str = VISMA_CONNECT_TOKEN_URL,
+        instrumentation: Instrumentation = None,
+        retry_policy: RetryPolicy = None,
+        circuit_breakers: CircuitBreakers = None,
+    ) -> None:
+        """
+        Pass a session from create_session to share one connection pool between several
+        ApiCallers, and base_url and token_url to use another server, e.g. a mock one.
+        Requests that fail for good after the retry_policy raise a TimeDetectError.
+        """
+        if compression is not None:
+            check_encoding(compression)
         self.tenant_id = tenant_id
-        self.token_handler = TokenHandler()
+        self.base_url = base_url
+        self._owns_session = session is None
+        self.session: requests.Session = session or create_session(
+            pool_connections=pool_connections, pool_maxsize=pool_maxsize
+        )
+        self.timeout = timeout
+        self.token_handler = TokenHandler(
+            session=self.session, timeout=timeout, token_url=token_url
+        )
         self.current_job_id: str = None
+        self.compression = compression
+        self.compression_level = compression_level
+        self.rate_limiter = rate_limiter
+        self.instrumentation = instrumentation or NULL_INSTRUMENTATION
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breakers = circuit_breakers or default_circuit_breakers()
+        self.transfer_stats: Dict[str, Dict[str, int]] = {}
+        self._stats_lock = threading.Lock()
+        # Dataset label of the jobs started here, for the status and results requests
+        self._job_datasets: "OrderedDict[str, str]" = OrderedDict()
+
+    def close(self) -> None:
+        """
+        Closes the connection pool, unless it was shared with the ApiCaller.
+        """
+        if self._owns_session:
+            self.session.close()
 
-    def _prepare_registrations(self, registrations: List[Dict]) -> List[Dict]:
+    def _prepare_registrations(
+        self, registrations: Union[pd.DataFrame, RegistrationBatch, Iterable[Dict]]
+    ) -> Union[RegistrationBatch, List[Dict]]:
         """
         Prepare registrations for upload to Time Detect API.
+        DataFrames and RegistrationBatches are projected by selecting columns, and
+        their types are checked against DATA_TYPES column by column, without building
+        a dict per registration. Other registrations are projected dict by dict.
         """
+        if isinstance(registrations, pd.DataFrame):
+            registrations = RegistrationBatch.from_df(registrations)
+        if isinstance(registrations, RegistrationBatch):
+            return registrations.select(REG_FIELDS)
         registrations = [
-            {key: val for key, val in registration.items() if key in REG_FIELDS}
+            {key: val for key, val in registration.items() if key in _REG_FIELDS}
             for registration in registrations
         ]
         return registrations
 
+    def _json_body(self, chunks: Iterable[bytes], headers: Dict) -> Tuple[bytes, int]:
+        """
+        Joins the serialized chunks of a payload, and compresses the body if
+        compression is enabled. Returns the body and its size before compression.
+        """
+        body = b"".join(chunks)
+        if self.compression is None:
+            return body, len(body)
+        headers["Content-Encoding"] = self.compression
+        return compress(body, self.compression, self.compression_level), len(body)
+
+    def _send(
+        self,
+        endpoint: str,
+        method: str,
+        url: str,
+        headers: Dict = None,
+        data=None,
+        raw_size: int = None,
+        dataset_id: str = None,
+        serialization_time: float = 0.0,
+    ) -> requests.Response:
+        """
+        Sends a request, retried as the retry policy allows, and returns the successful
+        response, or raises a TimeDetectError. raw_size is the body size before
+        compression.
+        """
+        response, _ = self._request(
+            endpoint,
+            method,
+            url,
+            headers,
+            data,
+            raw_size,
+            dataset_id,
+            serialization_time,
+        )
+        return response
+
+    def _stream(
+        self,
+        endpoint: str,
+        method: str,
+        url: str,
+        headers: Dict = None,
+        dataset_id: str = None,
+        chunk_size: int = RESULTS_CHUNK_SIZE,
+    ) -> Iterator[bytes]:
+        """
+        Like _send, but yields the (decompressed) body of the successful response
+        chunk by chunk as it is received, instead of reading it into memory. Only
+        failures before the body are retried; a connection that breaks while the body
+        is read raises a TransportError. The request is recorded once the body has been
+        read, or the iteration stopped.
+        """
+        response, record = self._request(
+            endpoint, method, url, headers, dataset_id=dataset_id, stream=True
+        )
+        instrumented = self.instrumentation.enabled
+        chunks = response.iter_content(chunk_size)
+        try:
+            while True:
+                start = time.perf_counter() if instrumented else 0.0
+                chunk = next(chunks, None)
+                if instrumented:
+                    record.network_time += time.perf_counter() - start
+                if chunk is None:
+                    return
+                record.response_bytes += len(chunk)
+                yield chunk
+        except requests.RequestException as e:
+            record.outcome = EXCEPTION
+            record.error = type(e).__name__
+            raise error_for_exception(endpoint, e) from e
+        finally:
+            record.response_wire_bytes = _wire_bytes(response, record.response_bytes)
+            response.close()
+            self._record_request(record)
+
+    def _request(
+        self,
+        endpoint: str,
+        method: str,
+        url: str,
+        headers: Dict = None,
+        data=None,
+        raw_size: int = None,
+        dataset_id: str = None,
+        serialization_time: float = 0.0,
+        stream: bool = False,
+    ) -> Tuple[requests.Response, RequestRecord]:
+        """
+        The retry loop of _send and _stream. Returns the successful response and its
+        record, see _send_once.
+        """
+        circuit_breaker = self.circuit_breakers.for_url(url)
+        retries = 0
+        while True:
+            circuit_breaker.before_request()
+            try:
+                response, record = self._send_once(
+                    endpoint,
+                    method,
+                    url,
+                    headers,
+                    data,
+                    raw_size,
+                    dataset_id,
+                    serialization_time,
+                    retries,
+                    stream,
+                )
+                error = None if response.ok else error_for_response(endpoint, response)
+            except TransportError as e:
+                error = e
+            if error is None:
+                circuit_breaker.record_success()
+                return response, record
+            circuit_breaker.record_failure(error)
+            if not self.retry_policy.should_retry(endpoint, error, retries):
+                raise error
+            delay = self.retry_policy.delay(retries, error)
+            if isinstance(error, RateLimitedError) and self.rate_limiter is not None:
+                # Hold back every caller sharing the rate limiter, not just this one
+                self.rate_limiter.pause(delay)
+            print(f"Retrying in {delay:.1f} s:", error)
+            time.sleep(delay)
+            retries += 1
+
+    def _send_once(
+        self,
+        endpoint: str,
+        method: str,
+        url: str,
+        headers: Dict = None,
+        data=None,
+        raw_size: int = None,
+        dataset_id: str = None,
+        serialization_time: float = 0.0,
+        attempt: int = 0,
+        stream: bool = False,
+    ) -> Tuple[requests.Response, RequestRecord]:
+        """
+        Sends a request once, and returns its response whatever the status code, with
+        its record. With stream, the caller reads the body and records the request.
+        """
+        headers = dict(headers or {})
+        headers.setdefault("Accept-Encoding", ACCEPT_ENCODING)
+        if self.rate_limiter is not None and endpoint != "upload":
+            self.rate_limiter.acquire()
+        if hasattr(data, "rewind"):
+            data.rewind()
+        request_wire_bytes = len(data) if data is not None else 0
+        request_bytes = raw_size if raw_size is not None else request_wire_bytes
+        instrumented = self.instrumentation.enabled
+        start = time.perf_counter() if instrumented else 0.0
+        try:
+            response = self.session.request(
+                method,
+                url,
+                headers=headers,
+                data=data,
+                timeout=self.timeout,
+                stream=stream,
+            )
+        except requests.RequestException as e:
+            if instrumented:
+                self.instrumentation.record_request(
+                    RequestRecord(
+                        endpoint,
+                        method,
+                        self.tenant_id,
+                        dataset_id,
+                        status_code=None,
+                        outcome=EXCEPTION,
+                        request_bytes=request_bytes,
+                        request_wire_bytes=request_wire_bytes,
+                        serialization_time=serialization_time,
+                        network_time=time.perf_counter() - start,
+                        attempt=attempt,
+                        error=type(e).__name__,
+                    )
+                )
+            raise error_for_exception(endpoint, e) from e
+        record = RequestRecord(
+            endpoint,
+            method,
+            self.tenant_id,
+            dataset_id,
+            status_code=response.status_code,
+            outcome=SUCCESS if response.ok else ERROR,
+            request_bytes=request_bytes,
+            request_wire_bytes=request_wire_bytes,
+            serialization_time=serialization_time,
+            network_time=time.perf_counter() - start if instrumented else 0.0,
+            attempt=attempt,
+        )
+        if stream and response.ok:
+            return response, record
+        record.response_bytes = len(response.content)
+        record.response_wire_bytes = _wire_bytes(response, record.response_bytes)
+        self._record_request(record)
+        return response, record
+
+    def _record_request(self, record: RequestRecord) -> None:
+        self._record_transfer(
+            record.endpoint,
+            request_bytes=record.request_bytes,
+            request_wire_bytes=record.request_wire_bytes,
+            response_bytes=record.response_bytes,
+            response_wire_bytes=record.response_wire_bytes,
+        )
+        if self.instrumentation.enabled:
+            self.instrumentation.record_request(record)
+
+    def _record_transfer(self, endpoint: str, **byte_counts: int) -> None:
+        with self._stats_lock:
+            stats = self.transfer_stats.setdefault(
+                endpoint,
+                {
+                    "calls": 0,
+                    "request_bytes": 0,
+                    "request_wire_bytes": 0,
+                    "response_bytes": 0,
+                    "response_wire_bytes": 0,
+                },
+            )
+            stats["calls"] += 1
+            for key, value in byte_counts.items():
+                stats[key] += value
+
     def health_check(self) -> int:
-        url: str = f"{BASE_URL}/health_check"
-        response = requests.get(url)
+        url: str = f"{self.base_url}/health_check"
+        try:
+            response = self._send("health_check", "GET", url)
+        except ApiError as e:
+            return e.status_code
         return response.status_code
 
-    def get_job_status(self, print_status=True) -> Dict:
-        if self.current_job_id is None:
+    def get_job_status(self, print_status=True, job_id: str = None) -> Dict:
+        """
+        Gets the status of the given job, or of the current job if no job id is given.
+        """
+        job_id = job_id or self.current_job_id
+        if job_id is None:
             print("No job id found")
             return
-        url: str = f"{BASE_URL}/status"
+        url: str = f"{self.base_url}/status"
         token: str = self.token_handler.get_token()
         headers = {
             "tenantId": self.tenant_id,
             "Authorization": f"Bearer {token}",
-            "jobId": self.current_job_id,
+            "jobId": job_id,
         }
-        response = requests.get(url, headers=headers)
+        response = self._send(
+            "status", "GET", url, headers, dataset_id=self._job_dataset(job_id)
+        )
 
-        result: Dict = json.loads(response.text)
+        result: Dict = _parse_json("status", response)
         if print_status:
             print(result)
         return result
 
-    def upload_data(self, dataset_ids: List[str], registrations: List[Dict]) -> None:
-        url: str = self._get_presigned_url()
-        registrations = self._prepare_registrations(registrations)
-        payload = {
-            "datasets": [
-                {"datasetId": ds, "registrations": registrations} for ds in dataset_ids
-            ]
-        }
-        response = requests.put(url, data=json.dumps(payload))
+    def upload_data(
+        self,
+        dataset_ids: Union[str, List[str]],
+        registrations: Union[pd.DataFrame, RegistrationBatch, Iterable[Dict]],
+    ) -> str:
+        """
+        Uploads the registrations to each of the given datasets, and returns the job id.
+        The job id only becomes the current job id once the upload has succeeded.
+        """
+        if isinstance(dataset_ids, str):
+            dataset_ids = [dataset_ids]
+        registrations = _from_df(registrations)
+        self.current_job_id = None
+        url, job_id = self._request_presigned_url(dataset_ids)
+        self._put_registrations(url, dataset_ids, registrations)
+        self.current_job_id = job_id
+        print("Raw data uploaded successfully")
+        return job_id
 
-        if response.status_code == 200:
-            print("Raw data uploaded successfully")
-        else:
-            print("Something went wrong when uploading data")
+    def upload_data_in_batches(
+        self,
+        dataset_ids: Union[str, List[str]],
+        registrations: Union[pd.DataFrame, RegistrationBatch, Iterable[Dict]],
+        batch_size: int = UPLOAD_BATCH_SIZE,
+        max_workers: int = UPLOAD_MAX_WORKERS,
+    ) -> List[Optional[str]]:
+        """
+        Splits the registrations into batches of at most batch_size registrations, and
+        uploads every batch to its own presigned url, max_workers batches at a time.
+        The registrations can be any iterable (e.g. a generator), and at most two batches
+        per worker are held in memory at once. A RegistrationBatch is split into
+        zero-copy slices.
+        Returns the job ids of the batches in order, with None for batches that failed.
+        """
+        if isinstance(dataset_ids, str):
+            dataset_ids = [dataset_ids]
+        registrations = _from_df(registrations)
+        job_id_by_batch: Dict[int, Optional[str]] = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = {}
+            if isinstance(registrations, RegistrationBatch):
+                batches = registrations.batches(batch_size)
+            else:
+                batches = batched(registrations, batch_size)
+            for batch_index, batch in enumerate(batches):
+                if len(pending) >= 2 * max_workers:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        job_id_by_batch[pending.pop(future)] = future.result()
+                future = executor.submit(self._upload_batch, dataset_ids, batch)
+                pending[future] = batch_index
+            for future, batch_index in pending.items():
+                job_id_by_batch[batch_index] = future.result()
+
+        job_ids = [job_id_by_batch[i] for i in range(len(job_id_by_batch))]
+        failed = sum(1 for job_id in job_ids if job_id is None)
+        print(f"Uploaded {len(job_ids) - failed} of {len(job_ids)} batches")
+        return job_ids
+
+    def _upload_batch(
+        self, dataset_ids: List[str], registrations: List[Dict]
+    ) -> Optional[str]:
+        """
+        Uploads one batch to a fresh presigned url. Its requests are retried by _send.
+        """
+        try:
+            url, job_id = self._request_presigned_url(dataset_ids)
+            self._put_registrations(url, dataset_ids, registrations)
+            return job_id
+        except TimeDetectError as e:
+            print("Something went wrong when uploading batch:", e)
+            return None
+
+    def prepare_upload(
+        self,
+        dataset_ids: Union[str, List[str]],
+        registrations: Union[pd.DataFrame, RegistrationBatch, Iterable[Dict]],
+    ) -> SpooledBody:
+        """
+        Serializes (and compresses) an upload body without sending it, so that the
+        work can be done ahead of time, e.g. while the previous upload is training.
+        Send it with upload_prepared.
+        """
+        if isinstance(dataset_ids, str):
+            dataset_ids = [dataset_ids]
+        return SpooledBody(
+            iter_upload_payload(dataset_ids, _from_df(registrations)),
+            compression=self.compression,
+            compression_level=self.compression_level,
+        )
+
+    def upload_prepared(
+        self, body: SpooledBody, dataset_ids: Union[str, List[str]] = None
+    ) -> Optional[str]:
+        """
+        Uploads a body made by prepare_upload to a new presigned url, and returns the
+        job id, or None if the upload failed. The body is closed afterwards.
+        dataset_ids are only used to label the request for the instrumentation.
+        """
+        try:
+            url, job_id = self._request_presigned_url(dataset_ids)
+            self._put_body(url, body, dataset_ids)
+            return job_id
+        except TimeDetectError as e:
+            print("Something went wrong when uploading data:", e)
+            return None
+        finally:
+            body.close()
 
-    def start_trainer(self, dataset_ids: List[str], rebuild_models: bool = True):
+    def _put_registrations(
+        self,
+        url: str,
+        dataset_ids: List[str],
+        registrations: Iterable[Dict],
+    ) -> None:
+        """
+        Streams the registrations into the upload body chunk by chunk, so the whole
+        payload is never built as one string. Raises a TimeDetectError if the upload
+        fails.
+        """
+        body = self.prepare_upload(dataset_ids, registrations)
+        try:
+            self._put_body(url, body, dataset_ids)
+        finally:
+            body.close()
+
+    def _put_body(
+        self,
+        url: str,
+        body: SpooledBody,
+        dataset_ids: Union[str, List[str]] = None,
+    ) -> None:
+        headers = {}
+        if body.compression is not None:
+            headers["Content-Encoding"] = body.compression
+        self._send(
+            "upload",
+            "PUT",
+            url,
+            headers,
+            data=body,
+            raw_size=body.raw_length,
+            dataset_id=_dataset_label(dataset_ids),
+            serialization_time=body.serialization_time,
+        )
+
+    def start_trainer(
+        self, dataset_ids: Union[str, List[str]], rebuild_models: bool = True
+    ) -> str:
+        """
+        Starts training on the given datasets, and returns the job id.
+        """
+        if isinstance(dataset_ids, str):
+            dataset_ids = [dataset_ids]
         self.current_job_id = None
-        url: str = f"{BASE_URL}/start_trainer"
+        url: str = f"{self.base_url}/start_trainer"
         token: str = self.token_handler.get_token()
         headers = {
             "tenantId": self.tenant_id,
@@ -83,63 +570,114 @@ class ApiCaller:
                 {"datasetId": ds, "rebuildModels": rebuild_models} for ds in dataset_ids
             ]
         }
-        response = requests.post(url, headers=headers, data=json.dumps(payload))
+        response = self._send(
+            "start_trainer",
+            "POST",
+            url,
+            headers,
+            data=json.dumps(payload).encode(),
+            dataset_id=_dataset_label(dataset_ids),
+        )
 
-        if response.status_code == 202:
-            result: Dict = json.loads(response.text)
-            self.current_job_id = result["jobId"]
-            print("Trainer started successfully")
-        else:
-            print("Something went wrong when starting trainer")
+        result: Dict = _parse_json("start_trainer", response)
+        job_id = result["jobId"]
+        self._remember_job(job_id, dataset_ids)
+        self.current_job_id = job_id
+        print("Trainer started successfully")
+        return job_id
 
     def create_predictions(
         self, dataset_id: str, registrations: List[Dict], employee_ids: List[str]
-    ) -> None:
+    ) -> str:
+        """
+        Starts a prediction job on the given registrations, and returns the job id.
+        """
         self.current_job_id = None
-        url: str = f"{BASE_URL}/create_prediction"
+        url: str = f"{self.base_url}/create_prediction"
         token: str = self.token_handler.get_token()
+        start = time.perf_counter()
         registrations = self._prepare_registrations(registrations)
         headers = {
             "tenantId": self.tenant_id,
             "Authorization": f"Bearer {token}",
             "Content-Type": "application/json",
         }
-        payload = {
-            "parameters": [
-                {
-                    "datasetId": dataset_id,
-                    "registrations": registrations,
-                    "aggregateForEmployeeIds": employee_ids,
-                }
-            ]
-        }
-        response = requests.post(url, headers=headers, data=json.dumps(payload))
+        body, raw_size = self._json_body(
+            iter_prediction_payload(dataset_id, registrations, employee_ids), headers
+        )
+        response = self._send(
+            "create_prediction",
+            "POST",
+            url,
+            headers,
+            data=body,
+            raw_size=raw_size,
+            dataset_id=dataset_id,
+            serialization_time=time.perf_counter() - start,
+        )
+
+        result: Dict = _parse_json("create_prediction", response)
+        job_id = result["jobId"]
+        self._remember_job(job_id, dataset_id)
+        self.current_job_id = job_id
+        print("Prediction job started successfully")
+        return job_id
+
+    def get_results(self, job_id: str = None):
+        job_id = job_id or self.current_job_id
+        url: str = f"{self.base_url}/results"
+        headers = self._results_headers(job_id)
+        response = self._send(
+            "results", "GET", url, headers, dataset_id=self._job_dataset(job_id)
+        )
+        return _parse_json("results", response)
+
+    def iter_results(
+        self, job_id: str = None, batch_size: int = RESULTS_BATCH_SIZE
+    ) -> Iterator[List[Dict]]:
+        """
+        Yields the predictions of a prediction job in lists of at most batch_size,
+        parsed off the connection as the response arrives. Failures raise a
+        TimeDetectError, also halfway through.
+        """
+        # The job is fixed now, even if the current job changes before the iteration
+        return self._iter_results(job_id or self.current_job_id, batch_size)
+
+    def _iter_results(self, job_id: str, batch_size: int) -> Iterator[List[Dict]]:
+        url: str = f"{self.base_url}/results"
+        headers = self._results_headers(job_id)
+        body = self._stream(
+            "results", "GET", url, headers, dataset_id=self._job_dataset(job_id)
+        )
+        try:
+            yield from batched(iter_array_items(body, "predictions"), batch_size)
+        except ValueError as e:
+            raise InvalidResponseError(
+                f"the response is not valid JSON: {e}", endpoint="results"
+            )
+        finally:
+            body.close()
 
-        if response.status_code == 202:
-            result: Dict = json.loads(response.text)
-            self.current_job_id = result["jobId"]
-            print("Prediction job started successfully")
-        else:
-            print("Something went wrong when creating predictions")
+    def save_results(
+        self, file_path: str, job_id: str = None, batch_size: int = RESULTS_BATCH_SIZE
+    ) -> int:
+        """
+        Streams the predictions of a prediction job to a Parquet, Arrow or JSON file
+        (by extension) batch by batch, see iter_results and save_batches_to_file.
+        Returns the number of predictions written.
+        """
+        return save_batches_to_file(self.iter_results(job_id, batch_size), file_path)
 
-    def get_results(self):
-        url: str = f"{BASE_URL}/results"
+    def _results_headers(self, job_id: str = None) -> Dict:
         token: str = self.token_handler.get_token()
-        headers = {
+        return {
             "tenantId": self.tenant_id,
             "Authorization": f"Bearer {token}",
-            "jobId": self.current_job_id,
+            "jobId": job_id or self.current_job_id,
         }
-        response = requests.get(url, headers=headers)
-
-        if response.status_code == 200:
-            result: Dict = json.loads(response.text)
-            return result
-        else:
-            print("Something went wrong when getting results")
 
     def get_data_info(self, dataset_id: str = None):
-        url: str = f"{BASE_URL}/data"
+        url: str = f"{self.base_url}/data"
         token: str = self.token_handler.get_token()
         headers = {
             "tenantId": self.tenant_id,
@@ -148,40 +686,39 @@ class ApiCaller:
         }
         if dataset_id is None:
             headers.pop("datasetId")
-        response = requests.get(url, headers=headers)
-
-        if response.status_code == 200:
-            result: Dict = json.loads(response.text)
-            return result
-        else:
-            print("Something went wrong when getting data info")
+        response = self._send("data", "GET", url, headers, dataset_id=dataset_id)
+        return _parse_json("data", response)
 
     def get_real_time_predictions(
         self, dataset_id: str, registrations: List[Dict]
     ) -> Dict:
-        url: str = f"{BASE_URL}/real_time_prediction"
+        url: str = f"{self.base_url}/real_time_prediction"
         token: str = self.token_handler.get_token()
 
+        start = time.perf_counter()
         registrations = self._prepare_registrations(registrations)
         headers = {
             "tenantId": self.tenant_id,
             "Authorization": f"Bearer {token}",
             "Content-Type": "application/json",
         }
-        payload = {
-            "parameters": [{"datasetId": dataset_id, "registrations": registrations}]
-        }
-
-        response = requests.post(url, headers=headers, data=json.dumps(payload))
-
-        if response.status_code == 200:
-            result: Dict = json.loads(response.text)
-            return result
-        else:
-            print("Something went wrong when creating real time predictions")
+        body, raw_size = self._json_body(
+            iter_prediction_payload(dataset_id, registrations), headers
+        )
+        response = self._send(
+            "real_time_prediction",
+            "POST",
+            url,
+            headers,
+            data=body,
+            raw_size=raw_size,
+            dataset_id=dataset_id,
+            serialization_time=time.perf_counter() - start,
+        )
+        return _parse_json("real_time_prediction", response)
 
     def delete_dataset(self, dataset_id: str):
-        url: str = f"{BASE_URL}/data/{dataset_id}"
+        url: str = f"{self.base_url}/data/{dataset_id}"
         token: str = self.token_handler.get_token()
         headers = {
             "tenantId": self.tenant_id,
@@ -189,31 +726,101 @@ class ApiCaller:
             "datasetId": dataset_id,
             "Content-Type": "application/json",
         }
-        response = requests.delete(url, headers=headers)
-
-        if response.status_code == 200:
-            result: Dict = json.loads(response.text)
-            return result
-        else:
-            print("Something went wrong when deleting dataset")
+        response = self._send(
+            "delete_dataset", "DELETE", url, headers, dataset_id=dataset_id
+        )
+        return _parse_json("delete_dataset", response)
 
     def _get_presigned_url(self) -> str:
         self.current_job_id = None
-        url: str = f"{BASE_URL}/presigned_url"
+        url, self.current_job_id = self._request_presigned_url()
+        return url
+
+    def _request_presigned_url(
+        self, dataset_ids: Union[str, List[str]] = None
+    ) -> Tuple[str, str]:
+        """
+        Gets a presigned upload url and its job id, without touching the current job id.
+        dataset_ids are the datasets that will be uploaded, to label the job.
+        """
+        url: str = f"{self.base_url}/presigned_url"
         token: str = self.token_handler.get_token()
         headers = {"tenantId": self.tenant_id, "Authorization": f"Bearer {token}"}
-        response = requests.get(url, headers=headers)
+        response = self._send(
+            "presigned_url",
+            "GET",
+            url,
+            headers,
+            dataset_id=_dataset_label(dataset_ids),
+        )
+        result: Dict = _parse_json("presigned_url", response)
+        self._remember_job(result["jobId"], dataset_ids)
+        return result["url"], result["jobId"]
+
+    def _remember_job(
+        self, job_id: str, dataset_ids: Union[str, List[str], None]
+    ) -> None:
+        label = _dataset_label(dataset_ids)
+        if label is None:
+            return
+        with self._stats_lock:
+            self._job_datasets[job_id] = label
+            if len(self._job_datasets) > JOB_LABELS_MAX:
+                self._job_datasets.popitem(last=False)
 
-        if response.status_code == 200:
-            result: Dict = json.loads(response.text)
-            self.current_job_id = result["jobId"]
-            return result["url"]
-        else:
-            print("Something went wrong when getting presigned url")
+    def _job_dataset(self, job_id: str) -> Optional[str]:
+        with self._stats_lock:
+            return self._job_datasets.get(job_id)
 
     def delete_model_and_metadata(self, dataset_id: str):
+        prefix = f"{VISMA_CONNECT_CLIENT_ID}/{self.tenant_id}/{dataset_id}"
+        if MODEL_STORE_URL is not None:
+            self._send(
+                "delete_model",
+                "DELETE",
+                f"{MODEL_STORE_URL}/{prefix}",
+                dataset_id=dataset_id,
+            )
+            return
         s3 = boto3.resource("s3")
         bucket = s3.Bucket(MODEL_BUCKET)
-        bucket.objects.filter(
-            Prefix=f"{VISMA_CONNECT_CLIENT_ID}/{self.tenant_id}/{dataset_id}"
-        ).delete()
+        bucket.objects.filter(Prefix=prefix).delete()
+
+
+def _parse_json(endpoint: str, response: requests.Response):
+    try:
+        return json.loads(response.text)
+    except ValueError:
+        raise InvalidResponseError(
+            "the response is not JSON",
+            endpoint=endpoint,
+            status_code=response.status_code,
+            body=response.text[:MAX_BODY_LENGTH],
+        )
+
+
+def _wire_bytes(response: requests.Response, response_bytes: int) -> int:
+    """
+    Bytes of the response body received over the wire, before decompression.
+    """
+    raw = getattr(response, "raw", None)
+    wire_bytes = raw.tell() if hasattr(raw, "tell") else response_bytes
+    return wire_bytes or response_bytes
+
+
+def _dataset_label(dataset_ids: Union[str, List[str], None]) -> Optional[str]:
+    if dataset_ids is None or isinstance(dataset_ids, str):
+        return dataset_ids
+    return ",".join(dataset_ids)
+
+
+def _from_df(
+    registrations: Union[pd.DataFrame, RegistrationBatch, Iterable[Dict]]
+) -> Union[RegistrationBatch, Iterable[Dict]]:
+    """
+    Converts a DataFrame to a RegistrationBatch, see RegistrationBatch.from_df. Other
+    registrations are returned as they are, so iterators are not consumed.
+    """
+    if isinstance(registrations, pd.DataFrame):
+        return RegistrationBatch.from_df(registrations)
+    return registrations
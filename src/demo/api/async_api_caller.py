@@ -0,0 +1,98 @@
+import asyncio
+import functools
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Tuple, Union
+
+from src.demo.api.api_caller import ApiCaller
+from src.demo.api.instrumentation import Instrumentation
+from src.demo.api.constants import POOL_MAXSIZE, BASE_URL, VISMA_CONNECT_TOKEN_URL
+
+
+class AsyncApiCaller:
+    """
+    Asyncio counterpart of ApiCaller, which runs every call on a bounded thread pool.
+    Methods take and return job ids instead of relying on current_job_id.
+    """
+
+    def __init__(
+        self,
+        tenant_id: str,
+        session: requests.Session = None,
+        max_workers: int = POOL_MAXSIZE,
+        instrumentation: Instrumentation = None,
+        base_url: str = BASE_URL,
+        token_url: str = VISMA_CONNECT_TOKEN_URL,
+    ) -> None:
+        self.tenant_id = tenant_id
+        self.api_caller = ApiCaller(
+            tenant_id,
+            session=session,
+            pool_maxsize=max_workers,
+            instrumentation=instrumentation,
+            base_url=base_url,
+            token_url=token_url,
+        )
+        self.instrumentation = self.api_caller.instrumentation
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix=f"td-{tenant_id}"
+        )
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(func, *args, **kwargs)
+        )
+
+    async def health_check(self) -> int:
+        return await self._run(self.api_caller.health_check)
+
+    async def get_presigned_url(self) -> Tuple[str, str]:
+        """
+        Returns a presigned upload url and the job id belonging to it.
+        """
+        return await self._run(self.api_caller._request_presigned_url)
+
+    async def upload_data(
+        self, dataset_ids: Union[str, List[str]], registrations: List[Dict]
+    ) -> str:
+        return await self._run(self.api_caller.upload_data, dataset_ids, registrations)
+
+    async def start_trainer(
+        self, dataset_ids: Union[str, List[str]], rebuild_models: bool = True
+    ) -> str:
+        return await self._run(
+            self.api_caller.start_trainer, dataset_ids, rebuild_models=rebuild_models
+        )
+
+    async def create_predictions(
+        self, dataset_id: str, registrations: List[Dict], employee_ids: List[str]
+    ) -> str:
+        return await self._run(
+            self.api_caller.create_predictions, dataset_id, registrations, employee_ids
+        )
+
+    async def get_job_status(self, job_id: str) -> Dict:
+        return await self._run(
+            self.api_caller.get_job_status, print_status=False, job_id=job_id
+        )
+
+    async def get_results(self, job_id: str) -> Dict:
+        return await self._run(self.api_caller.get_results, job_id=job_id)
+
+    async def get_real_time_predictions(
+        self, dataset_id: str, registrations: List[Dict]
+    ) -> Dict:
+        return await self._run(
+            self.api_caller.get_real_time_predictions, dataset_id, registrations
+        )
+
+    async def get_data_info(self, dataset_id: str = None) -> Dict:
+        return await self._run(self.api_caller.get_data_info, dataset_id)
+
+    async def delete_dataset(self, dataset_id: str) -> Dict:
+        return await self._run(self.api_caller.delete_dataset, dataset_id)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        self.api_caller.close()
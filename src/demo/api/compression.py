@@ -0,0 +1,54 @@
+import zlib
+from typing import Iterable, Iterator
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+GZIP = "gzip"
+ZSTD = "zstd"
+
+# Encodings we can decode in responses. urllib3 decodes zstd when zstandard is installed.
+ACCEPT_ENCODING = "zstd, gzip, deflate" if zstandard is not None else "gzip, deflate"
+
+
+def check_encoding(encoding: str) -> None:
+    """
+    Raises a ValueError if request bodies cannot be compressed with the encoding.
+    """
+    if encoding == ZSTD and zstandard is None:
+        raise ValueError("zstd compression requires the zstandard package")
+    if encoding not in (GZIP, ZSTD):
+        raise ValueError(f"Unsupported compression: {encoding}")
+
+
+def compress(body: bytes, encoding: str, level: int) -> bytes:
+    """
+    Compresses a whole request body with the given Content-Encoding.
+    """
+    return b"".join(iter_compressed([body], encoding, level))
+
+
+def iter_compressed(
+    chunks: Iterable[bytes], encoding: str, level: int
+) -> Iterator[bytes]:
+    """
+    Compresses a stream of chunks incrementally, so the uncompressed body is never
+    held in memory at once.
+    """
+    check_encoding(encoding)
+    if encoding == GZIP:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        for chunk in chunks:
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
+    else:
+        compressor = zstandard.ZstdCompressor(level=level).compressobj()
+        for chunk in chunks:
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
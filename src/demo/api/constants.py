@@ -1,10 +1,13 @@
+import os
+
 #Set by you
 VISMA_CONNECT_CLIENT_ID = "your-client-id" #TODO: replace with your client id
 VISMA_CONNECT_KEY_STAGE = "VISMA_CONNECT_KEY_STAGE" #Set by you as an environment variable
  
 #API constants
-BASE_URL = "https://api.machine-learning-factory.stage.visma.com/td"
-VISMA_CONNECT_TOKEN_URL = "https://connect.identity.stagaws.visma.com/connect/token"
+#Set TD_BASE_URL and TD_TOKEN_URL as environment variables to use another server, e.g. src/demo/api/mock_server.py
+BASE_URL = os.environ.get("TD_BASE_URL", "https://api.machine-learning-factory.stage.visma.com/td")
+VISMA_CONNECT_TOKEN_URL = os.environ.get("TD_TOKEN_URL", "https://connect.identity.stagaws.visma.com/connect/token")
 VISMA_CONNECT_API_SCOPE = "machine-learning-factory-api-stage:td"
 REG_FIELDS = [
     "registrationId",
@@ -21,4 +24,58 @@ REG_FIELDS = [
     "numericals",
 ]
 MODEL_BUCKET = "mlf-td-trainer-model-bucket-stage"
+MODEL_STORE_URL = os.environ.get("TD_MODEL_STORE_URL") #If set, models are deleted through this url instead of from MODEL_BUCKET
+
+
+#HTTP connection pool
+POOL_CONNECTIONS = 10 #Number of hosts to keep a connection pool for
+POOL_MAXSIZE = 20 #Number of keep-alive connections kept per host
+REQUEST_TIMEOUT = (5, 60) #(connect, read) timeout in seconds
+
+#Job statuses
+JOB_SUCCESS_STATUS = "success"
+JOB_FAILED_STATUSES = ["invalid", "failed", "error"]
+
+#Batched uploads
+UPLOAD_BATCH_SIZE = 50000 #Max number of registrations per uploaded batch
+UPLOAD_MAX_WORKERS = 4 #Number of batches uploaded in parallel
+
+#Streaming serialization
+SERIALIZATION_CHUNK_SIZE = 1000 #Number of registrations encoded per chunk
+SPOOL_MAX_SIZE = 64 * 1024 * 1024 #Bytes of a request body kept in memory before spilling to disk
+
+#Streamed results
+RESULTS_BATCH_SIZE = 10000 #Number of predictions per batch of streamed results
+RESULTS_CHUNK_SIZE = 64 * 1024 #Bytes of a results response read from the connection at a time
+
+#Compression
+REQUEST_COMPRESSION = None #"gzip" or "zstd" to compress request bodies, None to send them as is
+COMPRESSION_LEVEL = 6
+
+#Token refresh
+TOKEN_EXPIRY_MARGIN = 60 #Seconds before expiry after which a token is no longer used
+TOKEN_REFRESH_AHEAD = 0.8 #Fraction of the token lifetime after which it is refreshed in the background
+TOKEN_REFRESH_RETRY_INTERVAL = 30 #Seconds before a failed background refresh is tried again
+
+#Token cache shared between processes
+TOKEN_CACHE_FILE = "TD_TOKEN_CACHE_FILE" #Optionally set by you as an environment variable, e.g. ~/.cache/td/tokens.json
+
+#Real-time prediction batching
+REALTIME_MAX_BATCH_SIZE = 100 #Max number of registrations per batched real-time prediction request
+REALTIME_MAX_WAIT_MS = 10 #Max milliseconds a real-time prediction call waits for others to join its batch
+
+#Prediction cache
+PREDICTION_CACHE_MAX_ENTRIES = 100000 #Max number of cached predictions kept in memory
+PREDICTION_CACHE_TTL = 24 * 60 * 60 #Seconds a cached prediction is used
+PREDICTION_CACHE_MAX_JOB_SIZE = 100000 #Max number of predictions of a prediction job that is cached, larger jobs are not
+MODEL_VERSION_TTL = 60 #Seconds the model version of a dataset is used before it is looked up again
+
+#Retries and circuit breaking
+API_MAX_RETRIES = 4 #Number of retries of a failed request, see resilience.RetryPolicy
+RETRY_BACKOFF_BASE = 0.5 #Seconds of backoff before the first retry, doubled for every next one
+RETRY_BACKOFF_MAX = 30 #Max seconds of backoff (and of Retry-After honored) before a retry
+CIRCUIT_FAILURE_THRESHOLD = 5 #Consecutive failures after which requests to a host are stopped
+CIRCUIT_RESET_TIMEOUT = 30 #Seconds after which a request to a host with an open circuit is tried again
 
+#Instrumentation
+JOB_LABELS_MAX = 10000 #Max number of jobs whose dataset is remembered to label their status and results requests
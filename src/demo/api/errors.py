@@ -0,0 +1,174 @@
+import time
+import requests
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+# Number of characters of an error response body kept in the error
+MAX_BODY_LENGTH = 500
+
+
+class TimeDetectError(Exception):
+    """
+    Base class of the errors raised by the ApiCaller.
+    retryable tells whether the same request may succeed if it is sent again, and
+    retry_after is the number of seconds the server asked to wait before that, if any.
+    """
+
+    retryable = False
+
+    def __init__(
+        self,
+        message: str,
+        endpoint: str = None,
+        status_code: int = None,
+        body: str = None,
+        retry_after: float = None,
+    ) -> None:
+        super().__init__(message)
+        self.endpoint = endpoint
+        self.status_code = status_code
+        self.body = body
+        self.retry_after = retry_after
+
+    def __str__(self) -> str:
+        message = super().__str__()
+        if self.endpoint is not None:
+            message = f"{self.endpoint}: {message}"
+        if self.body:
+            message = f"{message} ({self.body})"
+        return message
+
+
+class TransportError(TimeDetectError):
+    """
+    The request did not get a response: connection error, timeout, broken connection.
+    sent tells whether the request may have reached the server. Requests that could
+    not connect were not sent, so even non-idempotent ones can be retried.
+    """
+
+    retryable = True
+
+    def __init__(self, message: str, endpoint: str = None, sent: bool = True) -> None:
+        super().__init__(message, endpoint)
+        self.sent = sent
+
+
+class CircuitOpenError(TimeDetectError):
+    """
+    The request was not sent, because too many recent requests to the host failed.
+    """
+
+
+class ApiError(TimeDetectError):
+    """
+    The API answered with an error status code.
+    """
+
+
+class BadRequestError(ApiError):
+    """
+    400 or another 4xx status without a more specific error.
+    """
+
+
+class AuthenticationError(ApiError):
+    """
+    401 or 403: the token is missing, expired or does not give access.
+    """
+
+
+class NotFoundError(ApiError):
+    """
+    404: e.g. an unknown job or dataset.
+    """
+
+
+class PayloadTooLargeError(ApiError):
+    """
+    413: the request body is too large, send smaller batches.
+    """
+
+
+class RateLimitedError(ApiError):
+    """
+    429: too many requests, wait retry_after seconds before sending more.
+    """
+
+    retryable = True
+
+
+class ServerError(ApiError):
+    """
+    5xx: the API failed or is unavailable.
+    """
+
+    retryable = True
+
+
+class InvalidResponseError(ApiError):
+    """
+    The response has a successful status code, but not the expected content, e.g. a
+    body that is not JSON.
+    """
+
+
+def error_for_response(endpoint: str, response: requests.Response) -> ApiError:
+    """
+    The ApiError matching the status code of an error response.
+    """
+    status_code = response.status_code
+    if status_code in (401, 403):
+        error_class = AuthenticationError
+    elif status_code == 404:
+        error_class = NotFoundError
+    elif status_code == 413:
+        error_class = PayloadTooLargeError
+    elif status_code == 429:
+        error_class = RateLimitedError
+    elif status_code >= 500:
+        error_class = ServerError
+    else:
+        error_class = BadRequestError
+    return error_class(
+        f"{status_code} {response.reason or ''}".strip(),
+        endpoint=endpoint,
+        status_code=status_code,
+        body=response.text[:MAX_BODY_LENGTH],
+        retry_after=parse_retry_after(response.headers.get("Retry-After")),
+    )
+
+
+def error_for_exception(endpoint: str, e: requests.RequestException) -> TransportError:
+    return TransportError(
+        f"{type(e).__name__}: {e}", endpoint=endpoint, sent=_may_have_been_sent(e)
+    )
+
+
+def _may_have_been_sent(e: requests.RequestException) -> bool:
+    """
+    Only requests that failed to open a connection surely did not reach the server.
+    Connections that broke later, and read timeouts, may have delivered the request.
+    """
+    if isinstance(e, requests.ConnectTimeout):
+        return False
+    if isinstance(e, requests.ConnectionError) and e.args:
+        reason = getattr(e.args[0], "reason", e.args[0])
+        return not isinstance(reason, (NewConnectionError, ConnectTimeoutError))
+    return True
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Seconds to wait from a Retry-After header, given in seconds or as an HTTP date.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
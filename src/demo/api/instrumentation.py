@@ -0,0 +1,314 @@
+import os
+import json
+import time
+import threading
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Upper bounds in seconds of the buckets of the duration histograms
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# Upper bounds in seconds of the buckets of the job wait histogram
+WAIT_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+# Upper bounds in bytes of the buckets of the body size histograms
+SIZE_BUCKETS = tuple(4**i * 1024 for i in range(11))
+
+# Outcomes of a request
+SUCCESS = "success"
+ERROR = "error"
+EXCEPTION = "exception"
+
+METRIC_PREFIX = "td_client_"
+REQUEST_LABELS = ("endpoint", "tenant", "dataset")
+WAIT_LABELS = ("tenant", "dataset", "outcome")
+
+
+@dataclass
+class RequestRecord:
+    """
+    One request sent by an ApiCaller. Durations are in seconds, sizes in bytes;
+    the request and response sizes are before compression, the wire sizes after.
+    status_code is None if the request raised, and attempt counts the retries.
+    """
+
+    endpoint: str
+    method: str
+    tenant_id: str
+    dataset_id: Optional[str]
+    status_code: Optional[int]
+    outcome: str
+    request_bytes: int = 0
+    request_wire_bytes: int = 0
+    response_bytes: int = 0
+    response_wire_bytes: int = 0
+    serialization_time: float = 0.0
+    network_time: float = 0.0
+    attempt: int = 0
+    error: Optional[str] = None
+    timestamp: float = field(default_factory=time.time)
+
+
+@dataclass
+class WaitRecord:
+    """
+    One wait of a ClientSimulator for a job, from the job waiter's WaitResult.
+    """
+
+    tenant_id: str
+    dataset_id: Optional[str]
+    job_id: Optional[str]
+    outcome: str
+    elapsed: float
+    polls: int
+    time_to_first_poll: float
+    timestamp: float = field(default_factory=time.time)
+
+    @classmethod
+    def from_wait_result(
+        cls, tenant_id: str, dataset_id: Optional[str], job_id: Optional[str], result
+    ) -> "WaitRecord":
+        return cls(
+            tenant_id,
+            dataset_id,
+            job_id,
+            result.outcome,
+            result.elapsed,
+            result.polls,
+            result.time_to_first_poll,
+        )
+
+
+class Instrumentation:
+    """
+    Receives a record of every request of an ApiCaller and of every job wait of a
+    ClientSimulator. This base class records nothing, and is the default: as long as
+    enabled is False, the callers do not even time their calls.
+    Subclass it to send the records somewhere else, or use MetricsInstrumentation.
+    """
+
+    enabled = False
+
+    def record_request(self, record: RequestRecord) -> None:
+        pass
+
+    def record_wait(self, record: WaitRecord) -> None:
+        pass
+
+
+NULL_INSTRUMENTATION = Instrumentation()
+
+
+class _Histogram:
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def cumulative_counts(self) -> List[int]:
+        counts, total = [], 0
+        for count in self.counts:
+            total += count
+            counts.append(total)
+        return counts
+
+
+class MetricsInstrumentation(Instrumentation):
+    """
+    Aggregates the records into counters and histograms per endpoint, tenant and
+    dataset (per tenant, dataset and outcome for job waits), exposed in the Prometheus
+    text format or as OpenMetrics with to_text, or written to a file with write, e.g.
+    for the textfile collector of the node exporter.
+    If trace_path is given, every record is also appended to that file as one JSON
+    line. Thread-safe, so one instance can be shared by many ApiCallers.
+    """
+
+    enabled = True
+
+    # name -> (type, help, label names, histogram buckets)
+    METRICS = {
+        "requests": ("counter", "Requests sent", REQUEST_LABELS + ("status",), None),
+        "retries": ("counter", "Requests that were retries", REQUEST_LABELS, None),
+        "request_bytes": (
+            "counter",
+            "Request bytes before compression",
+            REQUEST_LABELS,
+            None,
+        ),
+        "request_wire_bytes": (
+            "counter",
+            "Request bytes sent",
+            REQUEST_LABELS,
+            None,
+        ),
+        "response_bytes": (
+            "counter",
+            "Response bytes after decompression",
+            REQUEST_LABELS,
+            None,
+        ),
+        "response_wire_bytes": (
+            "counter",
+            "Response bytes received",
+            REQUEST_LABELS,
+            None,
+        ),
+        "request_size_bytes": (
+            "histogram",
+            "Request body size before compression",
+            REQUEST_LABELS,
+            SIZE_BUCKETS,
+        ),
+        "network_seconds": (
+            "histogram",
+            "Time from sending a request to receiving the whole response",
+            REQUEST_LABELS,
+            DURATION_BUCKETS,
+        ),
+        "serialization_seconds": (
+            "histogram",
+            "Time spent serializing and compressing request bodies",
+            REQUEST_LABELS,
+            DURATION_BUCKETS,
+        ),
+        "job_waits": ("counter", "Job waits", WAIT_LABELS, None),
+        "job_polls": ("counter", "Job status polls", WAIT_LABELS, None),
+        "job_wait_seconds": (
+            "histogram",
+            "Time spent waiting for jobs",
+            WAIT_LABELS,
+            WAIT_BUCKETS,
+        ),
+    }
+
+    def __init__(self, trace_path: str = None) -> None:
+        self.trace_path = trace_path
+        # name -> label values -> value, or histogram
+        self._values: Dict[str, Dict[Tuple[str, ...], object]] = {
+            name: {} for name in self.METRICS
+        }
+        self._lock = threading.Lock()
+        self._trace_file = None
+        if trace_path is not None:
+            directory = os.path.dirname(trace_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._trace_file = open(trace_path, "a", buffering=1)
+
+    def record_request(self, record: RequestRecord) -> None:
+        labels = (record.endpoint, record.tenant_id, record.dataset_id or "")
+        status = str(record.status_code or record.outcome)
+        with self._lock:
+            self._add("requests", labels + (status,))
+            if record.attempt > 0:
+                self._add("retries", labels)
+            for name in (
+                "request_bytes",
+                "request_wire_bytes",
+                "response_bytes",
+                "response_wire_bytes",
+            ):
+                self._add(name, labels, getattr(record, name))
+            if record.request_bytes > 0:
+                self._observe("request_size_bytes", labels, record.request_bytes)
+                self._observe(
+                    "serialization_seconds", labels, record.serialization_time
+                )
+            self._observe("network_seconds", labels, record.network_time)
+            self._trace("request", record)
+
+    def record_wait(self, record: WaitRecord) -> None:
+        labels = (record.tenant_id, record.dataset_id or "", record.outcome)
+        with self._lock:
+            self._add("job_waits", labels)
+            self._add("job_polls", labels, record.polls)
+            self._observe("job_wait_seconds", labels, record.elapsed)
+            self._trace("wait", record)
+
+    def to_text(self, openmetrics: bool = False) -> str:
+        """
+        All the metrics in the Prometheus text exposition format, or in the
+        OpenMetrics format.
+        """
+        lines = []
+        with self._lock:
+            for name, (metric_type, help_text, label_names, _) in self.METRICS.items():
+                family = METRIC_PREFIX + name
+                # OpenMetrics names counter families without the _total suffix of
+                # their samples, the Prometheus text format with it
+                described = family
+                if metric_type == "counter" and not openmetrics:
+                    described = f"{family}_total"
+                lines.append(f"# HELP {described} {help_text}.")
+                lines.append(f"# TYPE {described} {metric_type}")
+                for label_values, value in sorted(self._values[name].items()):
+                    labels = _format_labels(label_names, label_values)
+                    if metric_type == "counter":
+                        lines.append(f"{family}_total{{{labels}}} {_number(value)}")
+                    else:
+                        lines.extend(_histogram_lines(family, labels, value))
+        if openmetrics:
+            lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str, openmetrics: bool = False) -> None:
+        """
+        Writes the metrics to a file, replacing it atomically.
+        """
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.to_text(openmetrics))
+        os.replace(tmp_path, path)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._trace_file is not None:
+                self._trace_file.close()
+                self._trace_file = None
+
+    def _add(self, name: str, labels: Tuple[str, ...], value: float = 1) -> None:
+        values = self._values[name]
+        values[labels] = values.get(labels, 0) + value
+
+    def _observe(self, name: str, labels: Tuple[str, ...], value: float) -> None:
+        histogram = self._values[name].get(labels)
+        if histogram is None:
+            histogram = self._values[name][labels] = _Histogram(self.METRICS[name][3])
+        histogram.observe(value)
+
+    def _trace(self, record_type: str, record) -> None:
+        if self._trace_file is not None:
+            self._trace_file.write(
+                json.dumps({"type": record_type, **asdict(record)}) + "\n"
+            )
+
+
+def _histogram_lines(family: str, labels: str, histogram: _Histogram) -> List[str]:
+    separator = "," if labels else ""
+    lines = [
+        f'{family}_bucket{{{labels}{separator}le="{_number(bound)}"}} {count}'
+        for bound, count in zip(histogram.buckets, histogram.cumulative_counts())
+    ]
+    lines.append(f'{family}_bucket{{{labels}{separator}le="+Inf"}} {histogram.count}')
+    lines.append(f"{family}_sum{{{labels}}} {_number(histogram.sum)}")
+    lines.append(f"{family}_count{{{labels}}} {histogram.count}")
+    return lines
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
@@ -0,0 +1,475 @@
+"""
+Local stand-in for the TimeDetect API, for offline development and load testing:
+    python -m src.demo.api.mock_server --port 8080 --latency 0.005 --job-duration 0.5
+Point the client to it with the printed environment variables, or pass its base_url and
+token_url to the ApiCaller.
+"""
+import gzip
+import json
+import time
+import uuid
+import random
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from src.demo.api.compression import GZIP, ZSTD, zstandard
+
+# Job statuses as the API reports them
+PENDING_STATUS = "pending"
+RUNNING_STATUS = "running"
+SUCCESS_STATUS = "success"
+FAILED_STATUS = "failed"
+
+API_PREFIX = "/td"
+TOKEN_PATH = "/connect/token"
+UPLOAD_PREFIX = "/upload/"
+MODELS_PREFIX = "/models/"
+# Routes (see _route) whose bodies are limited to max_payload_size
+PAYLOAD_LIMITED_ROUTES = {
+    f"PUT {UPLOAD_PREFIX}*",
+    f"POST {API_PREFIX}/create_prediction",
+    f"POST {API_PREFIX}/real_time_prediction",
+}
+
+# Kinds of jobs
+UPLOAD_JOB = "upload"
+TRAIN_JOB = "train"
+PREDICT_JOB = "predict"
+
+
+class _Job:
+    def __init__(self, kind: str, tenant_id: str, duration: float, fails: bool) -> None:
+        self.kind = kind
+        self.tenant_id = tenant_id
+        self.duration = duration
+        self.fails = fails
+        self.started_at: Optional[float] = None
+        self.results: Optional[Dict] = None
+
+    def start(self, results: Dict = None) -> None:
+        self.started_at = time.monotonic()
+        self.results = results
+
+    @property
+    def status(self) -> str:
+        if self.started_at is None:
+            return PENDING_STATUS
+        if time.monotonic() - self.started_at < self.duration:
+            return RUNNING_STATUS
+        return FAILED_STATUS if self.fails else SUCCESS_STATUS
+
+
+class MockTimeDetectServer:
+    """
+    Threaded HTTP server that mimics the TimeDetect API, the token endpoint, the
+    presigned upload urls and the model bucket, with configurable latency and job
+    durations, 503s (error_rate) and 413s for uploads and prediction requests larger
+    than max_payload_size.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        latency_jitter: float = 0.0,
+        job_duration: float = 0.0,
+        job_durations: Dict[str, float] = None,
+        error_rate: float = 0.0,
+        job_failure_rate: float = 0.0,
+        max_payload_size: int = None,
+        token_lifetime: int = 3600,
+        seed: int = None,
+    ) -> None:
+        """
+        job_durations overrides job_duration per kind of job ("upload", "train",
+        "predict"). Port 0 picks a free port.
+        """
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.job_durations = {
+            kind: job_duration for kind in (UPLOAD_JOB, TRAIN_JOB, PREDICT_JOB)
+        }
+        self.job_durations.update(job_durations or {})
+        self.error_rate = error_rate
+        self.job_failure_rate = job_failure_rate
+        self.max_payload_size = max_payload_size
+        self.token_lifetime = token_lifetime
+        self.random = random.Random(seed)
+        self.request_counts: Dict[str, int] = {}
+        self.jobs: Dict[str, _Job] = {}
+        # (tenant id, dataset id) -> number of uploaded registrations
+        self.datasets: Dict[Tuple[str, str], int] = {}
+        # (tenant id, dataset id) -> number of trainings started
+        self.model_versions: Dict[Tuple[str, str], int] = {}
+        self.deleted_models: List[str] = []
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def base_url(self) -> str:
+        return self.url + API_PREFIX
+
+    @property
+    def token_url(self) -> str:
+        return self.url + TOKEN_PATH
+
+    @property
+    def model_store_url(self) -> str:
+        return self.url + MODELS_PREFIX.rstrip("/")
+
+    def environment(self) -> Dict[str, str]:
+        """
+        Environment variables that point src.demo.api.constants to this server.
+        """
+        return {
+            "TD_BASE_URL": self.base_url,
+            "TD_TOKEN_URL": self.token_url,
+            "TD_MODEL_STORE_URL": self.model_store_url,
+        }
+
+    def start(self) -> "MockTimeDetectServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "MockTimeDetectServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def serve_forever(self) -> None:
+        self._httpd.serve_forever()
+
+    # Request handling, called from the handler threads
+
+    def handle(
+        self, method: str, path: str, headers: Dict[str, str], body: bytes
+    ) -> Tuple[int, Dict, Dict[str, str]]:
+        """
+        Returns the status code, the JSON response and extra response headers.
+        """
+        with self._lock:
+            key = f"{method} {_route(path)}"
+            self.request_counts[key] = self.request_counts.get(key, 0) + 1
+            delay = self.latency + self.random.uniform(0, self.latency_jitter)
+            fail = (
+                path.startswith(API_PREFIX) and self.random.random() < self.error_rate
+            )
+        if delay > 0:
+            time.sleep(delay)
+        if fail:
+            return 503, {"message": "Service unavailable"}, {"Retry-After": "1"}
+        if (
+            self.max_payload_size is not None
+            and len(body) > self.max_payload_size
+            and key in PAYLOAD_LIMITED_ROUTES
+        ):
+            return 413, {"message": "Payload too large"}, {}
+
+        if path == TOKEN_PATH and method == "POST":
+            return 200, self._token(), {}
+        if path.startswith(UPLOAD_PREFIX) and method == "PUT":
+            return self._upload(path[len(UPLOAD_PREFIX) :], headers, body)
+        if path.startswith(MODELS_PREFIX) and method == "DELETE":
+            with self._lock:
+                self.deleted_models.append(path[len(MODELS_PREFIX) :])
+            return 200, {}, {}
+        if not path.startswith(API_PREFIX):
+            return 404, {"message": "Not found"}, {}
+
+        endpoint = path[len(API_PREFIX) :]
+        if endpoint == "/health_check":
+            return 200, {"status": "ok"}, {}
+        if not headers.get("authorization", "").startswith("Bearer "):
+            return 401, {"message": "Unauthorized"}, {}
+        tenant_id = headers.get("tenantid", "")
+        if method == "GET" and endpoint == "/presigned_url":
+            return self._presigned_url(tenant_id)
+        if method == "GET" and endpoint == "/status":
+            return self._status(headers.get("jobid"))
+        if method == "GET" and endpoint == "/results":
+            return self._results(headers.get("jobid"))
+        if method == "GET" and endpoint == "/data":
+            return self._data_info(tenant_id, headers.get("datasetid"))
+        if method == "DELETE" and endpoint.startswith("/data/"):
+            return self._delete_dataset(tenant_id, endpoint[len("/data/") :])
+
+        try:
+            payload = json.loads(_decode(headers, body))
+        except ValueError:
+            return 400, {"message": "Invalid JSON"}, {}
+        if method == "POST" and endpoint == "/start_trainer":
+            return self._start_trainer(tenant_id, payload)
+        if method == "POST" and endpoint == "/create_prediction":
+            return self._create_prediction(tenant_id, payload)
+        if method == "POST" and endpoint == "/real_time_prediction":
+            return 200, _predictions(payload), {}
+        return 404, {"message": "Not found"}, {}
+
+    def _new_job(self, kind: str, tenant_id: str) -> Tuple[str, _Job]:
+        job_id = str(uuid.uuid4())
+        with self._lock:
+            job = _Job(
+                kind,
+                tenant_id,
+                self.job_durations[kind],
+                self.random.random() < self.job_failure_rate,
+            )
+            self.jobs[job_id] = job
+        return job_id, job
+
+    def _token(self) -> Dict:
+        return {
+            "access_token": f"mock-{uuid.uuid4().hex}",
+            "expires_in": self.token_lifetime,
+            "token_type": "Bearer",
+        }
+
+    def _presigned_url(self, tenant_id: str) -> Tuple[int, Dict, Dict]:
+        job_id, _ = self._new_job(UPLOAD_JOB, tenant_id)
+        return 200, {"url": f"{self.url}{UPLOAD_PREFIX}{job_id}", "jobId": job_id}, {}
+
+    def _upload(
+        self, job_id: str, headers: Dict[str, str], body: bytes
+    ) -> Tuple[int, Dict, Dict]:
+        with self._lock:
+            job = self.jobs.get(job_id)
+        if job is None or job.kind != UPLOAD_JOB:
+            return 403, {"message": "Invalid presigned url"}, {}
+        try:
+            payload = json.loads(_decode(headers, body))
+        except ValueError:
+            job.fails = True
+            job.start()
+            return 200, {}, {}
+        # Uploads carry no tenant header, the presigned url stands for the tenant
+        with self._lock:
+            for dataset in payload.get("datasets", []):
+                key = (job.tenant_id, dataset["datasetId"])
+                self.datasets[key] = self.datasets.get(key, 0) + len(
+                    dataset["registrations"]
+                )
+        job.start()
+        return 200, {}, {}
+
+    def _status(self, job_id: str) -> Tuple[int, Dict, Dict]:
+        with self._lock:
+            job = self.jobs.get(job_id)
+        if job is None:
+            return 404, {"message": "Unknown job"}, {}
+        return 200, {"jobId": job_id, "status": job.status}, {}
+
+    def _results(self, job_id: str) -> Tuple[int, Dict, Dict]:
+        with self._lock:
+            job = self.jobs.get(job_id)
+        if job is None or job.kind != PREDICT_JOB:
+            return 404, {"message": "Unknown job"}, {}
+        if job.status != SUCCESS_STATUS:
+            return 400, {"message": f"Job is {job.status}"}, {}
+        return 200, job.results, {}
+
+    def _start_trainer(self, tenant_id: str, payload: Dict) -> Tuple[int, Dict, Dict]:
+        with self._lock:
+            for parameters in payload.get("parameters", []):
+                key = (tenant_id, parameters["datasetId"])
+                self.model_versions[key] = self.model_versions.get(key, 0) + 1
+        job_id, job = self._new_job(TRAIN_JOB, tenant_id)
+        job.start()
+        return 202, {"jobId": job_id}, {}
+
+    def _create_prediction(
+        self, tenant_id: str, payload: Dict
+    ) -> Tuple[int, Dict, Dict]:
+        job_id, job = self._new_job(PREDICT_JOB, tenant_id)
+        job.start(_predictions(payload))
+        return 202, {"jobId": job_id}, {}
+
+    def _data_info(self, tenant_id: str, dataset_id: str) -> Tuple[int, Dict, Dict]:
+        with self._lock:
+            dataset_ids = {
+                key[1]
+                for key in list(self.datasets) + list(self.model_versions)
+                if key[0] == tenant_id
+            }
+            datasets = [
+                {
+                    "datasetId": _id,
+                    "registrations": self.datasets.get((tenant_id, _id), 0),
+                    "modelVersion": self.model_versions.get((tenant_id, _id), 0),
+                }
+                for _id in sorted(dataset_ids)
+                if dataset_id is None or _id == dataset_id
+            ]
+        return 200, {"datasets": datasets}, {}
+
+    def _delete_dataset(
+        self, tenant_id: str, dataset_id: str
+    ) -> Tuple[int, Dict, Dict]:
+        key = (tenant_id, dataset_id)
+        with self._lock:
+            found = key in self.datasets or key in self.model_versions
+            self.datasets.pop(key, None)
+            self.model_versions.pop(key, None)
+        if not found:
+            return 404, {"message": "Unknown dataset"}, {}
+        return 200, {"message": "Dataset deleted successfully"}, {}
+
+
+def _route(path: str) -> str:
+    """
+    Path without ids, to count requests per endpoint.
+    """
+    for prefix in (UPLOAD_PREFIX, MODELS_PREFIX, API_PREFIX + "/data/"):
+        if path.startswith(prefix):
+            return prefix + "*"
+    return path
+
+
+def _decode(headers: Dict[str, str], body: bytes) -> bytes:
+    encoding = headers.get("content-encoding")
+    if encoding == GZIP:
+        return gzip.decompress(body)
+    if encoding == ZSTD and zstandard is not None:
+        return zstandard.ZstdDecompressor().decompressobj().decompress(body)
+    return body
+
+
+def _score(registration_id: str) -> float:
+    digest = hashlib.md5(str(registration_id).encode()).digest()
+    return float(digest[0] % 100)
+
+
+def _predictions(payload: Dict) -> Dict:
+    """
+    Predictions for every registration of every dataset of a prediction request.
+    """
+    results = []
+    for parameters in payload.get("parameters", []):
+        registrations = parameters.get("registrations", [])
+        predictions = [
+            {
+                "registrationId": reg.get("registrationId"),
+                "date": reg.get("date"),
+                "employeeId": reg.get("employeeId"),
+                "anomalyScore": _score(reg.get("registrationId")),
+                "significantFields": [],
+                "aggregated": False,
+                "missing": False,
+                "relatedRegistrationIds": [],
+                "subModelId": f"employee_level-{reg.get('employeeId')}",
+            }
+            for reg in registrations
+        ]
+        aggregated = set(parameters.get("aggregateForEmployeeIds") or [])
+        # (employee id, date) -> ids of the registrations of that employee that day
+        days: Dict[Tuple[str, str], List[str]] = {}
+        for reg in registrations:
+            if reg.get("employeeId") in aggregated:
+                days.setdefault((reg.get("employeeId"), reg.get("date")), []).append(
+                    reg.get("registrationId")
+                )
+        for (employee_id, date), related_ids in sorted(days.items()):
+            registration_id = f"agg_{employee_id}_{date}"
+            predictions.append(
+                {
+                    "registrationId": registration_id,
+                    "date": date,
+                    "employeeId": employee_id,
+                    "anomalyScore": _score(registration_id),
+                    "significantFields": [],
+                    "aggregated": True,
+                    "missing": False,
+                    "relatedRegistrationIds": related_ids,
+                    "subModelId": f"employee_level-{employee_id}",
+                }
+            )
+        results.append(
+            {"datasetId": parameters.get("datasetId"), "predictions": predictions}
+        )
+    return {"results": results}
+
+
+def _make_handler(server: MockTimeDetectServer):
+    class Handler(BaseHTTPRequestHandler):
+        # Keep-alive, so that pooled client connections are reused
+        protocol_version = "HTTP/1.1"
+        # Headers and body are written separately, which Nagle would delay
+        disable_nagle_algorithm = True
+
+        def _handle(self) -> None:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length) if length else b""
+            headers = {key.lower(): value for key, value in self.headers.items()}
+            status, result, extra_headers = server.handle(
+                self.command, urlsplit(self.path).path, headers, body
+            )
+            response = json.dumps(result).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(response)))
+            for key, value in extra_headers.items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(response)
+
+        do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+        def log_message(self, format, *args) -> None:
+            pass
+
+    return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local mock TimeDetect server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--latency-jitter", type=float, default=0.0)
+    parser.add_argument("--job-duration", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--job-failure-rate", type=float, default=0.0)
+    parser.add_argument("--max-payload-size", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    server = MockTimeDetectServer(
+        host=args.host,
+        port=args.port,
+        latency=args.latency,
+        latency_jitter=args.latency_jitter,
+        job_duration=args.job_duration,
+        error_rate=args.error_rate,
+        job_failure_rate=args.job_failure_rate,
+        max_payload_size=args.max_payload_size,
+        seed=args.seed,
+    )
+    for key, value in server.environment().items():
+        print(f"export {key}={value}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
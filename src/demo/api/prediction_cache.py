@@ -0,0 +1,175 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.demo.api.constants import (
+    PREDICTION_CACHE_MAX_ENTRIES,
+    PREDICTION_CACHE_TTL,
+    PREDICTION_CACHE_MAX_JOB_SIZE,
+    MODEL_VERSION_TTL,
+)
+from src.demo.api.serialization import registration_hash
+
+# (dataset id, model version, content hash)
+CacheKey = Tuple[str, str, str]
+
+
+class PredictionCache:
+    """
+    Cache of predictions keyed by dataset id, model version and content hash, evicted
+    LRU and after ttl seconds, and also kept in a SQLite file if cache_path is given.
+    Prediction jobs are cached as one entry if they return at most max_job_size
+    predictions.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = PREDICTION_CACHE_MAX_ENTRIES,
+        ttl: float = PREDICTION_CACHE_TTL,
+        cache_path: str = None,
+        max_job_size: int = PREDICTION_CACHE_MAX_JOB_SIZE,
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_job_size = max_job_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[CacheKey, Tuple[float, object]]" = OrderedDict()
+        self._model_versions: Dict[str, Tuple[float, str]] = {}
+        self._lock = threading.Lock()
+        self._db = None
+        if cache_path is not None:
+            cache_path = os.path.expanduser(cache_path)
+            directory = os.path.dirname(cache_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(cache_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS predictions (dataset_id TEXT, "
+                "model_version TEXT, content_hash TEXT, stored_at REAL, value TEXT, "
+                "PRIMARY KEY (dataset_id, model_version, content_hash))"
+            )
+            self._db.commit()
+
+    def model_version(
+        self, dataset_id: str, get_data_info: Callable[[], Optional[Dict]]
+    ) -> Optional[str]:
+        """
+        Returns the model version of the dataset, or None if it cannot be looked up,
+        in which case nothing should be cached.
+        """
+        now = time.time()
+        with self._lock:
+            cached = self._model_versions.get(dataset_id)
+        if cached is not None and now - cached[0] < MODEL_VERSION_TTL:
+            return cached[1]
+        data_info = get_data_info()
+        if data_info is None:
+            return None
+        version = hashlib.sha256(
+            json.dumps(data_info, sort_keys=True, default=str).encode()
+        ).hexdigest()
+        with self._lock:
+            self._model_versions[dataset_id] = (now, version)
+        return version
+
+    def get(self, key: CacheKey):
+        """
+        Returns the cached value, or None.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            row = self._load(key, now)
+            if row is None:
+                self.misses += 1
+                return None
+            self._store(key, row)
+            self.hits += 1
+            return row[1]
+
+    def put(self, key: CacheKey, value) -> None:
+        entry = (time.time(), value)
+        with self._lock:
+            self._store(key, entry)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?, ?)",
+                    (*key, entry[0], json.dumps(value)),
+                )
+                self._db.commit()
+
+    def invalidate(self, dataset_id: str) -> None:
+        """
+        Forgets all the predictions and the model version of the dataset.
+        """
+        with self._lock:
+            self._model_versions.pop(dataset_id, None)
+            for key in [key for key in self._entries if key[0] == dataset_id]:
+                del self._entries[key]
+            if self._db is not None:
+                self._db.execute(
+                    "DELETE FROM predictions WHERE dataset_id = ?", (dataset_id,)
+                )
+                self._db.commit()
+
+    def get_realtime(
+        self, dataset_id: str, model_version: str, registrations: List[Dict]
+    ) -> Tuple[List[Optional[Dict]], List[str]]:
+        """
+        Returns the cached prediction of every registration (None if not cached), and
+        the hashes of the registrations.
+        """
+        hashes = [registration_hash(reg) for reg in registrations]
+        predictions = [self.get((dataset_id, model_version, h)) for h in hashes]
+        return predictions, hashes
+
+    def get_batch(
+        self,
+        dataset_id: str,
+        model_version: str,
+        registrations: List[Dict],
+        employee_ids: List[str],
+    ) -> Tuple[Optional[List[Dict]], str]:
+        """
+        Returns the cached predictions of the whole request (or None), and its hash.
+        """
+        request_hash = hashlib.sha256()
+        for reg in registrations:
+            request_hash.update(registration_hash(reg).encode())
+        request_hash.update(json.dumps(employee_ids, default=str).encode())
+        request_key = "batch:" + request_hash.hexdigest()
+        return self.get((dataset_id, model_version, request_key)), request_key
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+
+    def _store(self, key: CacheKey, entry: Tuple[float, object]) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _load(self, key: CacheKey, now: float) -> Optional[Tuple[float, object]]:
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            "SELECT stored_at, value FROM predictions WHERE dataset_id = ? "
+            "AND model_version = ? AND content_hash = ?",
+            key,
+        ).fetchone()
+        if row is None or now - row[0] >= self.ttl:
+            return None
+        return row[0], json.loads(row[1])
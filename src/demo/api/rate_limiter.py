@@ -0,0 +1,51 @@
+import time
+import threading
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket: allows on average `rate` calls per second, with bursts of
+    up to `capacity` calls. acquire blocks until a call is allowed.
+    One RateLimiter can be shared by all the ApiCallers of a tenant.
+    """
+
+    def __init__(self, rate: float, capacity: float = None) -> None:
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1) -> float:
+        """
+        Takes tokens from the bucket, sleeping until enough are available.
+        Returns the number of seconds spent waiting.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                wait_time = (tokens - self._tokens) / self.rate
+            time.sleep(wait_time)
+            waited += wait_time
+
+    def pause(self, seconds: float) -> None:
+        """
+        Lets no call through for the next seconds, e.g. after the API answered 429
+        with a Retry-After, so that every caller sharing the limiter backs off.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            # The next token becomes available in seconds
+            self._tokens = min(self._tokens, 1.0 - seconds * self.rate)
@@ -0,0 +1,182 @@
+import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from src.demo.api.api_caller import ApiCaller
+from src.demo.api.constants import REALTIME_MAX_BATCH_SIZE, REALTIME_MAX_WAIT_MS
+
+
+class _PendingBatch:
+    """
+    Calls for one dataset waiting to be sent together.
+    """
+
+    def __init__(self, deadline: float) -> None:
+        self.deadline = deadline
+        self.calls: List[Tuple[List[Dict], Future]] = []
+        self.size = 0
+
+
+class RealTimePredictionBatcher:
+    """
+    Coalesces concurrent real-time prediction calls for the same dataset into one
+    /real_time_prediction request, sent once it holds max_batch_size registrations or
+    max_wait_ms after its first call. Larger calls are split, so no request holds more
+    than max_batch_size registrations. Use one batcher per tenant.
+    """
+
+    def __init__(
+        self,
+        api_caller: ApiCaller,
+        max_batch_size: int = REALTIME_MAX_BATCH_SIZE,
+        max_wait_ms: float = REALTIME_MAX_WAIT_MS,
+        max_workers: int = 4,
+    ) -> None:
+        self.api_caller = api_caller
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._pending: Dict[str, _PendingBatch] = {}
+        self._condition = threading.Condition()
+        self._closed = False
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="td-realtime"
+        )
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flusher.start()
+
+    def predict(self, dataset_id: str, registrations: List[Dict]) -> Optional[List]:
+        """
+        Blocking counterpart of submit: returns the predictions of the registrations.
+        """
+        return self.submit(dataset_id, registrations).result()
+
+    def submit(self, dataset_id: str, registrations: List[Dict]) -> Future:
+        """
+        Queues the registrations for prediction. The returned future resolves to the
+        predictions of these registrations in the same order, or to None if the request
+        failed. Every registration needs a registrationId.
+        """
+        if any("registrationId" not in reg for reg in registrations):
+            raise ValueError("Every registration needs a registrationId")
+        future = Future()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("RealTimePredictionBatcher is closed")
+            if len(registrations) > self.max_batch_size:
+                parts = []
+                for start in range(0, len(registrations), self.max_batch_size):
+                    part = Future()
+                    chunk = registrations[start : start + self.max_batch_size]
+                    self._executor.submit(self._send, dataset_id, [(chunk, part)])
+                    parts.append(part)
+                _join(parts, future)
+                return future
+            batch = self._pending.get(dataset_id)
+            if (
+                batch is not None
+                and batch.size + len(registrations) > self.max_batch_size
+            ):
+                self._dispatch(dataset_id)
+                batch = None
+            if batch is None:
+                batch = _PendingBatch(time.monotonic() + self.max_wait)
+                self._pending[dataset_id] = batch
+                self._condition.notify()
+            batch.calls.append((registrations, future))
+            batch.size += len(registrations)
+            if batch.size >= self.max_batch_size:
+                self._dispatch(dataset_id)
+        return future
+
+    def close(self) -> None:
+        """
+        Sends the pending batches, and waits for all the requests to finish.
+        """
+        with self._condition:
+            self._closed = True
+            for dataset_id in list(self._pending):
+                self._dispatch(dataset_id)
+            self._condition.notify()
+        self._flusher.join()
+        self._executor.shutdown(wait=True)
+
+    def _flush_loop(self) -> None:
+        """
+        Sends every batch whose max wait has passed.
+        """
+        with self._condition:
+            while not self._closed:
+                now = time.monotonic()
+                for dataset_id, batch in list(self._pending.items()):
+                    if batch.deadline <= now:
+                        self._dispatch(dataset_id)
+                if self._pending:
+                    deadline = min(batch.deadline for batch in self._pending.values())
+                    self._condition.wait(max(0.0, deadline - now))
+                else:
+                    self._condition.wait()
+
+    def _dispatch(self, dataset_id: str) -> None:
+        """
+        Hands the pending batch of the dataset to the executor. Called with the lock held.
+        """
+        batch = self._pending.pop(dataset_id)
+        self._executor.submit(self._send, dataset_id, batch.calls)
+
+    def _send(self, dataset_id: str, calls: List[Tuple[List[Dict], Future]]) -> None:
+        registrations = [reg for regs, _ in calls for reg in regs]
+        try:
+            result = self.api_caller.get_real_time_predictions(
+                dataset_id, registrations
+            )
+        except Exception as e:
+            for _, future in calls:
+                future.set_exception(e)
+            return
+
+        if result is None:
+            for _, future in calls:
+                future.set_result(None)
+            return
+
+        predictions = {
+            prediction["registrationId"]: prediction
+            for prediction in result["results"][0]["predictions"]
+        }
+        for regs, future in calls:
+            future.set_result(
+                [
+                    predictions[reg["registrationId"]]
+                    for reg in regs
+                    if reg["registrationId"] in predictions
+                ]
+            )
+
+
+def _join(parts: List[Future], future: Future) -> None:
+    """
+    Resolves future to the predictions of all the parts in order, once they are done:
+    to None if one of them is None, or to the first exception raised.
+    """
+    remaining = [len(parts)]
+    lock = threading.Lock()
+
+    def part_done(_) -> None:
+        with lock:
+            remaining[0] -= 1
+            if remaining[0] > 0:
+                return
+        predictions = []
+        for part in parts:
+            if part.exception() is not None:
+                future.set_exception(part.exception())
+                return
+            if part.result() is None:
+                future.set_result(None)
+                return
+            predictions.extend(part.result())
+        future.set_result(predictions)
+
+    for part in parts:
+        part.add_done_callback(part_done)
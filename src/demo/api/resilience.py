@@ -0,0 +1,193 @@
+import time
+import random
+import threading
+from typing import Dict
+from urllib.parse import urlsplit
+
+from src.demo.api.errors import (
+    CircuitOpenError,
+    RateLimitedError,
+    ServerError,
+    TimeDetectError,
+    TransportError,
+)
+from src.demo.api.constants import (
+    API_MAX_RETRIES,
+    RETRY_BACKOFF_BASE,
+    RETRY_BACKOFF_MAX,
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_RESET_TIMEOUT,
+)
+
+# Endpoints that can be sent again without side effects. The others start jobs, so
+# they are only retried when the API surely did not act on the first request.
+IDEMPOTENT_ENDPOINTS = {
+    "health_check",
+    "status",
+    "presigned_url",
+    "upload",
+    "results",
+    "data",
+    "real_time_prediction",
+    "delete_dataset",
+    "delete_model",
+}
+
+# Circuit breaker states
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class RetryPolicy:
+    """
+    Decides which failed requests are retried, and waits with exponential backoff and
+    full jitter before a retry, or longer if the response asks for it with a
+    Retry-After.
+    """
+
+    def __init__(
+        self,
+        max_retries: int = API_MAX_RETRIES,
+        backoff_base: float = RETRY_BACKOFF_BASE,
+        backoff_max: float = RETRY_BACKOFF_MAX,
+    ) -> None:
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    def should_retry(self, endpoint: str, error: TimeDetectError, attempt: int) -> bool:
+        """
+        start_trainer and create_prediction are only retried if the API surely did not
+        act on the request, so that no job is started twice.
+        """
+        if attempt >= self.max_retries or not error.retryable:
+            return False
+        if endpoint in IDEMPOTENT_ENDPOINTS:
+            return True
+        if isinstance(error, TransportError):
+            return not error.sent
+        return isinstance(error, RateLimitedError) or error.status_code == 503
+
+    def delay(self, attempt: int, error: TimeDetectError) -> float:
+        """
+        Seconds to wait before retry number attempt + 1.
+        """
+        backoff = min(self.backoff_max, self.backoff_base * 2**attempt)
+        delay = random.uniform(0, backoff)
+        if error.retry_after is not None:
+            delay = max(delay, min(error.retry_after, self.backoff_max))
+        return delay
+
+
+class CircuitBreaker:
+    """
+    Fails requests to a host right away after failure_threshold consecutive failures,
+    and lets one request through every reset_timeout seconds until one succeeds.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+        reset_timeout: float = CIRCUIT_RESET_TIMEOUT,
+        host: str = None,
+    ) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.host = host
+        self.state = CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def before_request(self) -> None:
+        """
+        Raises a CircuitOpenError if the request should not be sent.
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            if self.state == OPEN:
+                remaining = self.reset_timeout - (time.monotonic() - self._opened_at)
+                if remaining <= 0:
+                    # Let this request through as a probe
+                    self.state = HALF_OPEN
+                    return
+            else:
+                # A probe is already in flight
+                remaining = self.reset_timeout
+        raise CircuitOpenError(
+            f"circuit open for {self.host or 'the host'} after {self.failures} failures",
+            retry_after=remaining,
+        )
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+
+    def record_failure(self, error: TimeDetectError) -> None:
+        if not isinstance(error, (TransportError, ServerError)):
+            self.record_success()
+            return
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    print(
+                        f"Opening circuit for {self.host or 'the host'} after "
+                        f"{self.failures} failures:",
+                        error,
+                    )
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+
+
+class CircuitBreakers:
+    """
+    One CircuitBreaker per host, created on first use.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+        reset_timeout: float = CIRCUIT_RESET_TIMEOUT,
+    ) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def for_url(self, url: str) -> CircuitBreaker:
+        host = urlsplit(url).netloc
+        with self._lock:
+            breaker = self._breakers.get(host)
+            if breaker is None:
+                breaker = self._breakers[host] = CircuitBreaker(
+                    self.failure_threshold, self.reset_timeout, host
+                )
+            return breaker
+
+    def clear(self) -> None:
+        with self._lock:
+            self._breakers.clear()
+
+    def states(self) -> Dict[str, str]:
+        with self._lock:
+            return {host: breaker.state for host, breaker in self._breakers.items()}
+
+
+# Shared by all the ApiCallers of the process, so they stop calling a failing host
+# together
+_circuit_breakers = CircuitBreakers()
+
+
+def default_circuit_breakers() -> CircuitBreakers:
+    return _circuit_breakers
+
+
+def reset_circuit_breakers() -> None:
+    """
+    Closes all the shared circuits, e.g. after the API is known to be back.
+    """
+    _circuit_breakers.clear()
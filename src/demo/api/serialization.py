@@ -0,0 +1,247 @@
+import re
+import json
+import time
+import codecs
+import hashlib
+import tempfile
+from typing import Iterable, Iterator, List, Dict
+
+from src.registration_batch import RegistrationBatch
+from src.demo.api.compression import iter_compressed
+from src.demo.api.constants import (
+    REG_FIELDS,
+    SERIALIZATION_CHUNK_SIZE,
+    SPOOL_MAX_SIZE,
+    COMPRESSION_LEVEL,
+)
+
+_REG_FIELDS = set(REG_FIELDS)
+# Registrations of a RegistrationBatch encoded column by column at a time
+COLUMNAR_ENCODE_BLOCK_SIZE = 65536
+_encode = json.JSONEncoder().encode
+_decoder = json.JSONDecoder()
+# Whitespace and commas between the items of an array
+_skip_separators = re.compile(r"[ \t\r\n,]*").match
+# Characters that can follow the valid start of a number within the number
+_number_tail = re.compile(r"[0-9.eE+-]*").match
+
+
+def iter_registration_chunks(
+    registrations: Iterable[Dict], chunk_size: int = SERIALIZATION_CHUNK_SIZE
+) -> Iterator[bytes]:
+    """
+    Encodes the registrations (without the surrounding brackets) chunk by chunk,
+    keeping only the fields accepted by the API. The registrations can also be a
+    RegistrationBatch.
+    Every chunk holds at most chunk_size registrations, and chunks after the first
+    start with a separating comma, so the chunks can be concatenated as they are.
+    """
+    if isinstance(registrations, RegistrationBatch):
+        # Encoded column by column, without building a dict per registration
+        batch = registrations.select(REG_FIELDS)
+        first = True
+        for block in batch.batches(max(chunk_size, COLUMNAR_ENCODE_BLOCK_SIZE)):
+            rows = block.encode_rows()
+            for start in range(0, len(rows), chunk_size):
+                chunk = ", ".join(rows[start : start + chunk_size])
+                yield (("" if first else ", ") + chunk).encode()
+                first = False
+        return
+
+    rows: List[str] = []
+    first = True
+    for registration in registrations:
+        rows.append(
+            _encode({k: v for k, v in registration.items() if k in _REG_FIELDS})
+        )
+        if len(rows) >= chunk_size:
+            yield (("" if first else ", ") + ", ".join(rows)).encode()
+            rows = []
+            first = False
+    if rows:
+        yield (("" if first else ", ") + ", ".join(rows)).encode()
+
+
+def _canonical_default(value):
+    # numpy scalars and Timestamps, as they come out of DataFrame.to_dict
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+def _canonical_number(value):
+    # RegistrationBatches hold numbers as float64, dicts may hold the same numbers as
+    # ints, e.g. 2.0 and 2; they hash the same
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, list):
+        return [_canonical_number(item) for item in value]
+    if isinstance(value, dict):
+        return {k: _canonical_number(v) for k, v in value.items()}
+    return value
+
+
+def registration_hash(registration: Dict) -> str:
+    """
+    Content hash of a registration as it is sent to the API: only the accepted fields,
+    independent of the key order and of whether integral numbers are ints or floats.
+    """
+    canonical = json.dumps(
+        {k: _canonical_number(v) for k, v in registration.items() if k in _REG_FIELDS},
+        sort_keys=True,
+        separators=(",", ":"),
+        default=_canonical_default,
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def iter_upload_payload(
+    dataset_ids: List[str],
+    registrations: Iterable[Dict],
+    chunk_size: int = SERIALIZATION_CHUNK_SIZE,
+) -> Iterator[bytes]:
+    """
+    Yields the body of an upload, {"datasets": [{"datasetId": ..., "registrations": [...]}]},
+    chunk by chunk.
+    With one dataset nothing but the current chunk is held in memory. With several
+    datasets the registrations are encoded once, and the encoded chunks are reused for
+    every dataset instead of serializing the same registrations again.
+    """
+    chunks = iter_registration_chunks(registrations, chunk_size)
+    if len(dataset_ids) > 1:
+        chunks = list(chunks)
+
+    yield b'{"datasets": ['
+    for i, dataset_id in enumerate(dataset_ids):
+        prefix = ", " if i > 0 else ""
+        yield f'{prefix}{{"datasetId": {_encode(dataset_id)}, "registrations": ['.encode()
+        yield from chunks
+        yield b"]}"
+    yield b"]}"
+
+
+def iter_prediction_payload(
+    dataset_id: str,
+    registrations: Iterable[Dict],
+    employee_ids: List[str] = None,
+    chunk_size: int = SERIALIZATION_CHUNK_SIZE,
+) -> Iterator[bytes]:
+    """
+    Yields the body of a prediction request chunk by chunk, like iter_upload_payload:
+    {"parameters": [{"datasetId": ..., "registrations": [...]}]}, with
+    "aggregateForEmployeeIds" if employee_ids are given.
+    """
+    yield f'{{"parameters": [{{"datasetId": {_encode(dataset_id)}, "registrations": ['.encode()
+    yield from iter_registration_chunks(registrations, chunk_size)
+    if employee_ids is None:
+        yield b"]}]}"
+    else:
+        yield f'], "aggregateForEmployeeIds": {_encode(list(employee_ids))}}}]}}'.encode()
+
+
+def iter_array_items(chunks: Iterable[bytes], key: str) -> Iterator:
+    """
+    Yields the items of the arrays under key in a JSON document that arrives as chunks
+    of UTF-8 bytes, as soon as each is complete. Raises a ValueError if the document is
+    cut off inside an array or holds an invalid item.
+    """
+    key_pattern = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    chunks = iter(chunks)
+    buffer, pos = "", 0
+    in_array, exhausted = False, False
+    while True:
+        if not in_array:
+            match = key_pattern.search(buffer, pos)
+            if match is not None:
+                in_array, pos = True, match.end()
+                continue
+            # Keep what may be the start of the key: from its opening quote, which is
+            # at most the second to last quote of what is left of the buffer
+            last = buffer.rfind('"', pos)
+            start = buffer.rfind('"', pos, last) if last > pos else -1
+            if start < 0:
+                start = last
+            buffer, pos = (buffer[start:] if start >= 0 else ""), 0
+        else:
+            pos = _skip_separators(buffer, pos).end()
+            if pos < len(buffer):
+                if buffer[pos] == "]":
+                    in_array, pos = False, pos + 1
+                    continue
+                try:
+                    item, end = _decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if exhausted:
+                        raise
+                else:
+                    # A number at the end of the buffer may go on in the next chunk,
+                    # also when its end so far is no valid number, e.g. "6." or "8e"
+                    if exhausted or _number_tail(buffer, end).end() < len(buffer):
+                        yield item
+                        pos = end
+                        continue
+            elif exhausted:
+                raise ValueError(f'JSON document cut off inside the "{key}" array')
+            buffer, pos = buffer[pos:], 0
+        if exhausted:
+            return
+        chunk = next(chunks, None)
+        if chunk is None:
+            buffer += text_decoder.decode(b"", final=True)
+            exhausted = True
+        else:
+            buffer += text_decoder.decode(chunk)
+
+
+class SpooledBody:
+    """
+    Request body spooled from an iterator of chunks, in memory up to max_size bytes and
+    in a temporary file beyond, so its length is known up front as presigned S3 urls
+    require. raw_length is the size before compression.
+    """
+
+    def __init__(
+        self,
+        chunks: Iterable[bytes],
+        max_size: int = SPOOL_MAX_SIZE,
+        compression: str = None,
+        compression_level: int = COMPRESSION_LEVEL,
+    ):
+        start = time.perf_counter()
+        self._file = tempfile.SpooledTemporaryFile(max_size=max_size)
+        self.compression = compression
+        self.raw_length = 0
+        self.length = 0
+        chunks = self._count_raw(chunks)
+        if compression is not None:
+            chunks = iter_compressed(chunks, compression, compression_level)
+        for chunk in chunks:
+            self._file.write(chunk)
+            self.length += len(chunk)
+        self._file.seek(0)
+        self.serialization_time = time.perf_counter() - start
+
+    def _count_raw(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        for chunk in chunks:
+            self.raw_length += len(chunk)
+            yield chunk
+
+    def __len__(self) -> int:
+        return self.length
+
+    def read(self, size: int = -1) -> bytes:
+        return self._file.read(size)
+
+    def __iter__(self) -> Iterator[bytes]:
+        while True:
+            block = self._file.read(64 * 1024)
+            if not block:
+                return
+            yield block
+
+    def rewind(self) -> None:
+        self._file.seek(0)
+
+    def close(self) -> None:
+        self._file.close()
@@ -0,0 +1,25 @@
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.demo.api.constants import POOL_CONNECTIONS, POOL_MAXSIZE
+
+
+def create_session(
+    pool_connections: int = POOL_CONNECTIONS,
+    pool_maxsize: int = POOL_MAXSIZE,
+    pool_block: bool = False,
+) -> requests.Session:
+    """
+    Creates a requests session backed by a keep-alive connection pool.
+    The session can be shared between several ApiCaller instances (e.g. one per tenant),
+    so that all of them reuse the same TCP/TLS connections to the API and Visma Connect.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        pool_block=pool_block,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
@@ -0,0 +1,107 @@
+import os
+import json
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows
+    fcntl = None
+
+# (token url, client id, scope)
+TokenKey = Tuple[str, str, str]
+
+
+class FileTokenCache:
+    """
+    Token cache in a JSON file shared by all the local processes that use the same
+    path, so that a new worker reuses a token fetched by another one.
+    The file is only readable by its owner (0o600), and is rewritten atomically.
+    Use locked() around a load and a store to make sure only one process fetches a
+    new token at a time. Locking is skipped on platforms without fcntl.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = os.path.expanduser(path)
+        self.lock_path = self.path + ".lock"
+
+    @contextmanager
+    def locked(self) -> Iterator[None]:
+        """
+        Holds an exclusive lock on the cache across processes.
+        """
+        self._make_dir()
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            # Closing the file releases the lock
+            os.close(fd)
+
+    def load(self, key: TokenKey) -> Optional[Dict]:
+        """
+        Returns the cached {"token", "fetched_at", "expires_in"} for the key, or None
+        if there is none or it has expired.
+        """
+        entry = self._read().get(_entry_name(key))
+        if entry is None or _expired(entry):
+            return None
+        return entry
+
+    def store(
+        self, key: TokenKey, token: str, fetched_at: float, expires_in: float
+    ) -> None:
+        entries = {
+            name: entry for name, entry in self._read().items() if not _expired(entry)
+        }
+        entries[_entry_name(key)] = {
+            "token": token,
+            "fetched_at": fetched_at,
+            "expires_in": expires_in,
+        }
+        self._write(entries)
+
+    def clear(self) -> None:
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _read(self) -> Dict[str, Dict]:
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print("Ignoring unreadable token cache", self.path, e)
+            return {}
+
+    def _write(self, entries: Dict[str, Dict]) -> None:
+        self._make_dir()
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            # The file may already have existed with other permissions
+            if hasattr(os, "fchmod"):
+                os.fchmod(fd, 0o600)
+            with os.fdopen(fd, "w") as f:
+                json.dump(entries, f)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+        os.replace(tmp_path, self.path)
+
+    def _make_dir(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+
+
+def _entry_name(key: TokenKey) -> str:
+    return " ".join(key)
+
+
+def _expired(entry: Dict) -> bool:
+    return time.time() >= entry["fetched_at"] + entry["expires_in"]
@@ -1,52 +1,201 @@
 import os
 import time
 import json
+import threading
 import requests
-from typing import Dict
+from typing import Dict, Optional, Tuple
 
 from src.demo.api.constants import (
     VISMA_CONNECT_CLIENT_ID,
     VISMA_CONNECT_TOKEN_URL,
     VISMA_CONNECT_KEY_STAGE,
     VISMA_CONNECT_API_SCOPE,
+    REQUEST_TIMEOUT,
+    TOKEN_EXPIRY_MARGIN,
+    TOKEN_REFRESH_AHEAD,
+    TOKEN_REFRESH_RETRY_INTERVAL,
+    TOKEN_CACHE_FILE,
+)
+from src.demo.api.token_cache import FileTokenCache
+from src.demo.api.errors import (
+    MAX_BODY_LENGTH,
+    AuthenticationError,
+    TimeDetectError,
+    error_for_exception,
+    error_for_response,
 )
 
-class TokenHandler:
+class _CachedToken:
     """
-    Class for handling logic related to fetching API tokens from Visma Connect.
-    Initialize a TokenHandler, and call the get_token method whenever a token is needed.
+    A token shared by all TokenHandlers of the process with the same client and scope.
     """
 
     def __init__(self) -> None:
+        self.token: Optional[str] = None
+        self.fetched_at: float = 0.0
+        self.expires_in: float = 0.0
+        self.lock = threading.Lock()
+        self.refreshing = False
+        self.refresh_failed_at: float = 0.0
+
+    @property
+    def expires_at(self) -> float:
+        return self.fetched_at + self.expires_in
+
+
+_token_cache: Dict[Tuple[str, str, str], _CachedToken] = {}
+_token_cache_lock = threading.Lock()
+
+
+def clear_token_cache() -> None:
+    """
+    Forgets all the tokens cached in this process.
+    """
+    with _token_cache_lock:
+        _token_cache.clear()
+
+class TokenHandler:
+    """
+    Class for handling logic related to fetching API tokens from Visma Connect. Tokens
+    are shared by the whole process, refreshed in the background before they expire, and
+    shared between processes through a cache_file or TOKEN_CACHE_FILE.
+    """
+
+    def __init__(
+        self,
+        session: requests.Session = None,
+        timeout=REQUEST_TIMEOUT,
+        client_id: str = VISMA_CONNECT_CLIENT_ID,
+        scope: str = VISMA_CONNECT_API_SCOPE,
+        token_url: str = VISMA_CONNECT_TOKEN_URL,
+        cache_file: str = None,
+    ) -> None:
+        self.session = session or requests.Session()
+        self.timeout = timeout
+        self.client_id = client_id
+        self.scope = scope
+        self.token_url = token_url
         self.visma_connect_client_secret = os.environ.get(VISMA_CONNECT_KEY_STAGE)
-        self._fetch_new_token()
+        cache_file = cache_file or os.environ.get(TOKEN_CACHE_FILE)
+        self.file_cache = FileTokenCache(cache_file) if cache_file else None
 
     def get_token(self):
-        current_time = time.time()
-        if (
-            self.token != None
-            and self.token_fetched_time != None
-            and current_time - self.token_fetched_time <= self.expires_in
-        ):
-            return self.token
-        else:
-            self._fetch_new_token()
-            return self.token
-
-    def _fetch_new_token(self) -> None:
+        cached = self._cached_token()
+        if self._is_valid(cached):
+            if self._should_refresh(cached):
+                self._refresh_in_background(cached)
+            return cached.token
+
+        with cached.lock:
+            # Another thread may have fetched the token while we waited for the lock
+            if not self._is_valid(cached):
+                self._update_token(cached)
+        return cached.token
+
+    def _key(self) -> Tuple[str, str, str]:
+        return self.token_url, self.client_id, self.scope
+
+    def _cached_token(self) -> _CachedToken:
+        key = self._key()
+        with _token_cache_lock:
+            if key not in _token_cache:
+                _token_cache[key] = _CachedToken()
+            return _token_cache[key]
+
+    def _is_valid(self, cached: _CachedToken) -> bool:
+        return (
+            cached.token is not None
+            and time.time() < cached.expires_at - TOKEN_EXPIRY_MARGIN
+        )
+
+    def _refresh_due(self, cached: _CachedToken) -> bool:
+        refresh_at = cached.fetched_at + cached.expires_in * TOKEN_REFRESH_AHEAD
+        return time.time() >= refresh_at
+
+    def _should_refresh(self, cached: _CachedToken) -> bool:
+        return (
+            not cached.refreshing
+            and self._refresh_due(cached)
+            and time.time() >= cached.refresh_failed_at + TOKEN_REFRESH_RETRY_INTERVAL
+        )
+
+    def _refresh_in_background(self, cached: _CachedToken) -> None:
+        if not cached.lock.acquire(blocking=False):
+            return  # Already being fetched
+        cached.refreshing = True
+
+        def refresh() -> None:
+            fetched_at = cached.fetched_at
+            try:
+                self._update_token(cached, refresh=True)
+            except TimeDetectError as e:
+                print("Something went wrong when refreshing token:", e)
+            finally:
+                if cached.fetched_at == fetched_at:
+                    cached.refresh_failed_at = time.time()
+                cached.refreshing = False
+                cached.lock.release()
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def _update_token(self, cached: _CachedToken, refresh: bool = False) -> None:
+        """
+        Replaces the cached token, by the one in the file cache if another process
+        already fetched a newer one, or else by a new one from Visma Connect.
+        When refreshing, a token from the file cache that is also due for a refresh is
+        not good enough. Called while holding cached.lock.
+        """
+        if self.file_cache is None:
+            self._fetch_new_token(cached)
+            return
+
+        with self.file_cache.locked():
+            stored = self.file_cache.load(self._key())
+            if stored is not None and stored["fetched_at"] > cached.fetched_at:
+                cached.token = stored["token"]
+                cached.expires_in = stored["expires_in"]
+                cached.fetched_at = stored["fetched_at"]
+                if self._is_valid(cached) and not (
+                    refresh and self._refresh_due(cached)
+                ):
+                    return
+
+            fetched_at = cached.fetched_at
+            self._fetch_new_token(cached)
+            if cached.fetched_at != fetched_at:
+                self.file_cache.store(
+                    self._key(), cached.token, cached.fetched_at, cached.expires_in
+                )
+
+    def _fetch_new_token(self, cached: _CachedToken) -> None:
+        """
+        Raises a TimeDetectError if no token could be fetched.
+        """
         headers = {"Content-Type": "application/x-www-form-urlencoded"}
         payload = (
             f"client_secret={self.visma_connect_client_secret}"
-            f"&client_id={VISMA_CONNECT_CLIENT_ID}"
+            f"&client_id={self.client_id}"
             f"&grant_type=client_credentials"
-            f"&Scope={VISMA_CONNECT_API_SCOPE}"
+            f"&Scope={self.scope}"
         )
-        response = requests.post(VISMA_CONNECT_TOKEN_URL, headers=headers, data=payload)
-
-        if response.status_code == 200:
-            result: Dict = json.loads(response.text)
-            self.token = result["access_token"]
-            self.expires_in = result["expires_in"]
-            self.token_fetched_time = time.time()
-        else:
-            print("Something went wrong when fetching token from Visma Connect")
+        try:
+            response = self.session.post(
+                self.token_url, headers=headers, data=payload, timeout=self.timeout
+            )
+        except requests.RequestException as e:
+            raise error_for_exception("token", e) from e
+
+        if response.status_code in (400, 401, 403):
+            # Visma Connect answers 400 invalid_client to wrong credentials
+            raise AuthenticationError(
+                f"{response.status_code} the client credentials were not accepted",
+                endpoint="token",
+                status_code=response.status_code,
+                body=response.text[:MAX_BODY_LENGTH],
+            )
+        if response.status_code != 200:
+            raise error_for_response("token", response)
+        result: Dict = json.loads(response.text)
+        cached.token = result["access_token"]
+        cached.expires_in = result["expires_in"]
+        cached.fetched_at = time.time()
@@ -0,0 +1,93 @@
+import os
+import json
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from src.demo.api.serialization import registration_hash
+
+# Hex digits of the content hash kept per registration
+HASH_LENGTH = 16
+
+
+@dataclass
+class UploadDelta:
+    """
+    The registrations of an upload that are new or changed since they were last
+    uploaded, and the number of each kind.
+    """
+
+    registrations: List[Dict]
+    hashes: Dict[str, str] = field(repr=False)
+    inserted: int = 0
+    changed: int = 0
+    skipped: int = 0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.inserted} new, {self.changed} changed and "
+            f"{self.skipped} unchanged registrations"
+        )
+
+
+class UploadManifest:
+    """
+    Remembers the content hash of every registration uploaded per dataset, so that
+    uploads can skip registrations that did not change since they were last sent.
+    Call delta before an upload, and commit once the upload job has succeeded.
+    If path is given, the manifest is loaded from and saved to that JSON file.
+    """
+
+    def __init__(self, path: str = None) -> None:
+        self.path = os.path.expanduser(path) if path is not None else None
+        self._hashes: Dict[str, Dict[str, str]] = {}
+        self._lock = threading.Lock()
+        if self.path is not None and os.path.exists(self.path):
+            with open(self.path, "r") as f:
+                self._hashes = json.load(f)
+
+    def delta(self, dataset_id: str, registrations: List[Dict]) -> UploadDelta:
+        with self._lock:
+            uploaded = dict(self._hashes.get(dataset_id, {}))
+        delta = UploadDelta([], {})
+        for registration in registrations:
+            reg_id = str(registration["registrationId"])
+            reg_hash = registration_hash(registration)[:HASH_LENGTH]
+            previous = uploaded.get(reg_id)
+            if previous == reg_hash or delta.hashes.get(reg_id) == reg_hash:
+                delta.skipped += 1
+                continue
+            if previous is None:
+                delta.inserted += 1
+            else:
+                delta.changed += 1
+            delta.registrations.append(registration)
+            delta.hashes[reg_id] = reg_hash
+        return delta
+
+    def commit(self, dataset_id: str, delta: UploadDelta) -> None:
+        """
+        Records the registrations of the delta as uploaded.
+        """
+        with self._lock:
+            self._hashes.setdefault(dataset_id, {}).update(delta.hashes)
+            self._save()
+
+    def forget(self, dataset_id: str) -> None:
+        """
+        Forgets everything uploaded to the dataset, e.g. when it is deleted.
+        """
+        with self._lock:
+            self._hashes.pop(dataset_id, None)
+            self._save()
+
+    def _save(self) -> None:
+        if self.path is None:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._hashes, f)
+        os.replace(tmp_path, self.path)
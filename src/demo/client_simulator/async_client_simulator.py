@@ -0,0 +1,175 @@
+import asyncio
+import requests
+import pandas as pd
+from typing import Awaitable, List, Dict, Optional, Tuple
+
+from src.registration_batch import RegistrationBatch
+from src.demo.api.async_api_caller import AsyncApiCaller
+from src.demo.api.constants import BASE_URL, VISMA_CONNECT_TOKEN_URL
+from src.demo.api.errors import TimeDetectError
+from src.demo.api.instrumentation import Instrumentation, WaitRecord
+from src.demo.client_simulator.job_waiter import JobWaiter, WaitResult
+
+
+class AsyncClientSimulator:
+    """
+    Asyncio counterpart of ClientSimulator for one tenant and many datasets.
+    Uploads, trainings and predictions for different datasets run concurrently on one
+    event loop, with at most max_concurrency datasets in flight at the same time.
+    DataFrames are converted on worker threads, so they do not block the event loop.
+    """
+
+    def __init__(
+        self,
+        tenant_id: str,
+        session: requests.Session = None,
+        max_concurrency: int = 50,
+        job_waiter: JobWaiter = None,
+        instrumentation: Instrumentation = None,
+        base_url: str = BASE_URL,
+        token_url: str = VISMA_CONNECT_TOKEN_URL,
+    ) -> None:
+        self.tenant_id = tenant_id
+        self.api_caller = AsyncApiCaller(
+            tenant_id,
+            session=session,
+            max_workers=max_concurrency,
+            instrumentation=instrumentation,
+            base_url=base_url,
+            token_url=token_url,
+        )
+        self.job_waiter = job_waiter or JobWaiter()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def upload_data(self, dataset_id: str, train_df: pd.DataFrame) -> WaitResult:
+        async with self._semaphore:
+            try:
+                train_regs = await asyncio.to_thread(
+                    RegistrationBatch.from_df, train_df
+                )
+            except ValueError as e:
+                print("Invalid training data for dataset", dataset_id, e)
+                return WaitResult.missing()
+            job_id = await self._call(
+                "uploading data", self.api_caller.upload_data(dataset_id, train_regs)
+            )
+            return await self._wait_for_job(job_id, dataset_id)
+
+    async def start_training(
+        self, dataset_ids: List[str], rebuild_models: bool = True
+    ) -> WaitResult:
+        """
+        Trains all the given datasets with one start_trainer call.
+        """
+        job_id = await self._call(
+            "starting the trainer",
+            self.api_caller.start_trainer(dataset_ids, rebuild_models=rebuild_models),
+        )
+        return await self._wait_for_job(job_id, ",".join(dataset_ids))
+
+    async def predict(
+        self, dataset_id: str, pred_df: pd.DataFrame
+    ) -> Optional[pd.DataFrame]:
+        async with self._semaphore:
+            try:
+                pred_regs, employee_ids = await asyncio.to_thread(
+                    _prediction_input, pred_df
+                )
+            except ValueError as e:
+                print("Invalid prediction data for dataset", dataset_id, e)
+                return None
+            job_id = await self._call(
+                "creating predictions",
+                self.api_caller.create_predictions(dataset_id, pred_regs, employee_ids),
+            )
+            wait_result = await self._wait_for_job(job_id, dataset_id)
+            if not wait_result.succeeded:
+                print("Something wrong with predictions for dataset", dataset_id)
+                print(wait_result.job_status)
+                return None
+            results = await self._call(
+                "getting results", self.api_caller.get_results(job_id)
+            )
+            if results is None:
+                return None
+            result_regs = results["results"][0]["predictions"]
+            return await asyncio.to_thread(pd.DataFrame.from_records, result_regs)
+
+    async def upload_and_train_many(
+        self, train_dfs: Dict[str, pd.DataFrame], rebuild_models: bool = True
+    ) -> WaitResult:
+        """
+        Uploads the data of every dataset concurrently, then trains the datasets whose
+        upload succeeded all at once.
+        """
+        dataset_ids = list(train_dfs.keys())
+        upload_results = await asyncio.gather(
+            *[
+                self.upload_data(dataset_id, train_dfs[dataset_id])
+                for dataset_id in dataset_ids
+            ]
+        )
+        uploaded = [
+            dataset_id
+            for dataset_id, result in zip(dataset_ids, upload_results)
+            if result.succeeded
+        ]
+        failed = len(dataset_ids) - len(uploaded)
+        if failed:
+            print(f"Not training {failed} datasets whose upload failed")
+        if not uploaded:
+            return WaitResult.missing()
+        return await self.start_training(uploaded, rebuild_models=rebuild_models)
+
+    async def predict_many(
+        self, pred_dfs: Dict[str, pd.DataFrame]
+    ) -> Dict[str, Optional[pd.DataFrame]]:
+        """
+        Runs predictions for every dataset concurrently.
+        """
+        dataset_ids = list(pred_dfs.keys())
+        results = await asyncio.gather(
+            *[
+                self.predict(dataset_id, pred_dfs[dataset_id])
+                for dataset_id in dataset_ids
+            ]
+        )
+        return dict(zip(dataset_ids, results))
+
+    async def _wait_for_job(self, job_id: str, dataset_id: str = None) -> WaitResult:
+        """
+        Waits for the given job to succeed, fail or time out.
+        """
+        if job_id is None:
+            return WaitResult.missing()
+        wait_result = await self.job_waiter.wait_async(
+            lambda: self._call(
+                "getting the job status", self.api_caller.get_job_status(job_id)
+            )
+        )
+        if self.api_caller.instrumentation.enabled:
+            self.api_caller.instrumentation.record_wait(
+                WaitRecord.from_wait_result(
+                    self.tenant_id, dataset_id, job_id, wait_result
+                )
+            )
+        return wait_result
+
+    async def _call(self, action: str, call: Awaitable):
+        """
+        Awaits a call of the AsyncApiCaller, and returns None if it failed for good,
+        so that one failing dataset does not abort the others.
+        """
+        try:
+            return await call
+        except TimeDetectError as e:
+            print(f"Something went wrong when {action}:", e)
+            return None
+
+    def close(self) -> None:
+        self.api_caller.close()
+
+
+def _prediction_input(pred_df: pd.DataFrame) -> Tuple[RegistrationBatch, List[str]]:
+    pred_regs = RegistrationBatch.from_df(pred_df)
+    return pred_regs, [str(_id) for _id in pred_df["employeeId"].unique()]
@@ -1,82 +1,262 @@
-import time
+import requests
 import pandas as pd
-from typing import List, Dict
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, List, Dict, Optional, Tuple, Union
 from src.demo.api.api_caller import ApiCaller
+from src.demo.api.constants import BASE_URL, VISMA_CONNECT_TOKEN_URL
+from src.demo.api.errors import TimeDetectError
+from src.demo.api.instrumentation import Instrumentation, WaitRecord
+from src.demo.api.prediction_cache import PredictionCache
+from src.demo.api.rate_limiter import RateLimiter
+from src.demo.api.real_time_batcher import RealTimePredictionBatcher
+from src.demo.api.serialization import SpooledBody
+from src.demo.api.upload_manifest import UploadDelta, UploadManifest
+from src.registration_batch import RegistrationBatch
+from src.demo.client_simulator.job_waiter import JobWaiter, WaitResult
+from src.demo.client_simulator.stage_timings import StageTimings
+from src.demo.client_simulator.day_results import DayResults
+from src.utils import batches_to_table, from_arrow, save_batches_to_file
 
 class ClientSimulator:
     """
     Class with methods to simulate client calling API with one dataset (customer)
     """
 
-    def __init__(self, tenant_id: str, dataset_id: str) -> None:
+    def __init__(
+        self,
+        tenant_id: str,
+        dataset_id: str,
+        session: requests.Session = None,
+        job_waiter: JobWaiter = None,
+        rate_limiter: RateLimiter = None,
+        realtime_batcher: RealTimePredictionBatcher = None,
+        prediction_cache: PredictionCache = None,
+        upload_manifest: UploadManifest = None,
+        instrumentation: Instrumentation = None,
+        base_url: str = BASE_URL,
+        token_url: str = VISMA_CONNECT_TOKEN_URL,
+    ) -> None:
+        """
+        Pass a realtime_batcher shared by many simulators to batch their real-time
+        predictions together, a prediction_cache to reuse predictions of
+        registrations that were already sent, and an upload_manifest to only upload
+        registrations that are new or changed.
+        An instrumentation records every request and every wait for a job. Pass
+        base_url and token_url to use another server, e.g. a mock one.
+        """
         self.tenant_id = tenant_id
         self.dataset_id = dataset_id
-        self.api_caller = ApiCaller(tenant_id)
+        self.api_caller = ApiCaller(
+            tenant_id,
+            session=session,
+            rate_limiter=rate_limiter,
+            instrumentation=instrumentation,
+            base_url=base_url,
+            token_url=token_url,
+        )
+        self.job_waiter = job_waiter or JobWaiter()
         self.current_job_status = ""
+        self.wait_results: List[WaitResult] = []
+        self.stage_timings = StageTimings()
+        self.realtime_batcher = realtime_batcher
+        self.prediction_cache = prediction_cache
+        self.upload_manifest = upload_manifest
 
-    def upload_data(self, train_df: pd.DataFrame):
-        train_regs = train_df.to_dict("records")
+    def upload_data(self, train_df: pd.DataFrame, batch_size: int = None) -> bool:
+        """
+        Uploads the data in one request, or in parallel batches if batch_size is given.
+        Returns whether all the uploads succeeded.
+        """
+        try:
+            train_regs = RegistrationBatch.from_df(train_df)
+        except ValueError as e:
+            print("Invalid training data:", e)
+            return False
         print("Uploading data")
+        delta = self._upload_delta(train_regs)
+        if delta is not None:
+            train_regs = delta.registrations
+            if not train_regs:
+                return True
         self._reset_job_status()
-        self.api_caller.upload_data(self.dataset_id, train_regs)
-        while True:
-            time.sleep(5)
-            if self._is_finished():
-                break
+        if batch_size is None:
+            self._call(
+                "uploading data",
+                self.api_caller.upload_data,
+                self.dataset_id,
+                train_regs,
+            )
+            succeeded = self._wait_for_job().succeeded
+        else:
+            job_ids = self.api_caller.upload_data_in_batches(
+                self.dataset_id, train_regs, batch_size=batch_size
+            )
+            succeeded = True
+            for job_id in job_ids:
+                if job_id is None:
+                    succeeded = False
+                    continue
+                self._reset_job_status()
+                succeeded = self._wait_for_job(job_id).succeeded and succeeded
+        if succeeded and delta is not None:
+            self.upload_manifest.commit(self.dataset_id, delta)
+        return succeeded
 
-    def start_training(self):
+    def start_training(
+        self, dataset_ids: List[str] = None, rebuild_models: bool = True
+    ) -> bool:
+        """
+        Trains this dataset, or all the given datasets of the tenant with one call.
+        Returns whether the training succeeded.
+        """
         print("Training")
         self._reset_job_status()
-        self.api_caller.start_trainer(self.dataset_id)
-        while True:
-            time.sleep(5)
-            if self._is_finished():
-                break
+        self._call(
+            "starting the trainer",
+            self.api_caller.start_trainer,
+            dataset_ids or self.dataset_id,
+            rebuild_models=rebuild_models,
+        )
+        if self._wait_for_job().succeeded:
+            self._models_updated(dataset_ids)
+            return True
+        return False
 
-    def stream_day_by_day(self, stream_df: pd.DataFrame) -> pd.DataFrame:
+    def stream_day_by_day(
+        self, stream_data: Union[pd.DataFrame, Iterable[List[Dict]]]
+    ) -> pd.DataFrame:
+        """
+        Uploads the data and updates the models one day at a time.
+        stream_data is a DataFrame, or an iterable of per-day lists of registrations
+        (e.g. DataGenerator.iter_registrations).
+        With an upload_manifest, only new or changed registrations are uploaded, and
+        days without any are skipped altogether.
+        """
         print("Streaming")
-        stream_regs = stream_df.to_dict("records")
-        for date in sorted(stream_df["date"].unique()):
-            next_day_pred_regs = [reg for reg in stream_regs if reg["date"] == date]
-
+        for date, next_day_pred_regs in iter_days(stream_data):
             print("\nStreaming for date", date)
+            delta = self._upload_delta(next_day_pred_regs)
+            if delta is not None:
+                next_day_pred_regs = delta.registrations
+                if not next_day_pred_regs:
+                    continue
             self._reset_job_status()
-            self.api_caller.upload_data(self.dataset_id, next_day_pred_regs)
+            self._call(
+                "uploading data",
+                self.api_caller.upload_data,
+                self.dataset_id,
+                next_day_pred_regs,
+            )
 
-            while True:
-                time.sleep(10)
-                if self._is_finished():
-                    break
+            if self._wait_for_job().succeeded and delta is not None:
+                self.upload_manifest.commit(self.dataset_id, delta)
 
             print("Updating models for date", date)
             self._reset_job_status()
-            self.api_caller.start_trainer(self.dataset_id, rebuild_models=False)
-            while True:
-                time.sleep(10)
-                if self._is_finished():
-                    break
+            self._call(
+                "starting the trainer",
+                self.api_caller.start_trainer,
+                self.dataset_id,
+                rebuild_models=False,
+            )
+            if self._wait_for_job().succeeded:
+                self._models_updated()
 
     def predict(self, pred_df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Returns the predictions, or None if they failed. They are streamed in batches
+        and assembled into Arrow columns batch by batch, so only one batch at a time is
+        held as dicts.
+        """
+        print("Predicting")
+        batches = self._predict_batches(pred_df)
+        if batches is None:
+            return None
+        table = self._call("getting results", batches_to_table, batches)
+        if table is None:
+            return None
+        result_df = from_arrow(table)
+        print("Got", len(result_df), "results")
+        return result_df
+
+    def predict_to_file(self, pred_df: pd.DataFrame, file_path: str) -> Optional[int]:
+        """
+        Like predict, but writes the predictions to a Parquet, Arrow or JSON file (by
+        extension) batch by batch as they are received, so memory stays bounded however
+        many predictions the job returns. Returns the number of predictions, or None if
+        they failed.
+        """
         print("Predicting")
-        pred_regs = pred_df.to_dict("records")
+        batches = self._predict_batches(pred_df)
+        if batches is None:
+            return None
+        count = self._call("getting results", save_batches_to_file, batches, file_path)
+        if count is not None:
+            print("Saved", count, "results to", file_path)
+        return count
+
+    def _predict_batches(self, pred_df: pd.DataFrame) -> Optional[Iterable[List[Dict]]]:
+        """
+        Runs a prediction job, unless the prediction cache has the predictions, and
+        returns the predictions in batches, streamed as they are iterated. Returns None
+        if the job failed.
+        """
+        try:
+            pred_regs = RegistrationBatch.from_df(pred_df)
+        except ValueError as e:
+            print("Invalid prediction data:", e)
+            return None
         self._reset_job_status()
 
-        employee_ids = [_id for _id in pred_df["employeeId"].unique()]
-
-        self.api_caller.create_predictions(self.dataset_id, pred_regs, employee_ids)
-        while True:
-            time.sleep(10)
-            if self._is_finished():
-                break
-        if self.current_job_status.get("status") == "success":
-            results = self.api_caller.get_results()
-            result_regs = results["results"][0]["predictions"]
-            result_df = pd.DataFrame.from_records(result_regs)
-            print("Got", len(result_df), "results")
-            return result_df
+        employee_ids = [str(_id) for _id in pred_df["employeeId"].unique()]
+
+        cache_key = None
+        model_version = self._model_version()
+        if model_version is not None:
+            # Aggregated predictions depend on the whole request, so it is cached as one
+            cached_regs, request_key = self.prediction_cache.get_batch(
+                self.dataset_id, model_version, pred_regs, employee_ids
+            )
+            if cached_regs is not None:
+                print("Got", len(cached_regs), "cached results")
+                return [cached_regs]
+            cache_key = (self.dataset_id, model_version, request_key)
+
+        self._call(
+            "creating predictions",
+            self.api_caller.create_predictions,
+            self.dataset_id,
+            pred_regs,
+            employee_ids,
+        )
+        if self._wait_for_job().succeeded:
+            batches = self.api_caller.iter_results()
+            if cache_key is not None:
+                batches = self._cache_batches(cache_key, batches)
+            return batches
         else:
             print("Something wrong with predictions")
             print(self.current_job_status)
+            return None
+
+    def _cache_batches(
+        self, cache_key: Tuple, batches: Iterable[List[Dict]]
+    ) -> Iterator[List[Dict]]:
+        """
+        Passes the batches on, and caches all their predictions once the last one has
+        been received. Jobs of more than max_job_size predictions are not cached, and
+        their predictions are no longer kept as soon as they exceed it.
+        """
+        result_regs = []
+        for batch in batches:
+            if result_regs is not None:
+                result_regs.extend(batch)
+                if len(result_regs) > self.prediction_cache.max_job_size:
+                    result_regs = None
+            yield batch
+        if result_regs is not None:
+            self.prediction_cache.put(cache_key, result_regs)
 
     def predict_realtime(self, pred_data: List[Dict]) -> pd.DataFrame:
         print("Predicting")
@@ -84,108 +264,407 @@ class ClientSimulator:
         pred_data = pred_data.to_dict("records")
 
         try:
-            results: Dict[
-                str, List[Dict[str, List]]
-            ] = self.api_caller.get_real_time_predictions(self.dataset_id, pred_data)
-            return results["results"][0]["predictions"]
+            model_version = self._model_version()
+            if model_version is None:
+                return self._get_realtime_predictions(pred_data)
+
+            # Only send the registrations without a cached prediction
+            predictions, hashes = self.prediction_cache.get_realtime(
+                self.dataset_id, model_version, pred_data
+            )
+            unseen = [
+                i for i, prediction in enumerate(predictions) if prediction is None
+            ]
+            if unseen:
+                new_predictions = {
+                    prediction["registrationId"]: prediction
+                    for prediction in self._get_realtime_predictions(
+                        [pred_data[i] for i in unseen]
+                    )
+                }
+                for i in unseen:
+                    prediction = new_predictions.get(pred_data[i]["registrationId"])
+                    if prediction is not None:
+                        self.prediction_cache.put(
+                            (self.dataset_id, model_version, hashes[i]), prediction
+                        )
+                        predictions[i] = prediction
+            print(len(pred_data) - len(unseen), "predictions were cached")
+            return [prediction for prediction in predictions if prediction is not None]
         except:
             print("Something wrong with realtime predictions")
 
+    def _get_realtime_predictions(self, registrations: List[Dict]) -> List[Dict]:
+        if self.realtime_batcher is not None:
+            return self.realtime_batcher.predict(self.dataset_id, registrations)
+        results: Dict[
+            str, List[Dict[str, List]]
+        ] = self.api_caller.get_real_time_predictions(self.dataset_id, registrations)
+        return results["results"][0]["predictions"]
+
+    def _upload_delta(self, registrations: List[Dict]) -> Optional[UploadDelta]:
+        """
+        The new or changed registrations, or None without an upload_manifest.
+        """
+        if self.upload_manifest is None:
+            return None
+        delta = self.upload_manifest.delta(self.dataset_id, registrations)
+        print("Uploading", delta)
+        return delta
+
+    def _model_version(self) -> Optional[str]:
+        """
+        Model version of the dataset for the prediction cache, or None if predictions
+        should not be cached.
+        """
+        if self.prediction_cache is None:
+            return None
+        return self.prediction_cache.model_version(
+            self.dataset_id,
+            lambda: self._call(
+                "getting data info", self.api_caller.get_data_info, self.dataset_id
+            ),
+        )
+
+    def _models_updated(self, dataset_ids: List[str] = None) -> None:
+        """
+        Drops the cached predictions of the trained datasets.
+        """
+        if self.prediction_cache is None:
+            return
+        for dataset_id in dataset_ids or [self.dataset_id]:
+            self.prediction_cache.invalidate(dataset_id)
+
     def stream_and_predict_day_by_day(
-        self, pred_df: pd.DataFrame, employee_ids=None
-    ) -> pd.DataFrame:
+        self,
+        pred_data: Union[pd.DataFrame, Iterable[List[Dict]]],
+        employee_ids=None,
+        pipeline_depth: int = 0,
+        results_path: str = None,
+    ) -> Optional[pd.DataFrame]:
         """
         Attempts to simulate realistic scenario where a cleitn typically at the end of each day
         - Fetches predictions on new data
         - Uploads new data that is approved
         - Updates models
+        pred_data is a DataFrame or an iterable of per-day lists of registrations.
+        Returns all the predictions, or None if they are written to results_path.
         """
         print("Streaming and predicting")
-        counter = 1
-        if employee_ids is None:
-            employee_ids = [_id for _id in pred_df["employeeId"].unique()]
-        pred_regs = pred_df.to_dict("records")
-        all_results = []
-        for date in sorted(pred_df["date"].unique()):
-            next_day_pred_regs = [reg for reg in pred_regs if reg["date"] == date]
+        if employee_ids is None and isinstance(pred_data, pd.DataFrame):
+            employee_ids = [_id for _id in pred_data["employeeId"].unique()]
+        day_results = DayResults(results_path)
+        if pipeline_depth > 0:
+            return self._stream_and_predict_pipelined(
+                pred_data, employee_ids, pipeline_depth, day_results
+            )
+        for date, next_day_pred_regs in iter_days(pred_data):
+            day_employee_ids = employee_ids
+            if day_employee_ids is None:
+                day_employee_ids = list(
+                    dict.fromkeys(reg["employeeId"] for reg in next_day_pred_regs)
+                )
 
             print("\nPredicting for date", date)
             self._reset_job_status()
-            self.api_caller.create_predictions(
-                self.dataset_id, next_day_pred_regs, employee_ids
-            )
-            while True:
-                time.sleep(5)
-                if self._is_finished():
-                    break
-            if self.current_job_status.get("status") == "success":
-                results = self.api_caller.get_results()
-                result_regs = results["results"][0]["predictions"]
-                result_df = pd.DataFrame.from_records(result_regs)
-                result_df["call_count"] = counter
-                counter += 1
-                print("Got", len(result_df), "results")
-                all_results.append(result_df)
+            self._call(
+                "creating predictions",
+                self.api_caller.create_predictions,
+                self.dataset_id,
+                next_day_pred_regs,
+                day_employee_ids,
+            )
+            wait_result = self._wait_for_job()
+            count = None
+            if wait_result.succeeded:
+                count = self._call(
+                    "getting results",
+                    day_results.add,
+                    date,
+                    next_day_pred_regs,
+                    self.api_caller.iter_results(),
+                )
+            if count is not None:
+                print("Got", count, "results")
             else:
+                day_results.add_failed(next_day_pred_regs)
                 print("Something wrong with predictions")
                 print(self.current_job_status)
 
             print("Uploading data for date", date)
             self._reset_job_status()
-            self.api_caller.upload_data(self.dataset_id, next_day_pred_regs)
+            self._call(
+                "uploading data",
+                self.api_caller.upload_data,
+                self.dataset_id,
+                next_day_pred_regs,
+            )
 
-            while True:
-                time.sleep(5)
-                if self._is_finished():
-                    break
+            self._wait_for_job()
 
             print("Updating models for date", date)
             self._reset_job_status()
-            self.api_caller.start_trainer(self.dataset_id, rebuild_models=False)
-            while True:
-                time.sleep(5)
-                if self._is_finished():
-                    break
-
-        results = pd.concat(all_results, ignore_index=True)
-        lost_predictions = pred_df[
-            ~pred_df.registrationId.isin(results.registrationId.unique())
-        ]
-        if len(lost_predictions) > 0:
-            print(
-                "Warning:",
-                len(lost_predictions),
-                "registrations did not recieve any predictions",
+            self._call(
+                "starting the trainer",
+                self.api_caller.start_trainer,
+                self.dataset_id,
+                rebuild_models=False,
+            )
+            if self._wait_for_job().succeeded:
+                self._models_updated()
+
+        _warn_lost(day_results)
+        return day_results.to_df()
+
+    def _stream_and_predict_pipelined(
+        self,
+        pred_data: Union[pd.DataFrame, Iterable[List[Dict]]],
+        employee_ids: Optional[List[str]],
+        pipeline_depth: int,
+        day_results: DayResults,
+    ) -> Optional[pd.DataFrame]:
+        """
+        Pipelined version of stream_and_predict_day_by_day: the next days are serialized
+        and each day's upload runs alongside its prediction, but every day is still
+        predicted with the models trained up to the day before.
+        """
+        days = iter_days(pred_data)
+        prepared: deque = deque()
+        with ThreadPoolExecutor(max_workers=1) as prepare_executor, ThreadPoolExecutor(
+            max_workers=1
+        ) as upload_executor:
+
+            def prepare_next_day() -> None:
+                day = next(days, None)
+                if day is not None:
+                    date, regs = day
+                    prepared.append(
+                        (
+                            date,
+                            regs,
+                            prepare_executor.submit(self._prepare_upload, regs),
+                        )
+                    )
+
+            for _ in range(pipeline_depth + 1):
+                prepare_next_day()
+
+            while prepared:
+                date, next_day_pred_regs, body_future = prepared.popleft()
+                prepare_next_day()
+                day_employee_ids = employee_ids
+                if day_employee_ids is None:
+                    day_employee_ids = list(
+                        dict.fromkeys(reg["employeeId"] for reg in next_day_pred_regs)
+                    )
+
+                print("\nPredicting and uploading data for date", date)
+                upload_future = upload_executor.submit(
+                    self._upload_prepared, body_future
+                )
+                self._predict_day(
+                    date, next_day_pred_regs, day_employee_ids, day_results
+                )
+                upload_result = upload_future.result()
+                if upload_result is None or not upload_result.succeeded:
+                    print("Something wrong with upload for date", date)
+
+                print("Updating models for date", date)
+                with self.stage_timings.time("train"):
+                    job_id = self._call(
+                        "starting the trainer",
+                        self.api_caller.start_trainer,
+                        self.dataset_id,
+                        rebuild_models=False,
+                    )
+                    if self._wait_for(job_id).succeeded:
+                        self._models_updated()
+
+        _warn_lost(day_results)
+        print(self.stage_timings.report())
+        return day_results.to_df()
+
+    def _prepare_upload(self, registrations: List[Dict]) -> SpooledBody:
+        with self.stage_timings.time("prepare"):
+            return self.api_caller.prepare_upload(self.dataset_id, registrations)
+
+    def _upload_prepared(self, body_future: Future) -> Optional[WaitResult]:
+        body = body_future.result()
+        with self.stage_timings.time("upload"):
+            job_id = self.api_caller.upload_prepared(body, self.dataset_id)
+            if job_id is None:
+                return None
+            return self._wait_for(job_id)
+
+    def _predict_day(
+        self,
+        date: str,
+        registrations: List[Dict],
+        employee_ids: List[str],
+        day_results: DayResults,
+    ) -> None:
+        with self.stage_timings.time("predict"):
+            job_id = self._call(
+                "creating predictions",
+                self.api_caller.create_predictions,
+                self.dataset_id,
+                registrations,
+                employee_ids,
+            )
+            wait_result = self._wait_for(job_id)
+            if not wait_result.succeeded:
+                day_results.add_failed(registrations)
+                print("Something wrong with predictions")
+                print(wait_result.job_status)
+                return
+            count = self._call(
+                "getting results",
+                day_results.add,
+                date,
+                registrations,
+                self.api_caller.iter_results(job_id),
             )
+        if count is None:
+            day_results.add_failed(registrations)
+        else:
+            print("Got", count, "results")
 
-        return results
+    def _wait_for(self, job_id: str) -> WaitResult:
+        """
+        Waits for the given job without touching current_job_status, so that several
+        jobs can be waited for from different threads.
+        """
+        if job_id is None:
+            return WaitResult.missing()
+        wait_result = self.job_waiter.wait(
+            lambda: self._call(
+                "getting the job status",
+                self.api_caller.get_job_status,
+                print_status=False,
+                job_id=job_id,
+            )
+        )
+        self._record_wait(job_id, wait_result)
+        return wait_result
 
     def delete_dataset(self):
         print("Deleting dataset")
         print("\nAll datasets before:")
-        print(self.api_caller.get_data_info())
-        self.api_caller.delete_dataset(self.dataset_id)
+        print(self._call("getting data info", self.api_caller.get_data_info))
+        self._call(
+            "deleting the dataset", self.api_caller.delete_dataset, self.dataset_id
+        )
+        if self.upload_manifest is not None:
+            self.upload_manifest.forget(self.dataset_id)
         print("\nAll datasets after:")
-        print(self.api_caller.get_data_info())
+        print(self._call("getting data info", self.api_caller.get_data_info))
 
-    def _is_finished(self) -> bool:
+    def _wait_for_job(self, job_id: str = None) -> WaitResult:
         """
-        Wether the job with the current job id finished or not.
+        Waits for the given job, or the job with the current job id, to succeed, fail
+        or time out.
         """
-        job_status = self.api_caller.get_job_status(print_status=False)
+        wait_result = self.job_waiter.wait(lambda: self._get_job_status(job_id))
+        self._record_wait(job_id or self.api_caller.current_job_id, wait_result)
+        if wait_result.succeeded:
+            print("Job finished successfully")
+        else:
+            print(
+                f"Job did not finish successfully ({wait_result.outcome})",
+                wait_result.job_status,
+            )
+        return wait_result
+
+    def _record_wait(self, job_id: str, wait_result: WaitResult) -> None:
+        self.wait_results.append(wait_result)
+        instrumentation = self.api_caller.instrumentation
+        if instrumentation.enabled:
+            instrumentation.record_wait(
+                WaitRecord.from_wait_result(
+                    self.tenant_id, self.dataset_id, job_id, wait_result
+                )
+            )
+
+    def _get_job_status(self, job_id: str = None) -> Dict:
+        job_status = self._call(
+            "getting the job status",
+            self.api_caller.get_job_status,
+            print_status=False,
+            job_id=job_id,
+        )
         if job_status != self.current_job_status:
             print(job_status)
             self.current_job_status = job_status
-        if job_status is None:
-            print("Job status is None")
-            return True
-        if job_status.get("status") == "success":
-            print("Job finished successfully")
-            return True
-        return False
+        return job_status
 
     def _reset_job_status(self):
         self.current_job_status = ""
 
     def get_data_info(self, dataset_id: str) -> Dict:
-        return self.api_caller.get_data_info(dataset_id)
+        return self._call(
+            "getting data info", self.api_caller.get_data_info, dataset_id
+        )
+
+    def _call(self, action: str, func: Callable, *args, **kwargs):
+        """
+        Calls the ApiCaller, and returns None if the call failed for good (after its
+        retries): the error is printed, and the simulation carries on as it does when
+        a job fails.
+        """
+        try:
+            return func(*args, **kwargs)
+        except TimeDetectError as e:
+            print(f"Something went wrong when {action}:", e)
+            return None
+
+
+def _warn_lost(day_results: DayResults) -> None:
+    if day_results.lost > 0:
+        print(
+            "Warning:",
+            day_results.lost,
+            "registrations did not recieve any predictions",
+        )
+
+
+def iter_days(
+    data: Union[pd.DataFrame, Iterable[List[Dict]]]
+) -> Iterator[Tuple[str, List[Dict]]]:
+    """
+    Yields (date, registrations of that date) in date order.
+    A DataFrame is partitioned by date in one pass, and only one day is converted to
+    records at a time. Any other iterable is taken to already hold one list of
+    registrations per day, in order.
+    """
+    if isinstance(data, pd.DataFrame):
+        for date, day_df in data.groupby("date", sort=True):
+            yield date, day_df.to_dict("records")
+    else:
+        for day_regs in data:
+            if day_regs:
+                yield day_regs[0]["date"], day_regs
+
+
+def stream_and_predict_many(
+    simulators_and_data: List[
+        Tuple["ClientSimulator", Union[pd.DataFrame, Iterable[List[Dict]]]]
+    ],
+    max_workers: int = 8,
+    pipeline_depth: int = 1,
+) -> Dict[str, pd.DataFrame]:
+    """
+    Runs stream_and_predict_day_by_day for independent datasets concurrently, one
+    ClientSimulator per dataset. Give the simulators a shared session (see
+    create_session) so they share one connection pool.
+    Returns the results per dataset id.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            simulator.dataset_id: executor.submit(
+                simulator.stream_and_predict_day_by_day,
+                data,
+                pipeline_depth=pipeline_depth,
+            )
+            for simulator, data in simulators_and_data
+        }
+        return {dataset_id: future.result() for dataset_id, future in futures.items()}
@@ -0,0 +1,71 @@
+import pyarrow as pa
+import pandas as pd
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+from src.utils import batches_to_table, from_arrow, save_batches_to_file
+
+CALL_COUNT_COL = "call_count"
+
+
+class DayResults:
+    """
+    Collects the predictions of stream_and_predict_day_by_day day by day, as they
+    are streamed: as Arrow tables, concatenated into one DataFrame at the end, or
+    written to {results_path}/{date}.parquet if a results_path is given, so that no
+    more than one batch of predictions is ever held as dicts.
+    Every prediction gets the number of the day's successful prediction call in
+    call_count. lost counts the registrations that got no prediction on their day.
+    """
+
+    def __init__(self, results_path: str = None) -> None:
+        self.results_path = results_path
+        self.call_count = 0
+        self.lost = 0
+        self._tables: List[pa.Table] = []
+
+    def add(
+        self, date: str, registrations: List[Dict], batches: Iterable[List[Dict]]
+    ) -> int:
+        """
+        Collects the predictions of one day, and returns their number.
+        """
+        call_count = self.call_count + 1
+        received: Set[str] = set()
+
+        def tagged() -> Iterator[List[Dict]]:
+            for batch in batches:
+                for prediction in batch:
+                    prediction[CALL_COUNT_COL] = call_count
+                    received.add(prediction["registrationId"])
+                yield batch
+
+        if self.results_path is None:
+            table = batches_to_table(tagged())
+            self._tables.append(table)
+            count = table.num_rows
+        else:
+            count = save_batches_to_file(
+                tagged(), f"{self.results_path}/{date}.parquet"
+            )
+        self.call_count = call_count
+        self.lost += sum(
+            1 for reg in registrations if reg["registrationId"] not in received
+        )
+        return count
+
+    def add_failed(self, registrations: List[Dict]) -> None:
+        """
+        Counts the registrations of a day whose predictions failed as lost.
+        """
+        self.lost += len(registrations)
+
+    def to_df(self) -> Optional[pd.DataFrame]:
+        """
+        All the predictions collected, or None if they were written to files.
+        """
+        if self.results_path is not None:
+            return None
+        tables = [table for table in self._tables if table.num_rows > 0]
+        if not tables:
+            return pd.DataFrame()
+        return from_arrow(pa.concat_tables(tables, promote_options="permissive"))
@@ -0,0 +1,249 @@
+import json
+import time
+import requests
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from src.utils import load_df_from_file
+from src.demo.api.session import create_session
+from src.demo.api.constants import BASE_URL, VISMA_CONNECT_TOKEN_URL
+from src.demo.api.rate_limiter import RateLimiter
+from src.demo.api.instrumentation import Instrumentation
+from src.demo.client_simulator.client_simulator import ClientSimulator
+from src.demo.client_simulator.job_waiter import JobWaiter
+
+# Keys of a manifest entry
+TENANT_ID_KEY = "tenantId"
+DATASET_ID_KEY = "datasetId"
+TRAIN_FILE_KEY = "trainFile"
+PREDICT_FILE_KEY = "predictFile"
+REBUILD_MODELS_KEY = "rebuildModels"
+
+# Max number of datasets trained with one start_trainer call
+MAX_DATASETS_PER_TRAINER = 50
+
+
+def load_manifest(file_path: str) -> List[Dict]:
+    """
+    Loads a manifest: a JSON list of entries like
+    {"tenantId": ..., "datasetId": ..., "trainFile": ..., "predictFile": ...,
+    "rebuildModels": true}, where the files and rebuildModels are optional.
+    """
+    with open(file_path, "r") as f:
+        return json.load(f)
+
+
+class FleetRunner:
+    """
+    Runs uploads, trainings and predictions for many tenants and datasets at once, on a
+    pool of max_workers threads. Each tenant gets a rate limiter of requests_per_second,
+    and all tenants share one connection pool.
+    """
+
+    def __init__(
+        self,
+        manifest: List[Dict],
+        max_workers: int = 16,
+        requests_per_second: float = 5.0,
+        session: requests.Session = None,
+        job_waiter: JobWaiter = None,
+        results_path: str = None,
+        instrumentation: Instrumentation = None,
+        base_url: str = BASE_URL,
+        token_url: str = VISMA_CONNECT_TOKEN_URL,
+    ) -> None:
+        """
+        If results_path is given, the predictions of every dataset are saved to
+        {results_path}/{tenantId}/{datasetId}.parquet.
+        An instrumentation (e.g. a MetricsInstrumentation) records the requests and
+        job waits of every dataset. Pass base_url and token_url to use another
+        server, e.g. a mock one.
+        """
+        self.manifest = manifest
+        self.max_workers = max_workers
+        self.session = session or create_session(pool_maxsize=max_workers)
+        self.job_waiter = job_waiter or JobWaiter()
+        self.results_path = results_path
+        self.instrumentation = instrumentation
+        self.base_url = base_url
+        self.token_url = token_url
+        self.rate_limiters: Dict[str, RateLimiter] = {
+            tenant_id: RateLimiter(requests_per_second)
+            for tenant_id in {entry[TENANT_ID_KEY] for entry in manifest}
+        }
+        self.records: List[Dict] = []
+
+    def run(self, upload: bool = True, train: bool = True, predict: bool = True):
+        """
+        Runs the selected stages for the whole manifest, and returns a summary with
+        one row per stage. Datasets that fail a stage are skipped in later stages.
+        The per-dataset outcomes are kept in self.records (see failures()).
+        """
+        entries = self.manifest
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            if upload:
+                uploaded = self._run_stage(
+                    executor,
+                    "upload",
+                    [entry for entry in entries if entry.get(TRAIN_FILE_KEY)],
+                    self._upload,
+                )
+                entries = [
+                    entry
+                    for entry in entries
+                    if not entry.get(TRAIN_FILE_KEY) or _key(entry) in uploaded
+                ]
+            if train:
+                trained = self._run_stage(
+                    executor, "train", self._trainer_groups(entries), self._train
+                )
+                entries = [entry for entry in entries if _key(entry) in trained]
+            if predict:
+                self._run_stage(
+                    executor,
+                    "predict",
+                    [entry for entry in entries if entry.get(PREDICT_FILE_KEY)],
+                    self._predict,
+                )
+        summary = self.summary()
+        print(summary)
+        return summary
+
+    def summary(self) -> pd.DataFrame:
+        """
+        Number of datasets, failures, registrations and throughput per stage.
+        """
+        records = pd.DataFrame.from_records(self.records)
+        if records.empty:
+            return records
+        stages = records.groupby("stage", sort=False)
+        summary = stages.agg(
+            datasets=("datasetId", "count"),
+            failures=("ok", lambda ok: int((~ok).sum())),
+            registrations=("registrations", "sum"),
+        )
+        summary["wall_seconds"] = stages["finished"].max() - stages["started"].min()
+        summary["registrations_per_second"] = (
+            summary["registrations"] / summary["wall_seconds"]
+        )
+        return summary.reset_index()
+
+    def failures(self) -> pd.DataFrame:
+        records = pd.DataFrame.from_records(self.records)
+        if records.empty:
+            return records
+        return records[~records["ok"]]
+
+    def _run_stage(
+        self, executor: ThreadPoolExecutor, stage: str, items: List, func: Callable
+    ) -> Set[Tuple[str, str]]:
+        """
+        Runs func on every item on the pool, and records the outcome for every dataset.
+        func takes an item and returns (succeeded, number of registrations).
+        Returns the (tenantId, datasetId) keys of the datasets that succeeded.
+        """
+        print(f"Running {stage} for {len(items)} items")
+        futures = [executor.submit(self._timed, stage, func, item) for item in items]
+        succeeded = set()
+        for future in futures:
+            keys, ok = future.result()
+            if ok:
+                succeeded.update(keys)
+        return succeeded
+
+    def _timed(
+        self, stage: str, func: Callable, item
+    ) -> Tuple[List[Tuple[str, str]], bool]:
+        started = time.time()
+        error = None
+        keys = _keys(item)
+        try:
+            ok, registrations = func(item)
+        except Exception as e:
+            ok, registrations = False, 0
+            error = repr(e)
+        finished = time.time()
+        for tenant_id, dataset_id in keys:
+            self.records.append(
+                {
+                    "stage": stage,
+                    "tenantId": tenant_id,
+                    "datasetId": dataset_id,
+                    "ok": ok,
+                    "registrations": registrations,
+                    "seconds": finished - started,
+                    "started": started,
+                    "finished": finished,
+                    "error": error,
+                }
+            )
+        return keys, ok
+
+    def _simulator(self, tenant_id: str, dataset_id: str) -> ClientSimulator:
+        return ClientSimulator(
+            tenant_id,
+            dataset_id,
+            session=self.session,
+            job_waiter=self.job_waiter,
+            rate_limiter=self.rate_limiters[tenant_id],
+            instrumentation=self.instrumentation,
+            base_url=self.base_url,
+            token_url=self.token_url,
+        )
+
+    def _upload(self, entry: Dict) -> Tuple[bool, int]:
+        train_df = load_df_from_file(entry[TRAIN_FILE_KEY])
+        simulator = self._simulator(entry[TENANT_ID_KEY], entry[DATASET_ID_KEY])
+        return simulator.upload_data(train_df), len(train_df)
+
+    def _trainer_groups(self, entries: List[Dict]) -> List[Tuple[str, bool, List[str]]]:
+        """
+        Groups the datasets that can be trained with one start_trainer call: same
+        tenant and same rebuildModels setting.
+        """
+        groups: Dict[Tuple[str, bool], List[str]] = {}
+        for entry in entries:
+            group = (entry[TENANT_ID_KEY], entry.get(REBUILD_MODELS_KEY, True))
+            groups.setdefault(group, []).append(entry[DATASET_ID_KEY])
+        return [
+            (
+                tenant_id,
+                rebuild_models,
+                dataset_ids[i : i + MAX_DATASETS_PER_TRAINER],
+            )
+            for (tenant_id, rebuild_models), dataset_ids in groups.items()
+            for i in range(0, len(dataset_ids), MAX_DATASETS_PER_TRAINER)
+        ]
+
+    def _train(self, group: Tuple[str, bool, List[str]]) -> Tuple[bool, int]:
+        tenant_id, rebuild_models, dataset_ids = group
+        simulator = self._simulator(tenant_id, dataset_ids[0])
+        return simulator.start_training(dataset_ids, rebuild_models=rebuild_models), 0
+
+    def _predict(self, entry: Dict) -> Tuple[bool, int]:
+        pred_df = load_df_from_file(entry[PREDICT_FILE_KEY])
+        simulator = self._simulator(entry[TENANT_ID_KEY], entry[DATASET_ID_KEY])
+        if self.results_path is not None:
+            # Streamed to the file, without building a DataFrame of the predictions
+            tenant_id, dataset_id = _key(entry)
+            count = simulator.predict_to_file(
+                pred_df, f"{self.results_path}/{tenant_id}/{dataset_id}.parquet"
+            )
+            return count is not None, len(pred_df)
+        result_df: Optional[pd.DataFrame] = simulator.predict(pred_df)
+        return result_df is not None, len(pred_df)
+
+
+def _key(entry: Dict) -> Tuple[str, str]:
+    return entry[TENANT_ID_KEY], entry[DATASET_ID_KEY]
+
+
+def _keys(item) -> List[Tuple[str, str]]:
+    """
+    Dataset keys of a stage item: a manifest entry, or a trainer group.
+    """
+    if isinstance(item, dict):
+        return [_key(item)]
+    tenant_id, _, dataset_ids = item
+    return [(tenant_id, dataset_id) for dataset_id in dataset_ids]
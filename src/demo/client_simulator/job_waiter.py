@@ -0,0 +1,148 @@
+import time
+import random
+import asyncio
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Iterator, Optional
+
+from src.demo.api.constants import JOB_SUCCESS_STATUS, JOB_FAILED_STATUSES
+
+# Outcomes of a wait
+SUCCESS = "success"
+FAILED = "failed"
+TIMEOUT = "timeout"
+MISSING = "missing"
+
+
+@dataclass
+class WaitResult:
+    """
+    Outcome and timing of waiting for one job.
+    """
+
+    outcome: str
+    job_status: Optional[Dict]
+    elapsed: float
+    polls: int
+    time_to_first_poll: float
+
+    @property
+    def succeeded(self) -> bool:
+        return self.outcome == SUCCESS
+
+    @classmethod
+    def missing(cls) -> "WaitResult":
+        """
+        Result for a job that was never created, e.g. because the request failed.
+        """
+        return cls(
+            outcome=MISSING,
+            job_status=None,
+            elapsed=0.0,
+            polls=0,
+            time_to_first_poll=0.0,
+        )
+
+
+class JobWaiter:
+    """
+    Polls the status of a job until it reaches a terminal state or the deadline passes.
+    The first poll happens after initial_delay seconds, and the interval then grows by
+    backoff_factor up to max_interval. Every interval is randomized by +/- jitter
+    (a fraction) so that many waiters do not poll the API in lockstep.
+    """
+
+    def __init__(
+        self,
+        initial_delay: float = 1,
+        backoff_factor: float = 1.5,
+        max_interval: float = 30,
+        jitter: float = 0.2,
+        timeout: Optional[float] = 3600,
+        on_status_change: Callable[[Dict], None] = None,
+    ) -> None:
+        self.initial_delay = initial_delay
+        self.backoff_factor = backoff_factor
+        self.max_interval = max_interval
+        self.jitter = jitter
+        self.timeout = timeout
+        self.on_status_change = on_status_change
+
+    def wait(self, get_status: Callable[[], Dict]) -> WaitResult:
+        start = time.monotonic()
+        state = _WaitState(start)
+        for interval in self._intervals():
+            sleep_time = self._sleep_time(state, interval)
+            if sleep_time is None:
+                return state.result(TIMEOUT)
+            time.sleep(sleep_time)
+            outcome = self._poll(state, get_status())
+            if outcome is not None:
+                return state.result(outcome)
+
+    async def wait_async(self, get_status: Callable[[], Awaitable[Dict]]) -> WaitResult:
+        start = time.monotonic()
+        state = _WaitState(start)
+        for interval in self._intervals():
+            sleep_time = self._sleep_time(state, interval)
+            if sleep_time is None:
+                return state.result(TIMEOUT)
+            await asyncio.sleep(sleep_time)
+            outcome = self._poll(state, await get_status())
+            if outcome is not None:
+                return state.result(outcome)
+
+    def _intervals(self) -> Iterator[float]:
+        interval = self.initial_delay
+        while True:
+            spread = interval * self.jitter
+            yield max(0.0, interval + random.uniform(-spread, spread))
+            interval = min(interval * self.backoff_factor, self.max_interval)
+
+    def _sleep_time(self, state: "_WaitState", interval: float) -> Optional[float]:
+        """
+        How long to sleep before the next poll, or None if the deadline has passed.
+        The last sleep is shortened so that the job is polled once more at the deadline.
+        """
+        if self.timeout is None:
+            return interval
+        remaining = self.timeout - (time.monotonic() - state.start)
+        if remaining <= 0:
+            return None
+        return min(interval, remaining)
+
+    def _poll(self, state: "_WaitState", job_status: Optional[Dict]) -> Optional[str]:
+        """
+        Records one poll, and returns the outcome if the job is in a terminal state.
+        """
+        state.polls += 1
+        if state.polls == 1:
+            state.time_to_first_poll = time.monotonic() - state.start
+        if job_status != state.job_status:
+            state.job_status = job_status
+            if self.on_status_change is not None:
+                self.on_status_change(job_status)
+        if job_status is None:
+            return MISSING
+        status = job_status.get("status")
+        if status == JOB_SUCCESS_STATUS:
+            return SUCCESS
+        if status in JOB_FAILED_STATUSES:
+            return FAILED
+        return None
+
+
+class _WaitState:
+    def __init__(self, start: float) -> None:
+        self.start = start
+        self.polls = 0
+        self.time_to_first_poll = 0.0
+        self.job_status: Optional[Dict] = ""
+
+    def result(self, outcome: str) -> WaitResult:
+        return WaitResult(
+            outcome=outcome,
+            job_status=self.job_status or None,
+            elapsed=time.monotonic() - self.start,
+            polls=self.polls,
+            time_to_first_poll=self.time_to_first_poll,
+        )
@@ -0,0 +1,45 @@
+import time
+import threading
+import pandas as pd
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+
+
+class StageTimings:
+    """
+    Collects the wall-clock duration of each run of the stages of a pipeline.
+    Thread-safe, so stages running in background threads can record into it too.
+    """
+
+    def __init__(self) -> None:
+        self.durations: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def time(self, stage: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def record(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.durations.setdefault(stage, []).append(seconds)
+
+    def report(self) -> pd.DataFrame:
+        """
+        Count, total, mean and max duration in seconds per stage.
+        """
+        with self._lock:
+            rows = [
+                {
+                    "stage": stage,
+                    "count": len(durations),
+                    "total": sum(durations),
+                    "mean": sum(durations) / len(durations),
+                    "max": max(durations),
+                }
+                for stage, durations in self.durations.items()
+            ]
+        return pd.DataFrame(rows, columns=["stage", "count", "total", "mean", "max"])
@@ -3,6 +3,10 @@ DATASET_ID = "your-dataset-id" #TODO: replace with your dataset id
 
 # Path to the data files
 DATA_FILE_PATH = f"data/"
+TRAIN_DATA_FILE_NAME = "train_data"
+PREDICT_DATA_FILE_NAME = "predict_data"
+# Extensions looked for when loading data files, in order of preference
+DATA_FILE_EXTENSIONS = [".parquet", ".arrow", ".json"]
 
 #Width of the data tables
 TABLE_WIDTH_FRACTION = 0.5
@@ -27,6 +31,22 @@ AGGREGATED_COL = "aggregated"
 SIGNIFICANT_FIELDS_COL = "significantFields"
 REL_REG_IDS_COL = "relatedRegistrationIds"
 
+#Columns read for the train tab: all the fields shown in its registration details
+TRAIN_TAB_COLUMNS = [
+    REG_ID_COL,
+    DATE_COL,
+    EMPLOYEE_ID_COL,
+    PROJECT_ID_COL,
+    DEPARTMENT_ID_COL,
+    WORK_CATEGORY_COL,
+    START_TIME_COL,
+    END_TIME_COL,
+    WORK_DURATION_COL,
+    BREAK_DURATION_COL,
+    PUBLIC_HOLIDAY_COL,
+    NUMERICALS_COL,
+]
+
 #Data types
 DATA_TYPES = {
     REG_ID_COL: "string",
@@ -43,6 +63,16 @@ DATA_TYPES = {
     NUMERICALS_COL: [],
 }
 
+#Data types of the fields that predictions add to the registration fields
+RESULT_DATA_TYPES = {
+    ANOMALY_SCORE_COL: "float64",
+    SUBMODEL_ID_COL: "string",
+    MISSING_COL: "bool",
+    AGGREGATED_COL: "bool",
+    SIGNIFICANT_FIELDS_COL: "list<string>",
+    REL_REG_IDS_COL: "list<string>",
+}
+
 #Info text
 TRAIN_TAB_INFO_TEXT = "**On this tab you can explore and visualize the training data \
     that is used to train the anomaly  detection model**"
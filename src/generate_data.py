@@ -1,8 +1,14 @@
 import random
+import numpy as np
 import pandas as pd
-from typing import List, Dict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+from typing import Iterator, List, Dict, Tuple
+from src.registration_batch import RegistrationBatch
 from src.utils import (
+    batched,
     select_from_list_by_decreasing_prob,
+    decreasing_probs,
     generate_numericals,
 )
 
@@ -17,7 +23,12 @@ class DataGenerator:
         start_times: List[float] = [8, 7.5, 8.5],
         end_times: List[float] = [16, 17, 16.5],
         break_durations: List[int] = [0.5, 1, 0],
+        seed: int = None,
     ) -> None:
+        """
+        Give a seed to make the generated data reproducible: the same seed and the same
+        sequence of calls then produce exactly the same registrations.
+        """
         self.num_employees = num_employees
         self.projects = projects
         self.work_categories = work_categories
@@ -27,14 +38,186 @@ class DataGenerator:
         self.end_times = end_times
         self.break_durations = break_durations
         self.reg_id_counter = 0
+        self.seed = seed
+        self.random = random.Random(seed)
+        self.rng = np.random.default_rng(seed)
+        # Entropy the shard RNG streams of generate_df_parallel are derived from
+        self._shard_entropy = np.random.SeedSequence(seed).entropy
+        self._parallel_calls = 0
 
-    def generate_data(self, start_date: str, end_date: str):
+    def generate_data(self, start_date: str, end_date: str, vectorized: bool = False):
         """
         Generates a dataset and a dataframe of registrations for a given time period.
+        Set vectorized=True to draw them with the faster vectorized engine
+        (generate_df) instead: the same distributions, but other values for a seed.
         """
+        if vectorized:
+            return self.generate_df(start_date, end_date).to_dict("records")
         registrations: List[Dict] = self._generate_registrations(start_date, end_date)
         return registrations
 
+    def iter_registrations(
+        self, start_date: str, end_date: str, batch_size: int = None
+    ) -> Iterator[List[Dict]]:
+        """
+        Generates registrations like generate_data, one day at a time: yields a list per
+        day, or lists of batch_size registrations. With a seed the values differ from
+        those of generate_data, as they are drawn day by day.
+        """
+        days = (
+            self.generate_df(date, date).to_dict("records")
+            for date in _date_strings(start_date, end_date)
+        )
+        if batch_size is None:
+            yield from days
+        else:
+            yield from batched(chain.from_iterable(days), batch_size)
+
+    def generate_df(self, start_date: str, end_date: str) -> pd.DataFrame:
+        """
+        Generates registrations for each employee for each day between start_date and
+        end_date as a DataFrame, drawing every column as a NumPy array in one go.
+        Uses the same distributions as _create_reg.
+        """
+        dates = _date_strings(start_date, end_date)
+        first_id = self.reg_id_counter
+        self.reg_id_counter += len(dates) * self.num_employees
+        return self._build_df(dates, 0, self.num_employees, first_id, self.rng)
+
+    def generate_batch(self, start_date: str, end_date: str) -> RegistrationBatch:
+        """
+        Same as generate_df, as a compact RegistrationBatch.
+        """
+        return RegistrationBatch.from_df(self.generate_df(start_date, end_date))
+
+    def generate_df_parallel(
+        self,
+        start_date: str,
+        end_date: str,
+        employees_per_shard: int = 1000,
+        max_workers: int = None,
+    ) -> pd.DataFrame:
+        """
+        Generates the same kind of DataFrame as generate_df, split into shards of
+        employees_per_shard employees that are generated in parallel processes.
+        Every shard draws from its own RNG stream derived from the seed, and the
+        registration ids are computed from the position of each registration (day and
+        employee), so the output does not depend on max_workers, and is identical
+        across runs for the same seed and employees_per_shard.
+        """
+        dates = _date_strings(start_date, end_date)
+        first_id = self.reg_id_counter
+        self.reg_id_counter += len(dates) * self.num_employees
+        call_index = self._parallel_calls
+        self._parallel_calls += 1
+
+        shards = [
+            (
+                self,
+                dates,
+                first_employee,
+                min(first_employee + employees_per_shard, self.num_employees),
+                first_id,
+                np.random.SeedSequence(
+                    self._shard_entropy, spawn_key=(call_index, shard_index)
+                ),
+            )
+            for shard_index, first_employee in enumerate(
+                range(0, self.num_employees, employees_per_shard)
+            )
+        ]
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            frames = list(executor.map(_generate_shard, shards))
+
+        # Restore the (date, employee) order of generate_df
+        data = pd.concat(frames, ignore_index=True)
+        positions = np.concatenate(
+            [
+                _positions(len(dates), self.num_employees, shard[2], shard[3])
+                for shard in shards
+            ]
+        )
+        order = np.argsort(positions, kind="stable")
+        return data.take(order).reset_index(drop=True)
+
+    def _build_df(
+        self,
+        dates: List[str],
+        first_employee: int,
+        last_employee: int,
+        first_id: int,
+        rng: np.random.Generator,
+    ) -> pd.DataFrame:
+        """
+        Draws the registrations of employees [first_employee, last_employee) for every
+        date. The id of a registration is first_id plus its position in the full
+        (date, employee) grid, so shards of employees never produce the same id.
+        """
+        employees = np.arange(first_employee, last_employee)
+        num_regs = len(dates) * len(employees)
+        reg_numbers = first_id + _positions(
+            len(dates), self.num_employees, first_employee, last_employee
+        )
+        employee_ids = np.array(
+            [f"employee-{employee}" for employee in employees], dtype=object
+        )
+
+        start_time = self._draw_by_decreasing_prob(rng, self.start_times, num_regs)
+        end_time = self._draw_by_decreasing_prob(rng, self.end_times, num_regs)
+        break_duration = self._draw_by_decreasing_prob(
+            rng, self.break_durations, num_regs
+        )
+        return pd.DataFrame(
+            {
+                "registrationId": [f"reg-{i}" for i in reg_numbers.tolist()],
+                "date": np.repeat(np.asarray(dates, dtype=object), len(employees)),
+                "employeeId": np.tile(employee_ids, len(dates)),
+                "projectId": self._draw_uniform(rng, self.projects, num_regs),
+                "departmentId": self._draw_uniform(rng, self.departments, num_regs),
+                "workCategory": self._draw_uniform(rng, self.work_categories, num_regs),
+                "startTime": start_time,
+                "endTime": end_time,
+                "workDuration": end_time - start_time - break_duration,
+                "breakDuration": break_duration,
+                "publicHoliday": np.zeros(num_regs, dtype=bool),
+                "numericals": self._draw_numericals(rng, num_regs),
+            }
+        )
+
+    def _draw_by_decreasing_prob(
+        self, rng: np.random.Generator, values: List[float], size: int
+    ) -> np.ndarray:
+        return rng.choice(
+            np.asarray(values, dtype=float), size=size, p=decreasing_probs(len(values))
+        )
+
+    def _draw_uniform(
+        self, rng: np.random.Generator, values: List[str], size: int
+    ) -> np.ndarray:
+        return rng.choice(np.asarray(values, dtype=object), size=size)
+
+    def _draw_numericals(
+        self, rng: np.random.Generator, size: int
+    ) -> List[List[Dict[str, int]]]:
+        """
+        Draws the numericals of every registration: each numerical is present with
+        probability 0.3, with a value between 1 and 5.
+        """
+        if not self.numericals:
+            return [[] for _ in range(size)]
+        present = (rng.random((size, len(self.numericals))) < 0.3).tolist()
+        values = rng.integers(1, 6, size=(size, len(self.numericals))).tolist()
+        return [
+            [
+                {"name": name, "value": value}
+                for name, is_present, value in zip(
+                    self.numericals, row_present, row_values
+                )
+                if is_present
+            ]
+            for row_present, row_values in zip(present, values)
+        ]
+
     def _generate_registrations(self, start_date: str, end_date: str) -> List[Dict]:
         """
         Generates registrations for each employee for each day between start_date and end_date
@@ -58,23 +241,61 @@ class DataGenerator:
         """
         Creates a registration for a given employee on a given date
         """
-        start_time: float = select_from_list_by_decreasing_prob(self.start_times)
-        end_time: float = select_from_list_by_decreasing_prob(self.end_times)
+        start_time: float = select_from_list_by_decreasing_prob(
+            self.start_times, self.random
+        )
+        end_time: float = select_from_list_by_decreasing_prob(
+            self.end_times, self.random
+        )
         break_duration: float = select_from_list_by_decreasing_prob(
-            self.break_durations
+            self.break_durations, self.random
         )
         work_duration: float = end_time - start_time - break_duration
         return {
             "registrationId": reg_id,
             "date": date,
             "employeeId": employee_id,
-            "projectId": random.choice(self.projects),
-            "departmentId": random.choice(self.departments),
-            "workCategory": random.choice(self.work_categories),
+            "projectId": self.random.choice(self.projects),
+            "departmentId": self.random.choice(self.departments),
+            "workCategory": self.random.choice(self.work_categories),
             "startTime": start_time,
             "endTime": end_time,
             "workDuration": work_duration,
             "breakDuration": break_duration,
             "publicHoliday": False,
-            "numericals": generate_numericals(self.numericals),
+            "numericals": generate_numericals(self.numericals, self.random),
         }
+
+
+def _date_strings(start_date: str, end_date: str) -> List[str]:
+    return list(
+        pd.date_range(
+            start=pd.to_datetime(start_date, format="%Y-%m-%d"),
+            end=pd.to_datetime(end_date, format="%Y-%m-%d"),
+        ).strftime("%Y-%m-%d")
+    )
+
+
+def _positions(
+    num_dates: int, num_employees: int, first_employee: int, last_employee: int
+) -> np.ndarray:
+    """
+    Positions in the full (date, employee) grid of the registrations of employees
+    [first_employee, last_employee), in the order _build_df generates them.
+    """
+    days = np.arange(num_dates, dtype=np.int64)[:, None]
+    employees = np.arange(first_employee, last_employee, dtype=np.int64)[None, :]
+    return (days * num_employees + employees).ravel()
+
+
+def _generate_shard(
+    shard: Tuple[DataGenerator, List[str], int, int, int, np.random.SeedSequence]
+) -> pd.DataFrame:
+    generator, dates, first_employee, last_employee, first_id, seed_sequence = shard
+    return generator._build_df(
+        dates,
+        first_employee,
+        last_employee,
+        first_id,
+        np.random.default_rng(seed_sequence),
+    )
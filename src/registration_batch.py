@@ -0,0 +1,252 @@
+import json
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from typing import Dict, Iterable, Iterator, List
+
+import src.demo.constants as constants
+from src.utils import to_arrow, from_arrow, read_table_from_file, registration_schema
+
+# Columns with few distinct values, stored once per distinct value
+INTERNED_COLUMNS = [
+    constants.DATE_COL,
+    constants.EMPLOYEE_ID_COL,
+    constants.PROJECT_ID_COL,
+    constants.DEPARTMENT_ID_COL,
+    constants.WORK_CATEGORY_COL,
+]
+
+# Number of rows converted to dicts at a time when iterating over a batch
+RECORDS_CHUNK_SIZE = 10000
+
+_encode = json.JSONEncoder().encode
+_encode_string = json.encoder.encode_basestring_ascii
+
+
+class RegistrationBatch:
+    """
+    Compact, columnar batch of registrations backed by an Arrow table with the
+    registration schema, usable wherever an iterable of registration dicts is.
+    Integer ids are converted to strings and other safe casts are applied when a batch
+    is made; a ValueError is raised for columns that do not convert.
+    """
+
+    __slots__ = ("table", "_encoded_dictionaries")
+
+    def __init__(self, table: pa.Table) -> None:
+        table = _check_types(table.unify_dictionaries().combine_chunks())
+        for column in INTERNED_COLUMNS:
+            if column in table.column_names and not pa.types.is_dictionary(
+                table.schema.field(column).type
+            ):
+                index = table.column_names.index(column)
+                table = table.set_column(
+                    index, column, pc.dictionary_encode(table.column(column))
+                )
+        self.table = table
+        self._encoded_dictionaries: Dict[str, np.ndarray] = {}
+
+    @classmethod
+    def from_df(cls, df: pd.DataFrame) -> "RegistrationBatch":
+        return cls(to_arrow(df))
+
+    @classmethod
+    def from_records(cls, registrations: Iterable[Dict]) -> "RegistrationBatch":
+        return cls(to_arrow(list(registrations)))
+
+    @classmethod
+    def from_arrow(cls, table: pa.Table) -> "RegistrationBatch":
+        return cls(table)
+
+    @classmethod
+    def from_file(
+        cls, file_path: str, columns: List[str] = None
+    ) -> "RegistrationBatch":
+        """
+        Loads registrations from a JSON, Parquet or Arrow file.
+        """
+        return cls(read_table_from_file(file_path, columns))
+
+    @property
+    def columns(self) -> List[str]:
+        return self.table.column_names
+
+    def __len__(self) -> int:
+        return self.table.num_rows
+
+    def __iter__(self) -> Iterator[Dict]:
+        """
+        Yields the registrations as dicts, converting a chunk of rows at a time.
+        """
+        for start in range(0, len(self), RECORDS_CHUNK_SIZE):
+            yield from self.slice(start, RECORDS_CHUNK_SIZE).to_records()
+
+    def slice(self, offset: int, length: int = None) -> "RegistrationBatch":
+        """
+        Zero-copy view of length registrations starting at offset.
+        """
+        batch = RegistrationBatch.__new__(RegistrationBatch)
+        batch.table = self.table.slice(offset, length)
+        batch._encoded_dictionaries = self._encoded_dictionaries
+        return batch
+
+    def batches(self, batch_size: int) -> Iterator["RegistrationBatch"]:
+        for start in range(0, len(self), batch_size):
+            yield self.slice(start, batch_size)
+
+    def select(self, columns: Iterable[str]) -> "RegistrationBatch":
+        """
+        Zero-copy view of the given columns, skipping the ones the batch does not have.
+        """
+        batch = RegistrationBatch.__new__(RegistrationBatch)
+        batch.table = self.table.select(
+            [column for column in columns if column in self.table.column_names]
+        )
+        batch._encoded_dictionaries = self._encoded_dictionaries
+        return batch
+
+    def to_arrow(self) -> pa.Table:
+        return self.table
+
+    def to_df(self, categorical: bool = False) -> pd.DataFrame:
+        """
+        Converts the batch to a DataFrame like utils.load_df_from_file returns.
+        With categorical=True the interned columns stay categoricals, which keeps
+        their memory footprint low.
+        """
+        if categorical:
+            return from_arrow(self.table)
+        return from_arrow(self.table.cast(_decoded_schema(self.table.schema)))
+
+    def to_records(self, columns: Iterable[str] = None) -> List[Dict]:
+        """
+        Converts the batch to a list of dicts, with only the given columns if any.
+        """
+        batch = self if columns is None else self.select(columns)
+        names = batch.table.column_names
+        values = [column.to_pylist() for column in batch.table.columns]
+        return [dict(zip(names, row)) for row in zip(*values)]
+
+    def encode_rows(self) -> List[str]:
+        """
+        Encodes every registration as a JSON object, exactly like json.dumps encodes
+        the dicts of to_records, but column by column: each distinct interned value
+        is encoded only once, and numbers are encoded a whole column at a time.
+        """
+        if len(self) == 0:
+            return []
+        names = self.table.column_names
+        row_template = _object_template(names)
+        encoded_columns = [
+            self._encode_column(name, column.combine_chunks())
+            for name, column in zip(names, self.table.columns)
+        ]
+        return [row_template % row for row in zip(*encoded_columns)]
+
+    def _encode_column(self, name: str, array: pa.Array) -> List[str]:
+        array_type = array.type
+        if pa.types.is_dictionary(array_type):
+            if name not in self._encoded_dictionaries:
+                dictionary = _encode_values(array.dictionary)
+                self._encoded_dictionaries[name] = np.array(
+                    dictionary + ["null"], dtype=object
+                )
+            encoded_dictionary = self._encoded_dictionaries[name]
+            null_index = len(encoded_dictionary) - 1
+            indices = array.indices.fill_null(null_index).to_numpy()
+            return encoded_dictionary[indices].tolist()
+        if pa.types.is_list(array_type) and pa.types.is_struct(array_type.value_type):
+            return _encode_struct_lists(array)
+        return _encode_values(array)
+
+
+def _encode_values(array: pa.Array) -> List[str]:
+    """
+    JSON encoding of every value of a column of strings, numbers or booleans.
+    """
+    if len(array) == 0:
+        return []
+    if pa.types.is_string(array.type) or pa.types.is_large_string(array.type):
+        # NumPy converts strings to Python objects much faster than to_pylist
+        return [
+            "null" if value is None else _encode_string(value)
+            for value in array.to_numpy(zero_copy_only=False).tolist()
+        ]
+    if (
+        pa.types.is_floating(array.type)
+        or pa.types.is_integer(array.type)
+        or pa.types.is_boolean(array.type)
+    ):
+        # NaN and null are the same in NumPy, so only columns without nulls go through it
+        if array.null_count == 0:
+            values = array.to_numpy(zero_copy_only=False).tolist()
+        else:
+            values = array.to_pylist()
+        # Numbers, booleans and nulls never contain ", ", so the encoding of the whole
+        # column can be split into the encodings of its values
+        return _encode(values)[1:-1].split(", ")
+    return [_encode(value) for value in array.to_pylist()]
+
+
+def _encode_struct_lists(array: pa.ListArray) -> List[str]:
+    """
+    JSON encoding of a column of lists of structs, like numericals, built from the
+    encodings of the flattened struct fields.
+    """
+    structs = array.flatten()
+    template = _object_template(
+        [structs.type.field(i).name for i in range(structs.type.num_fields)]
+    )
+    fields = [_encode_values(field) for field in structs.flatten()]
+    items = [template % item for item in zip(*fields)]
+    if structs.null_count > 0:
+        items = [
+            item if valid else "null"
+            for item, valid in zip(items, structs.is_valid().to_pylist())
+        ]
+    offsets = (array.offsets.to_numpy() - array.offsets[0].as_py()).tolist()
+    valid = array.is_valid().to_pylist()
+    return [
+        "[" + ", ".join(items[offsets[i] : offsets[i + 1]]) + "]"
+        if valid[i]
+        else "null"
+        for i in range(len(array))
+    ]
+
+
+def _check_types(table: pa.Table) -> pa.Table:
+    for field in registration_schema(table.column_names):
+        index = table.schema.get_field_index(field.name)
+        column_type = table.schema.field(index).type
+        if pa.types.is_dictionary(column_type):
+            column_type = column_type.value_type
+        if column_type == field.type:
+            continue
+        try:
+            column = table.column(index).cast(field.type)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            raise ValueError(
+                f"Column {field.name} has type {column_type}, expected {field.type}"
+            )
+        table = table.set_column(index, field.name, column)
+    return table
+
+
+def _object_template(names: List[str]) -> str:
+    """
+    %-format template of a JSON object with the given keys, in the json.dumps layout.
+    """
+    keys = [_encode(name).replace("%", "%%") for name in names]
+    return "{" + ", ".join(f"{key}: %s" for key in keys) + "}"
+
+
+def _decoded_schema(schema: pa.Schema) -> pa.Schema:
+    return pa.schema(
+        [
+            pa.field(field.name, field.type.value_type)
+            if pa.types.is_dictionary(field.type)
+            else field
+            for field in schema
+        ]
+    )
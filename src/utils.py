@@ -1,26 +1,68 @@
 import random
 import json
+import textwrap
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from pathlib import Path
-from typing import List, Dict
+from itertools import islice
+from typing import Iterable, Iterator, List, Dict, Optional, Union
 
-def select_from_list_by_decreasing_prob(lst: List[float]) -> float:
+import src.demo.constants as constants
+
+PARQUET_EXTENSIONS = [".parquet", ".pq"]
+ARROW_EXTENSIONS = [".arrow", ".feather", ".ipc"]
+
+_ARROW_TYPES = {
+    "string": pa.string(),
+    "float64": pa.float64(),
+    "bool": pa.bool_(),
+    "list<string>": pa.list_(pa.string()),
+}
+NUMERICALS_TYPE = pa.list_(
+    pa.struct([pa.field("name", pa.string()), pa.field("value", pa.float64())])
+)
+
+def select_from_list_by_decreasing_prob(lst: List[float], rng=random) -> float:
     if len(lst) == 1:
         return lst[0]
-    if random.random() < 0.5:
+    if rng.random() < 0.5:
         return lst[0]
     else:
-        return select_from_list_by_decreasing_prob(lst[1:])
+        return select_from_list_by_decreasing_prob(lst[1:], rng)
+
+
+def decreasing_probs(num_items: int) -> np.ndarray:
+    """
+    Probabilities of picking each item with select_from_list_by_decreasing_prob:
+    1/2, 1/4, 1/8, ... with the last item getting the remaining probability.
+    """
+    probs = 0.5 ** np.arange(1, num_items + 1)
+    probs[-1] = 0.5 ** (num_items - 1)
+    return probs
 
 
-def generate_numericals(numericals: List[str]) -> List[Dict[str, int]]:
+def generate_numericals(numericals: List[str], rng=random) -> List[Dict[str, int]]:
     _numericals = []
     for i in range(len(numericals)):
-        if random.random() < 0.3:
-            _numericals.append({"name": numericals[i], "value": random.randint(1, 5)})
+        if rng.random() < 0.3:
+            _numericals.append({"name": numericals[i], "value": rng.randint(1, 5)})
     return _numericals
 
 
+def batched(items: Iterable, batch_size: int) -> Iterator[List]:
+    """
+    Splits any iterable into lists of at most batch_size items, without materializing it.
+    """
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
 def to_json(df: pd.DataFrame) -> List[Dict]:
     return json.loads(df.to_json(orient="records"))
 
@@ -29,14 +71,270 @@ def to_df(data: List[Dict]) -> pd.DataFrame:
     return pd.DataFrame(data)
 
 
-def save_data_to_file(data: List[Dict], file_path: str) -> None:
+def registration_schema(columns: List[str] = None) -> pa.Schema:
+    """
+    Arrow schema of registrations, matching constants.DATA_TYPES, with numericals as
+    list<struct<name, value>>. Columns that are not registration fields are left out.
+    """
+    if columns is None:
+        columns = list(constants.DATA_TYPES.keys())
+    fields = []
+    for column in columns:
+        if column == constants.NUMERICALS_COL:
+            fields.append(pa.field(column, NUMERICALS_TYPE))
+        elif column in constants.DATA_TYPES:
+            fields.append(pa.field(column, _ARROW_TYPES[constants.DATA_TYPES[column]]))
+    return pa.schema(fields)
+
+
+def prediction_schema(columns: List[str] = None) -> pa.Schema:
+    """
+    Arrow schema of predictions: the registration fields they carry, and the fields
+    of constants.RESULT_DATA_TYPES. Columns that are neither are left out.
+    """
+    if columns is None:
+        columns = list(constants.DATA_TYPES.keys()) + list(
+            constants.RESULT_DATA_TYPES.keys()
+        )
+    registration_fields = registration_schema(columns)
+    fields = []
+    for column in columns:
+        if column in registration_fields.names:
+            fields.append(registration_fields.field(column))
+        elif column in constants.RESULT_DATA_TYPES:
+            arrow_type = _ARROW_TYPES[constants.RESULT_DATA_TYPES[column]]
+            fields.append(pa.field(column, arrow_type))
+    return pa.schema(fields)
+
+
+def _file_format(file_path: str) -> str:
+    suffix = Path(file_path).suffix.lower()
+    if suffix in PARQUET_EXTENSIONS:
+        return "parquet"
+    if suffix in ARROW_EXTENSIONS:
+        return "arrow"
+    return "json"
+
+
+def to_arrow(data: Union[pd.DataFrame, List[Dict]]) -> pa.Table:
+    """
+    Converts registrations or predictions to an Arrow table with their schema (see
+    prediction_schema). Other columns keep their inferred type. Integer ids are
+    converted to strings; a ValueError is raised for columns that do not convert.
+    """
+    df = data if isinstance(data, pd.DataFrame) else to_df(data)
+    known = prediction_schema(list(df.columns))
+    integer_ids = [
+        column
+        for column in known.names
+        if known.field(column).type == pa.string()
+        and pd.api.types.is_integer_dtype(df[column])
+    ]
+    if integer_ids:
+        df = df.astype({column: str for column in integer_ids})
+    schema = pa.schema(
+        [
+            known.field(column)
+            if column in known.names
+            else pa.Schema.from_pandas(df[[column]], preserve_index=False).field(column)
+            for column in df.columns
+        ]
+    )
+    try:
+        return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+        raise ValueError(f"The data does not match the registration schema: {e}")
+
+
+def records_to_arrow(records: List[Dict]) -> pa.Table:
+    """
+    Converts a list of registrations or predictions to an Arrow table like to_arrow,
+    but column by column straight from the dicts, without a DataFrame in between.
+    Columns are ordered as the keys of the first record, then the other keys.
+    """
+    columns = list(records[0]) if records else []
+    columns += sorted(set().union(*records).difference(columns))
+    known = prediction_schema(columns)
+    arrays = [
+        pa.array(
+            [record.get(column) for record in records],
+            type=known.field(column).type if column in known.names else None,
+            from_pandas=True,
+        )
+        for column in columns
+    ]
+    return pa.Table.from_arrays(arrays, names=columns)
+
+
+def from_arrow(table: pa.Table) -> pd.DataFrame:
+    """
+    Converts an Arrow table to a DataFrame, with list columns (numericals, and the
+    significant fields and related registration ids of predictions) as lists like in
+    the JSON files, rather than the NumPy arrays pyarrow produces by default.
+    """
+    list_columns = [
+        (i, field.name)
+        for i, field in enumerate(table.schema)
+        if pa.types.is_list(field.type)
+    ]
+    df = table.drop([name for _, name in list_columns]).to_pandas()
+    for i, name in list_columns:
+        df.insert(i, name, _list_column_to_pylist(table.column(name)))
+    return df
+
+
+def _list_column_to_pylist(column: pa.ChunkedArray) -> List[Optional[List]]:
+    """
+    Same as column.to_pylist(), but several times faster: the values of all the lists
+    are converted at once, and the lists are sliced out of them by their offsets.
+    """
+    lists: List[Optional[List]] = []
+    for chunk in column.chunks:
+        # values and offsets ignore the slicing of the chunk, so they match each other
+        values = chunk.values.to_numpy(zero_copy_only=False).tolist()
+        offsets = chunk.offsets.to_numpy().tolist()
+        start = len(lists)
+        lists.extend(values[begin:end] for begin, end in zip(offsets, offsets[1:]))
+        if chunk.null_count > 0:
+            for i in np.flatnonzero(chunk.is_null().to_numpy(zero_copy_only=False)):
+                lists[start + i] = None
+    return lists
+
+
+def batches_to_table(batches: Iterable[List[Dict]]) -> pa.Table:
+    """
+    Builds one Arrow table from batches of records, e.g. the predictions streamed by
+    ApiCaller.iter_results. Every batch is converted as it arrives, so that only one
+    batch at a time is held as dicts.
+    """
+    tables = [records_to_arrow(batch) for batch in batches if batch]
+    if not tables:
+        return pa.table({})
+    return pa.concat_tables(tables, promote_options="permissive")
+
+
+def save_data_to_file(data: Union[List[Dict], pd.DataFrame], file_path: str) -> None:
+    """
+    Saves registrations to file. The format follows the extension: Parquet for
+    .parquet/.pq, Arrow IPC (memory-mappable) for .arrow/.feather/.ipc, else JSON.
+    """
     dir_path = "/".join(file_path.split("/")[:-1])
     Path(dir_path).mkdir(parents=True, exist_ok=True)
+    file_format = _file_format(file_path)
+    if file_format == "parquet":
+        pq.write_table(to_arrow(data), file_path)
+        return
+    if file_format == "arrow":
+        table = to_arrow(data)
+        with pa.OSFile(file_path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        return
+    if isinstance(data, pd.DataFrame):
+        data = to_json(data)
     with open(file_path, "w") as f:
         json.dump(data, f, indent=4)
 
 
-def load_data_from_file(file_path: str) -> List[Dict]:
+def save_batches_to_file(batches: Iterable[List[Dict]], file_path: str) -> int:
+    """
+    Writes batches of registrations to one file as they arrive, producing the same
+    file as save_data_to_file without holding all the registrations in memory.
+    Parquet files get one row group per batch.
+    Returns the number of registrations written.
+    """
+    dir_path = "/".join(file_path.split("/")[:-1])
+    Path(dir_path).mkdir(parents=True, exist_ok=True)
+    if _file_format(file_path) != "json":
+        return _save_batches_to_columnar_file(batches, file_path)
+    count = 0
+    with open(file_path, "w") as f:
+        f.write("[")
+        for batch in batches:
+            for item in batch:
+                f.write(",\n" if count > 0 else "\n")
+                f.write(textwrap.indent(json.dumps(item, indent=4), "    "))
+                count += 1
+        f.write("\n]" if count > 0 else "]")
+    return count
+
+
+def _save_batches_to_columnar_file(
+    batches: Iterable[List[Dict]], file_path: str
+) -> int:
+    writer: Optional[Union[pq.ParquetWriter, pa.ipc.RecordBatchFileWriter]] = None
+    sink = None
+    count = 0
+    try:
+        for batch in batches:
+            if not batch:
+                continue
+            table = records_to_arrow(batch)
+            if writer is None:
+                if _file_format(file_path) == "parquet":
+                    writer = pq.ParquetWriter(file_path, table.schema)
+                else:
+                    sink = pa.OSFile(file_path, "wb")
+                    writer = pa.ipc.new_file(sink, table.schema)
+            writer.write_table(table)
+            count += len(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+        if sink is not None:
+            sink.close()
+    if writer is None:
+        save_data_to_file([], file_path)
+    return count
+
+
+def load_data_from_file(file_path: str, columns: List[str] = None) -> List[Dict]:
+    """
+    Loads registrations from a JSON, Parquet or Arrow file, detected by extension.
+    If columns are given, only those columns are kept.
+    """
+    if _file_format(file_path) != "json":
+        return load_df_from_file(file_path, columns).to_dict("records")
     with open(file_path, "r") as f:
         data = json.load(f)
+    if columns is not None:
+        data = [{key: reg[key] for key in columns if key in reg} for reg in data]
     return data
+
+
+def load_df_from_file(file_path: str, columns: List[str] = None) -> pd.DataFrame:
+    """
+    Loads registrations from a JSON, Parquet or Arrow file into a DataFrame.
+    With Parquet and Arrow files only the given columns are read from disk, and Arrow
+    files are memory-mapped rather than read into memory up front.
+    """
+    if _file_format(file_path) != "json":
+        return from_arrow(read_table_from_file(file_path, columns))
+    with open(file_path, "r") as f:
+        df = pd.DataFrame.from_records(json.load(f))
+    if columns is not None:
+        df = df[[column for column in columns if column in df.columns]]
+    return df
+
+
+def read_table_from_file(file_path: str, columns: List[str] = None) -> pa.Table:
+    """
+    Loads registrations from a JSON, Parquet or Arrow file into an Arrow table.
+    Arrow files are memory-mapped, so the table does not copy them into memory.
+    Columns that are not in the file are left out.
+    """
+    file_format = _file_format(file_path)
+    if file_format == "parquet":
+        if columns is not None:
+            names = set(pq.read_schema(file_path).names)
+            columns = [column for column in columns if column in names]
+        return pq.read_table(file_path, columns=columns)
+    if file_format == "arrow":
+        with pa.memory_map(file_path, "r") as source:
+            table = pa.ipc.open_file(source).read_all()
+        if columns is not None:
+            table = table.select(
+                [column for column in columns if column in table.column_names]
+            )
+        return table
+    return to_arrow(load_data_from_file(file_path, columns))
@@ -0,0 +1,79 @@
+import pandas as pd
+import pytest
+
+from src.demo.api.api_caller import ApiCaller
+from src.demo.api.instrumentation import Instrumentation
+from src.demo.api.mock_server import MockTimeDetectServer
+from src.demo.client_simulator.job_waiter import JobWaiter
+
+
+@pytest.fixture
+def registrations_df() -> pd.DataFrame:
+    """
+    Two registrations with every registration field.
+    """
+    return pd.DataFrame(
+        {
+            "registrationId": ["1", "2"],
+            "date": ["2023-01-02", "2023-01-03"],
+            "employeeId": ["1", "2"],
+            "projectId": ["p", "p"],
+            "departmentId": ["d", "d"],
+            "workCategory": ["w", "w"],
+            "startTime": [8, 9],
+            "endTime": [16, 17],
+            "workDuration": [8, 8],
+            "numericals": [[{"name": "n", "value": 2}], []],
+        }
+    )
+
+
+@pytest.fixture
+def mock_server():
+    """
+    A running MockTimeDetectServer, stopped after the test.
+    """
+    with MockTimeDetectServer() as server:
+        yield server
+
+
+@pytest.fixture
+def api_caller(mock_server):
+    """
+    An ApiCaller that calls the mock_server.
+    """
+    api_caller = ApiCaller(
+        "tenant", base_url=mock_server.base_url, token_url=mock_server.token_url
+    )
+    yield api_caller
+    api_caller.close()
+
+
+@pytest.fixture
+def job_waiter() -> JobWaiter:
+    """
+    A JobWaiter that polls the mock_server without waiting seconds.
+    """
+    return JobWaiter(initial_delay=0.01, max_interval=0.05, jitter=0, timeout=10)
+
+
+class RecordingInstrumentation(Instrumentation):
+    enabled = True
+
+    def __init__(self) -> None:
+        self.requests = []
+        self.waits = []
+
+    def record_request(self, record) -> None:
+        self.requests.append(record)
+
+    def record_wait(self, record) -> None:
+        self.waits.append(record)
+
+
+@pytest.fixture
+def recorder() -> RecordingInstrumentation:
+    """
+    An instrumentation that keeps every record.
+    """
+    return RecordingInstrumentation()
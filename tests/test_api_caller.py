@@ -0,0 +1,122 @@
+import time
+
+import pandas as pd
+
+from src.registration_batch import RegistrationBatch
+
+
+def test_upload_data_accepts_a_data_frame(mock_server, api_caller, registrations_df):
+    assert api_caller.upload_data("dataset", registrations_df) is not None
+    assert mock_server.datasets[("tenant", "dataset")] == 2
+
+
+def test_upload_data_in_batches_accepts_a_data_frame(
+    mock_server, api_caller, registrations_df
+):
+    job_ids = api_caller.upload_data_in_batches(
+        ["a", "b"], registrations_df, batch_size=1
+    )
+    assert len(job_ids) == 2 and None not in job_ids
+    assert mock_server.datasets == {("tenant", "a"): 2, ("tenant", "b"): 2}
+
+
+def test_prepare_upload_accepts_every_kind_of_registrations(
+    api_caller, registrations_df
+):
+    bodies = [
+        api_caller.prepare_upload("dataset", registrations)
+        for registrations in [
+            registrations_df,
+            RegistrationBatch.from_df(registrations_df),
+            iter(registrations_df.to_dict("records")),
+        ]
+    ]
+    assert all(body.length > 0 for body in bodies)
+    for body in bodies:
+        body.close()
+
+
+def test_job_requests_are_labelled_with_their_dataset(
+    api_caller, recorder, registrations_df
+):
+    api_caller.instrumentation = recorder
+    registrations = registrations_df.to_dict("records")
+    upload_job = api_caller.upload_data(["a", "b"], registrations_df)
+    api_caller.get_job_status(print_status=False, job_id=upload_job)
+    api_caller.start_trainer("a")
+    prediction_job = api_caller.create_predictions("a", registrations, ["1"])
+    api_caller.get_results(prediction_job)
+    list(api_caller.iter_results(prediction_job))
+
+    labels = [(record.endpoint, record.dataset_id) for record in recorder.requests]
+    assert labels == [
+        ("presigned_url", "a,b"),
+        ("upload", "a,b"),
+        ("status", "a,b"),
+        ("start_trainer", "a"),
+        ("create_prediction", "a"),
+        ("results", "a"),
+        ("results", "a"),
+    ]
+
+
+def test_upload_data_in_batches_streams_a_generator(
+    mock_server, api_caller, registrations_df
+):
+    registration = registrations_df.to_dict("records")[0]
+    registrations = (dict(registration, registrationId=str(i)) for i in range(5))
+    job_ids = api_caller.upload_data_in_batches("dataset", registrations, batch_size=2)
+    assert len(job_ids) == 3 and len(set(job_ids)) == 3
+    assert mock_server.datasets == {("tenant", "dataset"): 5}
+
+
+def test_upload_data_in_batches_keeps_the_batch_order_and_failures(
+    monkeypatch, api_caller
+):
+    def upload_batch(dataset_ids, batch):
+        # Later batches finish first
+        time.sleep(0.01 * (10 - batch[0]))
+        return None if batch[0] == 4 else f"job-{batch[0]}"
+
+    monkeypatch.setattr(api_caller, "_upload_batch", upload_batch)
+    job_ids = api_caller.upload_data_in_batches(
+        "dataset", range(10), batch_size=2, max_workers=4
+    )
+    assert job_ids == ["job-0", "job-2", None, "job-6", "job-8"]
+
+
+def test_upload_data_in_batches_holds_two_batches_per_worker(monkeypatch, api_caller):
+    pulled = []
+    ahead = []
+
+    def registrations():
+        for i in range(20):
+            pulled.append(i)
+            yield i
+
+    def upload_batch(dataset_ids, batch):
+        ahead.append(len(pulled) - batch[0])
+        time.sleep(0.001)
+        return "job"
+
+    monkeypatch.setattr(api_caller, "_upload_batch", upload_batch)
+    api_caller.upload_data_in_batches(
+        "dataset", registrations(), batch_size=1, max_workers=1
+    )
+    assert max(ahead) <= 3
+
+
+def test_registration_batch_is_uploaded_in_slices(
+    monkeypatch, api_caller, registrations_df
+):
+    batches = []
+    monkeypatch.setattr(
+        api_caller, "_upload_batch", lambda _, batch: batches.append(batch) or "job"
+    )
+    df = pd.concat([registrations_df] * 3, ignore_index=True).head(5)
+    registrations = RegistrationBatch.from_df(
+        df.assign(registrationId=[str(i) for i in range(5)])
+    )
+    api_caller.upload_data_in_batches("dataset", registrations, batch_size=2)
+    assert all(isinstance(batch, RegistrationBatch) for batch in batches)
+    assert [len(batch) for batch in batches] == [2, 2, 1]
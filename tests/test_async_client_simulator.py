@@ -0,0 +1,46 @@
+import asyncio
+import threading
+
+from src.registration_batch import RegistrationBatch
+
+from src.demo.api.mock_server import MockTimeDetectServer
+from src.demo.client_simulator.async_client_simulator import AsyncClientSimulator
+
+
+def test_only_uploaded_datasets_are_trained(registrations_df):
+    train_dfs = {
+        "good": registrations_df,
+        "bad": registrations_df.assign(registrationId=["1", 2]),
+    }
+    with MockTimeDetectServer() as server:
+        simulator = AsyncClientSimulator(
+            "tenant", base_url=server.base_url, token_url=server.token_url
+        )
+        result = asyncio.run(simulator.upload_and_train_many(train_dfs))
+        predictions = asyncio.run(simulator.predict_many({"good": train_dfs["good"]}))
+    assert result.succeeded
+    assert server.model_versions == {("tenant", "good"): 1}
+    assert len(predictions["good"]) >= 2
+
+
+def test_data_frames_are_converted_off_the_event_loop(
+    monkeypatch, mock_server, registrations_df
+):
+    threads = []
+    from_df = RegistrationBatch.from_df
+
+    def recording_from_df(df):
+        threads.append(threading.current_thread())
+        return from_df(df)
+
+    monkeypatch.setattr(RegistrationBatch, "from_df", recording_from_df)
+    simulator = AsyncClientSimulator(
+        "tenant", base_url=mock_server.base_url, token_url=mock_server.token_url
+    )
+    try:
+        asyncio.run(simulator.upload_data("dataset", registrations_df))
+        asyncio.run(simulator.predict("dataset", registrations_df))
+    finally:
+        simulator.close()
+    assert len(threads) == 2
+    assert threading.main_thread() not in threads
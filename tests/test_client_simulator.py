@@ -0,0 +1,139 @@
+import pandas as pd
+import pytest
+
+from src.demo.api.prediction_cache import PredictionCache
+from src.demo.client_simulator.client_simulator import ClientSimulator, iter_days
+
+
+def test_invalid_data_fails_without_raising(registrations_df):
+    simulator = ClientSimulator("tenant", "dataset")
+    df = registrations_df.assign(registrationId=["1", 2])
+    try:
+        assert simulator.upload_data(df) is False
+        assert simulator.predict(df) is None
+    finally:
+        simulator.api_caller.close()
+
+
+@pytest.mark.parametrize(
+    "batches, cached", [([[1, 2], [3]], [1, 2, 3]), ([[1, 2], [3, 4]], None)]
+)
+def test_streamed_predictions_are_only_cached_up_to_max_job_size(batches, cached):
+    cache = PredictionCache(max_job_size=3)
+    simulator = ClientSimulator("tenant", "dataset", prediction_cache=cache)
+    key = ("dataset", "version", "batch:request")
+    try:
+        assert list(simulator._cache_batches(key, iter(batches))) == batches
+        assert cache.get(key) == cached
+    finally:
+        simulator.api_caller.close()
+
+
+def test_simulator_calls_the_given_server(mock_server, job_waiter, registrations_df):
+    simulator = ClientSimulator(
+        "tenant",
+        "dataset",
+        job_waiter=job_waiter,
+        base_url=mock_server.base_url,
+        token_url=mock_server.token_url,
+    )
+    try:
+        assert simulator.upload_data(registrations_df)
+    finally:
+        simulator.api_caller.close()
+    assert mock_server.datasets == {("tenant", "dataset"): 2}
+
+
+def test_iter_days_partitions_a_data_frame_by_date(registrations_df):
+    df = pd.concat([registrations_df] * 2, ignore_index=True).assign(
+        registrationId=["1", "2", "3", "4"],
+        date=["2023-01-03", "2023-01-02", "2023-01-03", "2023-01-01"],
+    )
+    days = [
+        (date, [reg["registrationId"] for reg in regs]) for date, regs in iter_days(df)
+    ]
+    assert days == [
+        ("2023-01-01", ["4"]),
+        ("2023-01-02", ["2"]),
+        ("2023-01-03", ["1", "3"]),
+    ]
+
+
+def test_iter_days_converts_one_day_at_a_time(monkeypatch, registrations_df):
+    converted = []
+    to_dict = pd.DataFrame.to_dict
+
+    def recording_to_dict(df, *args, **kwargs):
+        converted.append(len(df))
+        return to_dict(df, *args, **kwargs)
+
+    monkeypatch.setattr(pd.DataFrame, "to_dict", recording_to_dict)
+    days = iter_days(registrations_df)
+    next(days)
+    assert converted == [1]
+
+
+def test_iter_days_passes_lists_of_days_on_and_skips_empty_days(registrations_df):
+    first, second = registrations_df.to_dict("records")
+    days = list(iter_days(iter([[first], [], [second]])))
+    assert days == [("2023-01-02", [first]), ("2023-01-03", [second])]
+
+
+def _days(registrations_df, num_days: int) -> pd.DataFrame:
+    df = pd.concat([registrations_df] * num_days, ignore_index=True)
+    return df.assign(
+        registrationId=[str(i) for i in range(len(df))],
+        date=[f"2023-01-0{1 + i // 2}" for i in range(len(df))],
+    )
+
+
+def _stream(mock_server, job_waiter, recorder, df, pipeline_depth):
+    simulator = ClientSimulator(
+        "tenant",
+        "dataset",
+        job_waiter=job_waiter,
+        instrumentation=recorder,
+        base_url=mock_server.base_url,
+        token_url=mock_server.token_url,
+    )
+    try:
+        result = simulator.stream_and_predict_day_by_day(
+            df, pipeline_depth=pipeline_depth
+        )
+    finally:
+        simulator.api_caller.close()
+    return simulator, result
+
+
+@pytest.mark.parametrize("pipeline_depth", [1, 2])
+def test_pipelined_streaming_predicts_like_the_sequential_one(
+    mock_server, job_waiter, recorder, registrations_df, pipeline_depth
+):
+    df = _days(registrations_df, 3)
+    _, sequential = _stream(mock_server, job_waiter, recorder, df, 0)
+    simulator, pipelined = _stream(
+        mock_server, job_waiter, recorder, df, pipeline_depth
+    )
+    columns = ["registrationId", "anomalyScore"]
+    pd.testing.assert_frame_equal(
+        pipelined[columns].sort_values("registrationId", ignore_index=True),
+        sequential[columns].sort_values("registrationId", ignore_index=True),
+    )
+    assert mock_server.datasets == {("tenant", "dataset"): 2 * len(df)}
+    assert set(simulator.stage_timings.durations) == {
+        "prepare",
+        "upload",
+        "predict",
+        "train",
+    }
+
+
+def test_pipelined_streaming_predicts_every_day_after_the_training_before(
+    mock_server, job_waiter, recorder, registrations_df
+):
+    _stream(mock_server, job_waiter, recorder, _days(registrations_df, 4), 2)
+    endpoints = [record.endpoint for record in recorder.requests]
+    predictions = [i for i, name in enumerate(endpoints) if name == "create_prediction"]
+    assert len(predictions) == 4
+    for day, index in enumerate(predictions):
+        assert endpoints[:index].count("start_trainer") == day
@@ -0,0 +1,115 @@
+from src.demo.client_simulator.fleet_runner import (
+    MAX_DATASETS_PER_TRAINER,
+    FleetRunner,
+)
+
+
+def _manifest(tmp_path, registrations_df, keys):
+    file_path = str(tmp_path / "registrations.json")
+    registrations_df.to_json(file_path, orient="records")
+    return [
+        {
+            "tenantId": tenant_id,
+            "datasetId": dataset_id,
+            "trainFile": file_path,
+            "predictFile": file_path,
+        }
+        for tenant_id, dataset_id in keys
+    ]
+
+
+def test_fleet_runs_against_the_given_server(
+    tmp_path, mock_server, job_waiter, registrations_df
+):
+    keys = [("t1", "a"), ("t1", "b"), ("t2", "a")]
+    runner = FleetRunner(
+        _manifest(tmp_path, registrations_df, keys),
+        job_waiter=job_waiter,
+        base_url=mock_server.base_url,
+        token_url=mock_server.token_url,
+    )
+    summary = runner.run()
+    assert list(summary["stage"]) == ["upload", "train", "predict"]
+    assert list(summary["failures"]) == [0, 0, 0]
+    assert mock_server.datasets == {key: 2 for key in keys}
+    assert set(mock_server.model_versions) == set(keys)
+
+
+class Stages:
+    """
+    Stands in for the stages of a FleetRunner: every dataset succeeds, except those
+    given to fail a stage, which raise for "boom" datasets.
+    """
+
+    def __init__(self, runner, fail_upload=(), fail_train=(), fail_predict=()):
+        self.calls = {"upload": [], "train": [], "predict": []}
+        self.fail = {
+            "upload": set(fail_upload),
+            "train": set(fail_train),
+            "predict": set(fail_predict),
+        }
+        runner._upload = lambda entry: self._run("upload", [entry["datasetId"]])
+        runner._train = lambda group: self._run("train", group[2])
+        runner._predict = lambda entry: self._run("predict", [entry["datasetId"]])
+
+    def _run(self, stage, dataset_ids):
+        self.calls[stage].append(list(dataset_ids))
+        if "boom" in dataset_ids:
+            raise RuntimeError("boom")
+        return not self.fail[stage].intersection(dataset_ids), 1
+
+
+def _entries(*dataset_ids, tenant_id="t", **files):
+    files = files or {"trainFile": "train.json", "predictFile": "predict.json"}
+    return [dict(tenantId=tenant_id, datasetId=ds, **files) for ds in dataset_ids]
+
+
+def test_datasets_that_fail_a_stage_skip_the_later_stages():
+    runner = FleetRunner(_entries("a", "b", "c", "boom"))
+    stages = Stages(runner, fail_upload=["b"], fail_train=["c"])
+    summary = runner.run()
+    assert sorted(stages.calls["upload"]) == [["a"], ["b"], ["boom"], ["c"]]
+    assert stages.calls["train"] == [["a", "c"]]
+    assert stages.calls["predict"] == []
+    assert list(summary["failures"]) == [2, 2]
+    failures = runner.failures()
+    assert set(zip(failures["stage"], failures["datasetId"])) == {
+        ("upload", "b"),
+        ("upload", "boom"),
+        ("train", "a"),
+        ("train", "c"),
+    }
+    assert "RuntimeError" in failures.set_index("datasetId")["error"]["boom"]
+
+
+def test_stages_only_run_for_the_entries_with_their_files():
+    manifest = _entries("a", "b") + _entries("not-uploaded", predictFile="p.json")
+    manifest += _entries("not-predicted", trainFile="t.json")
+    runner = FleetRunner(manifest)
+    stages = Stages(runner)
+    runner.run()
+    assert sorted(stages.calls["upload"]) == [["a"], ["b"], ["not-predicted"]]
+    assert stages.calls["train"] == [["a", "b", "not-uploaded", "not-predicted"]]
+    assert sorted(stages.calls["predict"]) == [["a"], ["b"], ["not-uploaded"]]
+
+
+def test_stages_can_be_left_out():
+    runner = FleetRunner(_entries("a", "b"))
+    stages = Stages(runner)
+    runner.run(upload=False, train=False)
+    assert stages.calls["upload"] == stages.calls["train"] == []
+    assert sorted(stages.calls["predict"]) == [["a"], ["b"]]
+
+
+def test_trainings_are_grouped_per_tenant_and_rebuild_models():
+    dataset_ids = [str(i) for i in range(MAX_DATASETS_PER_TRAINER + 1)]
+    manifest = _entries(*dataset_ids) + _entries("a", "b", tenant_id="u")
+    manifest[0]["rebuildModels"] = False
+    runner = FleetRunner(manifest)
+    stages = Stages(runner)
+    runner.run(upload=False, predict=False)
+    assert sorted(map(len, stages.calls["train"])) == [
+        1,
+        2,
+        MAX_DATASETS_PER_TRAINER,
+    ]
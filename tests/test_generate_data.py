@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+
+from src.generate_data import DataGenerator
+from src.utils import decreasing_probs
+
+
+def _generator(seed: int = 1) -> DataGenerator:
+    return DataGenerator(3, ["p"], ["w1", "w2"], ["d"], ["n"], seed=seed)
+
+
+def test_iter_registrations_is_reproducible():
+    first = [
+        reg
+        for day in _generator().iter_registrations("2023-01-01", "2023-01-05")
+        for reg in day
+    ]
+    second = [
+        reg
+        for batch in _generator().iter_registrations(
+            "2023-01-01", "2023-01-05", batch_size=4
+        )
+        for reg in batch
+    ]
+    assert first == second
+
+
+def test_iter_registrations_covers_the_period_like_generate_data():
+    lazy = [
+        reg
+        for day in _generator().iter_registrations("2023-01-01", "2023-01-05")
+        for reg in day
+    ]
+    eager = _generator().generate_data("2023-01-01", "2023-01-05")
+    key = lambda reg: (reg["registrationId"], reg["date"], reg["employeeId"])
+    assert [key(reg) for reg in lazy] == [key(reg) for reg in eager]
+
+
+def test_generate_data_uses_the_row_by_row_engine_unless_vectorized():
+    legacy = _generator()._generate_registrations("2023-01-01", "2023-01-05")
+    assert _generator().generate_data("2023-01-01", "2023-01-05") == legacy
+    vectorized = _generator().generate_df("2023-01-01", "2023-01-05")
+    assert _generator().generate_data(
+        "2023-01-01", "2023-01-05", vectorized=True
+    ) == vectorized.to_dict("records")
+
+
+def test_vectorized_registrations_have_the_fields_of_the_row_by_row_ones():
+    row = _generator()._generate_registrations("2023-01-01", "2023-01-01")[0]
+    df = _generator().generate_df("2023-01-01", "2023-01-02")
+    assert list(df.columns) == list(row)
+    assert len(df) == 6
+    assert list(df["date"]) == ["2023-01-01"] * 3 + ["2023-01-02"] * 3
+    assert list(df["employeeId"][:3]) == ["employee-0", "employee-1", "employee-2"]
+    assert (
+        df["workDuration"] == df["endTime"] - df["startTime"] - df["breakDuration"]
+    ).all()
+    assert all(
+        numerical["name"] == "n" and 1 <= numerical["value"] <= 5
+        for numericals in df["numericals"]
+        for numerical in numericals
+    )
+
+
+def test_registration_ids_continue_across_calls_and_engines():
+    generator = _generator()
+    first = generator.generate_data("2023-01-01", "2023-01-01")
+    second = generator.generate_df("2023-01-02", "2023-01-02")
+    third = generator.generate_batch("2023-01-03", "2023-01-03")
+    ids = [reg["registrationId"] for reg in first]
+    ids += list(second["registrationId"])
+    ids += [reg["registrationId"] for reg in third]
+    assert ids == [f"reg-{i}" for i in range(9)]
+
+
+def test_generate_df_is_reproducible_with_a_seed():
+    first = _generator(seed=7).generate_df("2023-01-01", "2023-01-10")
+    second = _generator(seed=7).generate_df("2023-01-01", "2023-01-10")
+    other = _generator(seed=8).generate_df("2023-01-01", "2023-01-10")
+    pd.testing.assert_frame_equal(first, second)
+    assert not first.equals(other)
+
+
+def test_parallel_generation_does_not_depend_on_the_workers():
+    generator = DataGenerator(5, ["p"], ["w"], ["d"], ["n"], seed=3)
+    one = generator.generate_df_parallel(
+        "2023-01-01", "2023-01-03", employees_per_shard=2, max_workers=1
+    )
+    generator = DataGenerator(5, ["p"], ["w"], ["d"], ["n"], seed=3)
+    two = generator.generate_df_parallel(
+        "2023-01-01", "2023-01-03", employees_per_shard=2, max_workers=2
+    )
+    pd.testing.assert_frame_equal(one, two)
+    serial = DataGenerator(5, ["p"], ["w"], ["d"], ["n"], seed=3).generate_df(
+        "2023-01-01", "2023-01-03"
+    )
+    key_columns = ["registrationId", "date", "employeeId"]
+    pd.testing.assert_frame_equal(one[key_columns], serial[key_columns])
+
+
+def test_both_engines_draw_the_start_times_alike():
+    start_times = [8, 7.5, 8.5, 9]
+    generator = DataGenerator(
+        1000, ["p"], ["w"], ["d"], [], start_times=start_times, seed=1
+    )
+    legacy = pd.DataFrame(generator._generate_registrations("2023-01-01", "2023-01-05"))
+    vectorized = generator.generate_df("2023-01-01", "2023-01-05")
+    expected = decreasing_probs(len(start_times))
+    for df in (legacy, vectorized):
+        shares = df["startTime"].value_counts(normalize=True)
+        observed = np.array([shares.get(time, 0.0) for time in start_times])
+        assert np.abs(observed - expected).max() < 0.02
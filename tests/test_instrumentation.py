@@ -0,0 +1,151 @@
+import json
+
+import pytest
+
+from src.demo.api.api_caller import ApiCaller
+from src.demo.api.instrumentation import (
+    ERROR,
+    EXCEPTION,
+    SUCCESS,
+    MetricsInstrumentation,
+    RequestRecord,
+    WaitRecord,
+)
+
+
+def _request(**kwargs) -> RequestRecord:
+    fields = dict(
+        endpoint="results",
+        method="GET",
+        tenant_id="tenant",
+        dataset_id="dataset",
+        status_code=200,
+        outcome=SUCCESS,
+    )
+    fields.update(kwargs)
+    return RequestRecord(**fields)
+
+
+def _samples(text: str):
+    """
+    The sample lines of an exposition, by name and labels.
+    """
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = value
+    return samples
+
+
+LABELS = 'endpoint="results",tenant="tenant",dataset="dataset"'
+
+
+def test_requests_are_counted_per_endpoint_tenant_dataset_and_status():
+    metrics = MetricsInstrumentation()
+    metrics.record_request(_request(response_bytes=100, response_wire_bytes=40))
+    metrics.record_request(_request(status_code=503, outcome=ERROR))
+    metrics.record_request(_request(status_code=None, outcome=EXCEPTION, attempt=1))
+    metrics.record_request(_request(dataset_id=None))
+    samples = _samples(metrics.to_text())
+    assert samples[f'td_client_requests_total{{{LABELS},status="200"}}'] == "1"
+    assert samples[f'td_client_requests_total{{{LABELS},status="503"}}'] == "1"
+    assert samples[f'td_client_requests_total{{{LABELS},status="exception"}}'] == "1"
+    no_dataset = 'endpoint="results",tenant="tenant",dataset=""'
+    assert samples[f'td_client_requests_total{{{no_dataset},status="200"}}'] == "1"
+    assert samples[f"td_client_retries_total{{{LABELS}}}"] == "1"
+    assert samples[f"td_client_response_bytes_total{{{LABELS}}}"] == "100"
+    assert samples[f"td_client_response_wire_bytes_total{{{LABELS}}}"] == "40"
+
+
+def test_histograms_have_cumulative_buckets():
+    metrics = MetricsInstrumentation()
+    for network_time in (0.003, 0.02, 0.02, 100):
+        metrics.record_request(_request(network_time=network_time))
+    samples = _samples(metrics.to_text())
+    bucket = 'td_client_network_seconds_bucket{%s,le="%s"}'
+    assert samples[bucket % (LABELS, "0.005")] == "1"
+    assert samples[bucket % (LABELS, "0.025")] == "3"
+    assert samples[bucket % (LABELS, "60")] == "3"
+    assert samples[bucket % (LABELS, "+Inf")] == "4"
+    assert samples[f"td_client_network_seconds_count{{{LABELS}}}"] == "4"
+    assert float(
+        samples[f"td_client_network_seconds_sum{{{LABELS}}}"]
+    ) == pytest.approx(100.043)
+
+
+def test_request_sizes_are_only_observed_for_requests_with_a_body():
+    metrics = MetricsInstrumentation()
+    metrics.record_request(_request())
+    metrics.record_request(_request(request_bytes=2000, serialization_time=0.01))
+    samples = _samples(metrics.to_text())
+    assert samples[f"td_client_request_size_bytes_count{{{LABELS}}}"] == "1"
+    assert samples[f"td_client_serialization_seconds_count{{{LABELS}}}"] == "1"
+
+
+def test_job_waits_are_counted_per_outcome():
+    metrics = MetricsInstrumentation()
+    metrics.record_wait(WaitRecord("tenant", "dataset", "job", SUCCESS, 3.0, 4, 1.0))
+    metrics.record_wait(WaitRecord("tenant", "dataset", "job", "timeout", 7.0, 2, 1.0))
+    samples = _samples(metrics.to_text())
+    labels = 'tenant="tenant",dataset="dataset",outcome="success"'
+    assert samples[f"td_client_job_waits_total{{{labels}}}"] == "1"
+    assert samples[f"td_client_job_polls_total{{{labels}}}"] == "4"
+    assert samples[f'td_client_job_wait_seconds_bucket{{{labels},le="5"}}'] == "1"
+    timeout = 'tenant="tenant",dataset="dataset",outcome="timeout"'
+    assert samples[f"td_client_job_polls_total{{{timeout}}}"] == "2"
+
+
+@pytest.mark.parametrize(
+    "openmetrics, described",
+    [(False, "td_client_requests_total"), (True, "td_client_requests")],
+)
+def test_counter_families_are_named_per_format(openmetrics, described):
+    metrics = MetricsInstrumentation()
+    metrics.record_request(_request())
+    lines = metrics.to_text(openmetrics).splitlines()
+    assert f"# TYPE {described} counter" in lines
+    assert f"# HELP {described} Requests sent." in lines
+    assert (lines[-1] == "# EOF") == openmetrics
+
+
+def test_label_values_are_escaped():
+    metrics = MetricsInstrumentation()
+    metrics.record_request(_request(dataset_id='a "b"\\c\nd'))
+    assert 'dataset="a \\"b\\"\\\\c\\nd"' in metrics.to_text()
+
+
+def test_metrics_are_written_and_records_traced(tmp_path):
+    trace_path = str(tmp_path / "traces" / "records.jsonl")
+    metrics = MetricsInstrumentation(trace_path=trace_path)
+    metrics.record_request(_request())
+    metrics.record_wait(WaitRecord("tenant", None, "job", SUCCESS, 3.0, 4, 1.0))
+    metrics.close()
+    metrics_path = str(tmp_path / "metrics.prom")
+    metrics.write(metrics_path)
+    with open(metrics_path) as f:
+        assert f.read() == metrics.to_text()
+    with open(trace_path) as f:
+        traces = [json.loads(line) for line in f]
+    assert [trace["type"] for trace in traces] == ["request", "wait"]
+    assert traces[0]["endpoint"] == "results" and traces[1]["job_id"] == "job"
+
+
+def test_api_caller_requests_are_exported(mock_server, registrations_df):
+    metrics = MetricsInstrumentation()
+    api_caller = ApiCaller(
+        "tenant",
+        base_url=mock_server.base_url,
+        token_url=mock_server.token_url,
+        instrumentation=metrics,
+    )
+    try:
+        api_caller.upload_data("dataset", registrations_df)
+    finally:
+        api_caller.close()
+    samples = _samples(metrics.to_text())
+    labels = 'endpoint="upload",tenant="tenant",dataset="dataset"'
+    assert samples[f'td_client_requests_total{{{labels},status="200"}}'] == "1"
+    assert int(samples[f"td_client_request_bytes_total{{{labels}}}"]) > 0
+    presigned = 'endpoint="presigned_url",tenant="tenant",dataset="dataset"'
+    assert samples[f'td_client_requests_total{{{presigned},status="200"}}'] == "1"
@@ -0,0 +1,100 @@
+import asyncio
+from types import SimpleNamespace
+from typing import Dict, List
+
+import pytest
+
+import src.demo.client_simulator.job_waiter as job_waiter
+from src.demo.client_simulator.job_waiter import (
+    FAILED,
+    MISSING,
+    SUCCESS,
+    TIMEOUT,
+    JobWaiter,
+)
+
+RUNNING = {"status": "running"}
+DONE = {"status": "success"}
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+        self.sleeps: List[float] = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    clock = FakeClock()
+    monkeypatch.setattr(
+        job_waiter,
+        "time",
+        SimpleNamespace(monotonic=clock.monotonic, sleep=clock.sleep),
+    )
+    return clock
+
+
+def _statuses(*statuses: Dict):
+    statuses = list(statuses)
+    return lambda: statuses.pop(0)
+
+
+def test_interval_backs_off_up_to_max_interval(clock):
+    waiter = JobWaiter(initial_delay=1, backoff_factor=2, max_interval=5, jitter=0)
+    result = waiter.wait(_statuses(*[RUNNING] * 5, DONE))
+    assert clock.sleeps == [1, 2, 4, 5, 5, 5]
+    assert result.outcome == SUCCESS and result.job_status == DONE
+    assert result.polls == 6
+    assert result.time_to_first_poll == 1
+    assert result.elapsed == 22
+
+
+def test_job_is_polled_once_more_at_the_timeout(clock):
+    waiter = JobWaiter(initial_delay=1, backoff_factor=2, jitter=0, timeout=4)
+    result = waiter.wait(lambda: RUNNING)
+    assert clock.sleeps == [1, 2, 1]
+    assert result.outcome == TIMEOUT
+    assert result.polls == 3
+    assert result.job_status == RUNNING
+
+
+@pytest.mark.parametrize(
+    "status, outcome", [({"status": "failed"}, FAILED), (None, MISSING)]
+)
+def test_wait_stops_at_a_failed_or_missing_job(clock, status, outcome):
+    result = JobWaiter(jitter=0).wait(_statuses(RUNNING, status))
+    assert result.outcome == outcome
+    assert result.polls == 2
+
+
+def test_jitter_spreads_the_intervals(clock):
+    waiter = JobWaiter(initial_delay=10, backoff_factor=1, jitter=0.2)
+    waiter.wait(_statuses(*[RUNNING] * 49, DONE))
+    assert all(8 <= sleep <= 12 for sleep in clock.sleeps)
+    assert len(set(clock.sleeps)) > 1
+
+
+def test_status_changes_are_reported_once(clock):
+    changes = []
+    waiter = JobWaiter(jitter=0, on_status_change=changes.append)
+    waiter.wait(_statuses(RUNNING, RUNNING, DONE))
+    assert changes == [RUNNING, DONE]
+
+
+def test_wait_async_polls_like_wait():
+    statuses = [RUNNING, RUNNING, DONE]
+
+    async def get_status():
+        return statuses.pop(0)
+
+    waiter = JobWaiter(initial_delay=0.001, max_interval=0.01, jitter=0)
+    result = asyncio.run(waiter.wait_async(get_status))
+    assert result.outcome == SUCCESS
+    assert result.polls == 3
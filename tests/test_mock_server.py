@@ -0,0 +1,38 @@
+import pytest
+
+from src.demo.api.api_caller import ApiCaller
+from src.demo.api.errors import PayloadTooLargeError
+from src.demo.api.mock_server import (
+    API_PREFIX,
+    TOKEN_PATH,
+    UPLOAD_PREFIX,
+    MockTimeDetectServer,
+)
+
+
+@pytest.mark.parametrize(
+    "method, path, status_code",
+    [
+        ("POST", TOKEN_PATH, 200),
+        ("PUT", UPLOAD_PREFIX + "job", 413),
+        ("POST", API_PREFIX + "/create_prediction", 413),
+        ("POST", API_PREFIX + "/real_time_prediction", 413),
+    ],
+)
+def test_only_upload_and_prediction_bodies_are_limited(method, path, status_code):
+    headers = {"authorization": "Bearer token"}
+    with MockTimeDetectServer(max_payload_size=10) as server:
+        assert server.handle(method, path, headers, b"x" * 11)[0] == status_code
+
+
+def test_too_large_upload_fails_after_fetching_a_token(registrations_df):
+    with MockTimeDetectServer(max_payload_size=100) as server:
+        api_caller = ApiCaller(
+            "tenant", base_url=server.base_url, token_url=server.token_url
+        )
+        try:
+            with pytest.raises(PayloadTooLargeError):
+                api_caller.upload_data("dataset", registrations_df)
+        finally:
+            api_caller.close()
+        assert server.request_counts[f"PUT {UPLOAD_PREFIX}*"] == 1
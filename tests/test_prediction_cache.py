@@ -0,0 +1,145 @@
+from types import SimpleNamespace
+
+import pytest
+
+import src.demo.api.prediction_cache as prediction_cache
+from src.demo.api.prediction_cache import PredictionCache
+from src.demo.client_simulator.client_simulator import ClientSimulator
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    clock = FakeClock()
+    monkeypatch.setattr(prediction_cache, "time", SimpleNamespace(time=clock.time))
+    return clock
+
+
+def _key(content_hash: str, dataset_id: str = "a"):
+    return dataset_id, "version", content_hash
+
+
+def test_hits_and_misses_are_counted():
+    cache = PredictionCache()
+    assert cache.get(_key("1")) is None
+    cache.put(_key("1"), {"anomalyScore": 1})
+    assert cache.get(_key("1")) == {"anomalyScore": 1}
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = PredictionCache(max_entries=2)
+    cache.put(_key("1"), 1)
+    cache.put(_key("2"), 2)
+    cache.get(_key("1"))
+    cache.put(_key("3"), 3)
+    assert [cache.get(_key(h)) for h in "123"] == [1, None, 3]
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = PredictionCache(ttl=60)
+    cache.put(_key("1"), 1)
+    clock.now += 59
+    assert cache.get(_key("1")) == 1
+    clock.now += 1
+    assert cache.get(_key("1")) is None
+    assert len(cache._entries) == 0
+
+
+def test_invalidate_drops_only_the_dataset():
+    cache = PredictionCache()
+    cache.put(_key("1", "a"), 1)
+    cache.put(_key("1", "b"), 2)
+    cache.invalidate("a")
+    assert cache.get(_key("1", "a")) is None
+    assert cache.get(_key("1", "b")) == 2
+
+
+def test_cache_file_outlives_the_cache(tmp_path, clock):
+    cache_path = str(tmp_path / "cache" / "predictions.db")
+    cache = PredictionCache(cache_path=cache_path, ttl=60)
+    cache.put(_key("1", "a"), {"anomalyScore": 1})
+    cache.put(_key("1", "b"), {"anomalyScore": 2})
+    cache.invalidate("b")
+    cache.close()
+
+    cache = PredictionCache(cache_path=cache_path, ttl=60)
+    try:
+        assert cache.get(_key("1", "a")) == {"anomalyScore": 1}
+        assert cache.get(_key("1", "b")) is None
+        clock.now += 60
+        cache._entries.clear()
+        assert cache.get(_key("1", "a")) is None
+    finally:
+        cache.close()
+
+
+def test_realtime_registrations_are_keyed_by_content(registrations_df):
+    cache = PredictionCache()
+    first, second = registrations_df.to_dict("records")
+    predictions, hashes = cache.get_realtime("a", "version", [first, second])
+    assert predictions == [None, None]
+    cache.put(("a", "version", hashes[0]), {"anomalyScore": 1})
+    # Key order, fields that are not sent and integral floats do not matter
+    same = dict(reversed(list(first.items())), startTime=8.0, extra="x")
+    predictions, _ = cache.get_realtime("a", "version", [same, second])
+    assert predictions == [{"anomalyScore": 1}, None]
+    predictions, _ = cache.get_realtime("a", "other version", [first])
+    assert predictions == [None]
+
+
+def test_batch_key_depends_on_the_registrations_and_employees(registrations_df):
+    cache = PredictionCache()
+    registrations = registrations_df.to_dict("records")
+    _, key = cache.get_batch("a", "version", registrations, ["1"])
+    cache.put(("a", "version", key), ["predictions"])
+    assert cache.get_batch("a", "version", registrations, ["1"]) == (
+        ["predictions"],
+        key,
+    )
+    assert cache.get_batch("a", "version", registrations, ["2"])[0] is None
+    assert cache.get_batch("a", "version", registrations[:1], ["1"])[0] is None
+
+
+def test_model_version_is_looked_up_once_per_ttl(clock):
+    cache = PredictionCache()
+    lookups = []
+
+    def get_data_info():
+        lookups.append(clock.now)
+        return {"models": [len(lookups)]}
+
+    first = cache.model_version("a", get_data_info)
+    assert cache.model_version("a", get_data_info) == first
+    clock.now += prediction_cache.MODEL_VERSION_TTL
+    assert cache.model_version("a", get_data_info) != first
+    assert len(lookups) == 2
+    assert cache.model_version("b", lambda: None) is None
+
+
+def test_cached_realtime_predictions_are_not_requested_again(
+    mock_server, api_caller, registrations_df
+):
+    api_caller.upload_data("dataset", registrations_df)
+    api_caller.start_trainer("dataset")
+    simulator = ClientSimulator(
+        "tenant",
+        "dataset",
+        prediction_cache=PredictionCache(),
+        base_url=mock_server.base_url,
+        token_url=mock_server.token_url,
+    )
+    try:
+        first = simulator.predict_realtime(registrations_df)
+        second = simulator.predict_realtime(registrations_df)
+    finally:
+        simulator.api_caller.close()
+    assert second == first and len(first) == 2
+    assert mock_server.request_counts["POST /td/real_time_prediction"] == 1
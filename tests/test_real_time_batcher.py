@@ -0,0 +1,137 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import pytest
+
+from src.demo.api.errors import ServerError
+from src.demo.api.real_time_batcher import RealTimePredictionBatcher
+
+
+class FakeApiCaller:
+    """
+    Predicts every registration with a score derived from its id, and records the
+    registrations of every request.
+    """
+
+    def __init__(self, error: Exception = None, result_none: bool = False) -> None:
+        self.error = error
+        self.result_none = result_none
+        self.requests: List[List[Dict]] = []
+        self._lock = threading.Lock()
+
+    def get_real_time_predictions(self, dataset_id: str, registrations: List[Dict]):
+        with self._lock:
+            self.requests.append(registrations)
+        if self.error is not None:
+            raise self.error
+        if self.result_none:
+            return None
+        predictions = [
+            {
+                "registrationId": reg["registrationId"],
+                "anomalyScore": float(len(reg["registrationId"])),
+                "datasetId": dataset_id,
+            }
+            for reg in registrations
+        ]
+        return {"results": [{"datasetId": dataset_id, "predictions": predictions}]}
+
+
+def _registrations(caller: int, count: int) -> List[Dict]:
+    return [{"registrationId": f"{caller}-{i}"} for i in range(count)]
+
+
+def test_concurrent_callers_get_their_own_predictions():
+    api_caller = FakeApiCaller()
+    batcher = RealTimePredictionBatcher(api_caller, max_batch_size=25, max_wait_ms=20)
+
+    def predict(caller: int) -> List[Dict]:
+        dataset_id = f"dataset-{caller % 2}"
+        predictions = batcher.predict(
+            dataset_id, _registrations(caller, caller % 4 + 1)
+        )
+        assert all(p["datasetId"] == dataset_id for p in predictions)
+        return [p["registrationId"] for p in predictions]
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        results = list(executor.map(predict, range(40)))
+    batcher.close()
+
+    for caller, ids in enumerate(results):
+        assert ids == [
+            reg["registrationId"] for reg in _registrations(caller, caller % 4 + 1)
+        ]
+    # Calls were coalesced, and no batch is larger than allowed
+    assert len(api_caller.requests) < 40
+    assert all(len(regs) <= 25 for regs in api_caller.requests)
+
+
+def test_full_batch_is_sent_without_waiting():
+    api_caller = FakeApiCaller()
+    batcher = RealTimePredictionBatcher(api_caller, max_batch_size=4, max_wait_ms=60000)
+    futures = [batcher.submit("dataset", _registrations(i, 2)) for i in range(2)]
+    assert [len(f.result(timeout=5)) for f in futures] == [2, 2]
+    batcher.close()
+    assert len(api_caller.requests) == 1
+
+
+def test_oversized_call_is_split():
+    api_caller = FakeApiCaller()
+    batcher = RealTimePredictionBatcher(api_caller, max_batch_size=4, max_wait_ms=60000)
+    small = batcher.submit("dataset", _registrations(0, 1))
+    large = batcher.submit("dataset", _registrations(1, 10))
+    assert [p["registrationId"] for p in large.result(timeout=5)] == [
+        reg["registrationId"] for reg in _registrations(1, 10)
+    ]
+    assert not small.done()
+    batcher.close()
+    assert len(small.result()) == 1
+    assert sorted(len(regs) for regs in api_caller.requests) == [1, 2, 4, 4]
+
+
+@pytest.mark.parametrize("max_batch_size", [1, 7, 10])
+def test_no_batch_exceeds_max_batch_size(max_batch_size):
+    api_caller = FakeApiCaller()
+    batcher = RealTimePredictionBatcher(
+        api_caller, max_batch_size=max_batch_size, max_wait_ms=60000
+    )
+    futures = [
+        batcher.submit("dataset", _registrations(i, count))
+        for i, count in enumerate([6, 6, 3, 12, 1, 9, 2])
+    ]
+    batcher.close()
+    assert [len(f.result()) for f in futures] == [6, 6, 3, 12, 1, 9, 2]
+    assert max(len(regs) for regs in api_caller.requests) <= max_batch_size
+    assert sum(len(regs) for regs in api_caller.requests) == 39
+
+
+def test_split_call_fails_if_a_part_fails():
+    error = ServerError("503", endpoint="real_time_prediction")
+    batcher = RealTimePredictionBatcher(FakeApiCaller(error=error), max_batch_size=4)
+    future = batcher.submit("dataset", _registrations(0, 10))
+    with pytest.raises(ServerError):
+        future.result(timeout=5)
+    batcher.close()
+
+
+def test_errors_are_fanned_out_to_every_caller():
+    error = ServerError("503", endpoint="real_time_prediction")
+    batcher = RealTimePredictionBatcher(FakeApiCaller(error=error), max_wait_ms=10)
+    futures = [batcher.submit("dataset", _registrations(i, 2)) for i in range(3)]
+    for future in futures:
+        with pytest.raises(ServerError):
+            future.result(timeout=5)
+    batcher.close()
+
+    batcher = RealTimePredictionBatcher(FakeApiCaller(result_none=True), max_wait_ms=10)
+    futures = [batcher.submit("dataset", _registrations(i, 2)) for i in range(3)]
+    assert [future.result(timeout=5) for future in futures] == [None] * 3
+    batcher.close()
+
+
+def test_registrations_need_an_id():
+    batcher = RealTimePredictionBatcher(FakeApiCaller())
+    with pytest.raises(ValueError):
+        batcher.submit("dataset", [{"date": "2023-01-02"}])
+    batcher.close()
@@ -0,0 +1,56 @@
+import pytest
+
+from src.registration_batch import RegistrationBatch
+from src.demo.api.serialization import registration_hash
+from src.utils import save_data_to_file, load_df_from_file
+
+
+def test_batch_and_records_hash_the_same(registrations_df):
+    df = registrations_df
+    from_batch = list(RegistrationBatch.from_df(df))
+    from_records = df.to_dict("records")
+    assert [registration_hash(reg) for reg in from_batch] == [
+        registration_hash(reg) for reg in from_records
+    ]
+
+
+def test_hash_depends_on_values(registrations_df):
+    df = registrations_df
+    changed = df.assign(startTime=[8.5, 9])
+    assert registration_hash(df.to_dict("records")[0]) != registration_hash(
+        changed.to_dict("records")[0]
+    )
+
+
+def test_integer_ids_are_converted_to_strings(tmp_path, registrations_df):
+    df = registrations_df.assign(registrationId=[1, 2], employeeId=[1, 2])
+    batch = RegistrationBatch.from_df(df)
+    assert [reg["registrationId"] for reg in batch] == ["1", "2"]
+    assert df["registrationId"].tolist() == [1, 2]
+
+    path = str(tmp_path / "registrations.parquet")
+    save_data_to_file(df, path)
+    assert load_df_from_file(path)["employeeId"].tolist() == ["1", "2"]
+
+
+def test_mismatching_column_raises_value_error(registrations_df):
+    df = registrations_df.assign(registrationId=["1", 2])
+    with pytest.raises(ValueError):
+        RegistrationBatch.from_df(df)
+
+
+@pytest.mark.parametrize("extension", [".parquet", ".arrow", ".json"])
+def test_train_tab_columns_keep_the_registration_details(
+    tmp_path, extension, registrations_df
+):
+    from src.demo import constants
+
+    df = registrations_df.assign(breakDuration=0.5, publicHoliday=False)
+    path = str(tmp_path / f"train{extension}")
+    save_data_to_file(df, path)
+    loaded = load_df_from_file(path, columns=constants.TRAIN_TAB_COLUMNS)
+    assert sorted(loaded.columns) == sorted(df.columns)
+
+    save_data_to_file(df.drop(columns=["numericals"]), path)
+    loaded = load_df_from_file(path, columns=constants.TRAIN_TAB_COLUMNS)
+    assert "numericals" not in loaded.columns
@@ -0,0 +1,226 @@
+import io
+import time
+from types import SimpleNamespace
+from typing import List
+
+import pytest
+import requests
+
+import src.demo.api.resilience as resilience
+from src.demo.api.api_caller import ApiCaller
+from src.demo.api.errors import (
+    BadRequestError,
+    CircuitOpenError,
+    NotFoundError,
+    RateLimitedError,
+    ServerError,
+    TransportError,
+    parse_retry_after,
+)
+from src.demo.api.resilience import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitBreakers,
+    RetryPolicy,
+)
+
+URL = "https://api.example.com/td/status"
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+class FakeSession:
+    """
+    Answers every request with the next of the given status codes, or raises it if
+    it is an exception.
+    """
+
+    def __init__(self, outcomes: List) -> None:
+        self.outcomes = list(outcomes)
+        self.requests: List[str] = []
+
+    def request(self, method, url, stream=False, **kwargs) -> requests.Response:
+        self.requests.append(url)
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        status_code, headers = outcome if isinstance(outcome, tuple) else (outcome, {})
+        response = requests.Response()
+        response.status_code = status_code
+        response.headers.update(headers)
+        response.raw = io.BytesIO(b'{"status": "success"}')
+        response.url = url
+        return response
+
+    def close(self) -> None:
+        pass
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    clock = FakeClock()
+    monkeypatch.setattr(resilience, "time", SimpleNamespace(monotonic=clock.monotonic))
+    return clock
+
+
+@pytest.fixture
+def sleeps(monkeypatch) -> List[float]:
+    sleeps: List[float] = []
+    monkeypatch.setattr(time, "sleep", sleeps.append)
+    return sleeps
+
+
+def _api_caller(outcomes: List, max_retries: int = 3, threshold: int = 100):
+    session = FakeSession(outcomes)
+    api_caller = ApiCaller(
+        "tenant",
+        session=session,
+        retry_policy=RetryPolicy(max_retries, backoff_base=0.5, backoff_max=8),
+        circuit_breakers=CircuitBreakers(threshold, reset_timeout=30),
+    )
+    return api_caller, session
+
+
+def test_503s_are_retried_up_to_the_limit(sleeps):
+    api_caller, session = _api_caller([503] * 4)
+    with pytest.raises(ServerError):
+        api_caller._send("status", "GET", URL)
+    assert len(session.requests) == 4
+    assert len(sleeps) == 3
+
+
+def test_retry_succeeds_after_503s(sleeps):
+    api_caller, session = _api_caller([503, 503, 200])
+    response = api_caller._send("status", "GET", URL)
+    assert response.status_code == 200
+    assert len(session.requests) == 3
+
+
+@pytest.mark.parametrize(
+    "status_code, error_class", [(400, BadRequestError), (404, NotFoundError)]
+)
+def test_4xx_are_not_retried(sleeps, status_code, error_class):
+    api_caller, session = _api_caller([status_code, 200])
+    with pytest.raises(error_class):
+        api_caller._send("status", "GET", URL)
+    assert len(session.requests) == 1
+    assert sleeps == []
+
+
+def test_retry_after_is_honored(sleeps):
+    api_caller, _ = _api_caller([(429, {"Retry-After": "5"}), 200])
+    api_caller._send("status", "GET", URL)
+    assert sleeps[0] >= 5
+
+
+def test_retry_after_is_capped_by_backoff_max():
+    error = RateLimitedError("429", retry_after=60)
+    assert RetryPolicy(backoff_max=8).delay(0, error) == 8
+    assert parse_retry_after("2.5") == 2.5
+    assert parse_retry_after("soon") is None
+
+
+def test_non_idempotent_endpoints_are_only_retried_when_not_acted_on(sleeps):
+    api_caller, session = _api_caller([500, 200])
+    with pytest.raises(ServerError):
+        api_caller._send("create_prediction", "POST", URL)
+    assert len(session.requests) == 1
+
+    api_caller, session = _api_caller([503, (429, {"Retry-After": "1"}), 200])
+    api_caller._send("create_prediction", "POST", URL)
+    assert len(session.requests) == 3
+
+    api_caller, session = _api_caller([requests.ReadTimeout("read timeout"), 200])
+    with pytest.raises(TransportError):
+        api_caller._send("start_trainer", "POST", URL)
+    assert len(session.requests) == 1
+
+    api_caller, session = _api_caller([requests.ConnectTimeout("connect"), 200])
+    api_caller._send("start_trainer", "POST", URL)
+    assert len(session.requests) == 2
+
+
+def test_breaker_opens_after_the_threshold_and_probes_after_the_cool_down(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    for _ in range(3):
+        breaker.before_request()
+        breaker.record_failure(ServerError("503"))
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+
+    clock.now += 30
+    breaker.before_request()
+    assert breaker.state == HALF_OPEN
+    # Only one probe at a time
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+
+    breaker.record_failure(TransportError("connection refused"))
+    assert breaker.state == OPEN
+    clock.now += 29
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+    clock.now += 1
+    breaker.before_request()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    breaker.before_request()
+
+
+def test_client_errors_do_not_count_as_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=2)
+    breaker.record_failure(ServerError("500"))
+    breaker.record_failure(RateLimitedError("429"))
+    breaker.record_failure(ServerError("500"))
+    assert breaker.state == CLOSED
+
+
+def test_open_circuit_stops_the_api_caller(clock, sleeps):
+    api_caller, session = _api_caller([503] * 3 + [200], max_retries=5, threshold=3)
+    with pytest.raises(CircuitOpenError):
+        api_caller._send("status", "GET", URL)
+    assert len(session.requests) == 3
+
+    clock.now += 30
+    assert api_caller._send("status", "GET", URL).status_code == 200
+    assert api_caller.circuit_breakers.states() == {"api.example.com": CLOSED}
+
+
+def test_breakers_are_kept_per_host(clock):
+    breakers = CircuitBreakers(failure_threshold=1)
+    failing = breakers.for_url("https://a.example.com/td/status")
+    assert breakers.for_url("https://a.example.com/td/results") is failing
+    failing.record_failure(ServerError("503"))
+    breakers.for_url("https://b.example.com/td/status").before_request()
+    assert breakers.states() == {"a.example.com": OPEN, "b.example.com": CLOSED}
+    breakers.clear()
+    breakers.for_url("https://a.example.com/td/status").before_request()
+
+
+def test_stream_retries_before_the_body(sleeps):
+    api_caller, session = _api_caller([503, 200])
+    body = b"".join(api_caller._stream("results", "GET", URL))
+    assert body == b'{"status": "success"}'
+    assert len(session.requests) == 2
+
+    api_caller, session = _api_caller([400])
+    with pytest.raises(BadRequestError):
+        list(api_caller._stream("results", "GET", URL))
+
+
+def test_failing_batch_upload_is_only_retried_by_the_retry_policy(sleeps):
+    api_caller, session = _api_caller([503] * 10, max_retries=3)
+    api_caller.token_handler.get_token = lambda: "token"
+    job_ids = api_caller.upload_data_in_batches("dataset", [{"registrationId": "1"}])
+    assert job_ids == [None]
+    assert len(session.requests) == 4
+    assert len(sleeps) == 3
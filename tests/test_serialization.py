@@ -0,0 +1,215 @@
+import gzip
+import json
+import random
+import time
+
+import pytest
+
+import src.demo.api.compression as compression
+from src.demo.api.api_caller import ApiCaller
+from src.demo.api.errors import InvalidResponseError
+from src.demo.api.mock_server import MockTimeDetectServer
+from src.demo.api.serialization import (
+    SpooledBody,
+    iter_array_items,
+    iter_prediction_payload,
+    iter_upload_payload,
+)
+from src.registration_batch import RegistrationBatch
+
+ITEMS = [
+    {"registrationId": "1", "anomalyScore": 12.5, "relatedRegistrationIds": []},
+    {"registrationId": 'quote " and \\ backslash', "text": "line\nbreak\ttab"},
+    {"registrationId": "unicode æøå € \U0001f600", "n": -0.0},
+    {"nested": {"predictions": [1, 2, [3, {"a": None}]], "flag": True}},
+    "a string item with ] and , and [",
+    1234567890123,
+    -1.5e-10,
+    3.25,
+    0,
+    [],
+    {},
+    None,
+    False,
+]
+
+
+def _random_chunks(data: bytes, rng: random.Random):
+    pos = 0
+    while pos < len(data):
+        size = rng.randint(1, 8)
+        yield data[pos : pos + size]
+        pos += size
+
+
+def _documents():
+    yield {"predictions": ITEMS}
+    yield {"jobId": "j", "predictions": []}
+    yield {
+        "results": [
+            {"datasetId": "a", "predictions": ITEMS[:5]},
+            {"datasetId": "b", "predictions": ITEMS[5:]},
+        ]
+    }
+
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("indent", [None, 2])
+def test_random_chunk_splits_parse_like_json_loads(seed, indent):
+    rng = random.Random(seed)
+    for document in _documents():
+        data = json.dumps(document, indent=indent, ensure_ascii=seed % 2 == 0)
+        expected = json.loads(data)
+        if "results" in expected:
+            expected = [
+                item for result in expected["results"] for item in result["predictions"]
+            ]
+        else:
+            expected = expected["predictions"]
+        chunks = _random_chunks(data.encode(), rng)
+        assert list(iter_array_items(chunks, "predictions")) == expected
+
+
+def test_numbers_at_chunk_boundaries():
+    data = b'{"predictions": [12345, 6.75, -8e3]}'
+    for split in range(1, len(data)):
+        chunks = [data[:split], data[split:]]
+        assert list(iter_array_items(chunks, "predictions")) == [12345, 6.75, -8e3]
+
+
+def test_missing_key_yields_nothing():
+    assert list(iter_array_items([b'{"other": [1, 2]}'], "predictions")) == []
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b'{"predictions": [1, 2',
+        b'{"predictions": [{"a": 1}, {"b": ',
+        b'{"predictions": ["unterminated',
+        b'{"predictions": [',
+    ],
+)
+def test_truncated_document_raises(data):
+    with pytest.raises(ValueError):
+        list(iter_array_items([data], "predictions"))
+
+
+@pytest.mark.parametrize(
+    "data",
+    [b'{"predictions": [1, nope]}', b'{"predictions": [{"a" 1}]}'],
+)
+def test_malformed_item_raises(data):
+    with pytest.raises(ValueError):
+        list(iter_array_items([data], "predictions"))
+
+
+def _caller_with_body(chunks) -> ApiCaller:
+    api_caller = ApiCaller("tenant")
+    api_caller._results_headers = lambda job_id: {}
+    api_caller._stream = lambda *args, **kwargs: (chunk for chunk in chunks)
+    return api_caller
+
+
+def test_iter_results_batches_the_streamed_predictions():
+    data = json.dumps({"results": [{"predictions": ITEMS}]}).encode()
+    api_caller = _caller_with_body(list(_random_chunks(data, random.Random(0))))
+    batches = list(api_caller.iter_results("job", batch_size=4))
+    assert [len(batch) for batch in batches] == [4, 4, 4, 1]
+    assert [item for batch in batches for item in batch] == ITEMS
+
+
+def test_iter_results_raises_on_invalid_response():
+    api_caller = _caller_with_body([b'{"results": [{"predictions": [{"a": 1}, '])
+    with pytest.raises(InvalidResponseError):
+        list(api_caller.iter_results("job"))
+
+
+def test_iter_results_matches_get_results():
+    with MockTimeDetectServer() as server:
+        api_caller = ApiCaller(
+            "tenant", base_url=server.base_url, token_url=server.token_url
+        )
+        registrations = [
+            {"registrationId": str(i), "date": "2023-01-02", "employeeId": str(i % 3)}
+            for i in range(50)
+        ]
+        job_id = api_caller.create_predictions("dataset", registrations, ["0", "1"])
+        while api_caller.get_job_status(print_status=False)["status"] != "success":
+            time.sleep(0.01)
+        expected = api_caller.get_results(job_id)["results"][0]["predictions"]
+        batches = list(api_caller.iter_results(job_id, batch_size=7))
+        api_caller.close()
+    assert all(len(batch) <= 7 for batch in batches)
+    assert [item for batch in batches for item in batch] == expected
+
+
+def test_unsupported_compression_is_rejected_up_front(monkeypatch):
+    with pytest.raises(ValueError):
+        ApiCaller("tenant", compression="brotli")
+    monkeypatch.setattr(compression, "zstandard", None)
+    with pytest.raises(ValueError):
+        ApiCaller("tenant", compression="zstd")
+    api_caller = ApiCaller("tenant", compression="gzip")
+    assert api_caller.compression == "gzip"
+    api_caller.close()
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 1000])
+@pytest.mark.parametrize("dataset_ids", [["a"], ["a", "b"]])
+@pytest.mark.parametrize("as_batch", [False, True])
+def test_upload_payload_is_the_json_of_the_accepted_fields(
+    registrations_df, chunk_size, dataset_ids, as_batch
+):
+    records = registrations_df.to_dict("records")
+    registrations = (
+        RegistrationBatch.from_df(registrations_df)
+        if as_batch
+        else [dict(reg, extra="dropped") for reg in records]
+    )
+    body = b"".join(iter_upload_payload(dataset_ids, registrations, chunk_size))
+    payload = json.loads(body)
+    assert [dataset["datasetId"] for dataset in payload["datasets"]] == dataset_ids
+    for dataset in payload["datasets"]:
+        assert [reg["registrationId"] for reg in dataset["registrations"]] == ["1", "2"]
+        assert "extra" not in dataset["registrations"][0]
+        assert dataset["registrations"][0]["numericals"] == [{"name": "n", "value": 2}]
+
+
+@pytest.mark.parametrize("employee_ids", [None, ["1", "2"]])
+def test_prediction_payload_is_valid_json(registrations_df, employee_ids):
+    registrations = registrations_df.to_dict("records")
+    body = b"".join(
+        iter_prediction_payload("a", registrations, employee_ids, chunk_size=1)
+    )
+    (parameters,) = json.loads(body)["parameters"]
+    assert parameters["datasetId"] == "a"
+    assert len(parameters["registrations"]) == 2
+    assert parameters.get("aggregateForEmployeeIds") == employee_ids
+
+
+@pytest.mark.parametrize("max_size, on_disk", [(1024, False), (8, True)])
+def test_spooled_body_spills_to_disk_beyond_max_size(max_size, on_disk):
+    chunks = [b'{"a": ', b"[1, 2, 3]", b"}"]
+    body = SpooledBody(chunks, max_size=max_size)
+    try:
+        assert body._file._rolled == on_disk
+        assert len(body) == body.raw_length == 16
+        assert body.read() == b'{"a": [1, 2, 3]}'
+        body.rewind()
+        assert b"".join(body) == b'{"a": [1, 2, 3]}'
+    finally:
+        body.close()
+
+
+def test_spooled_body_is_compressed_as_it_is_spooled():
+    data = json.dumps({"predictions": ITEMS * 100}).encode()
+    body = SpooledBody(
+        [data[i : i + 100] for i in range(0, len(data), 100)], compression="gzip"
+    )
+    try:
+        assert body.raw_length == len(data)
+        assert len(body) < len(data)
+        assert gzip.decompress(body.read()) == data
+    finally:
+        body.close()
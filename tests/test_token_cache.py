@@ -0,0 +1,87 @@
+import multiprocessing
+import os
+import stat
+import time
+
+import pytest
+
+from src.demo.api import token_cache
+from src.demo.api.token_cache import FileTokenCache
+
+KEY = ("https://connect.example.com/token", "client", "scope")
+
+
+def _mode(path: str) -> int:
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+@pytest.fixture
+def cache(tmp_path) -> FileTokenCache:
+    return FileTokenCache(str(tmp_path / "td" / "tokens.json"))
+
+
+def test_stored_token_is_loaded_until_it_expires(cache):
+    cache.store(KEY, "token", fetched_at=time.time(), expires_in=60)
+    assert cache.load(KEY)["token"] == "token"
+    assert cache.load(("other", "client", "scope")) is None
+    cache.store(KEY, "token", fetched_at=time.time() - 120, expires_in=60)
+    assert cache.load(KEY) is None
+
+
+def test_expired_tokens_are_dropped_on_store(cache):
+    other = ("other", "client", "scope")
+    cache.store(KEY, "old", fetched_at=time.time() - 120, expires_in=60)
+    cache.store(other, "new", fetched_at=time.time(), expires_in=60)
+    assert list(cache._read()) == [" ".join(other)]
+
+
+def test_cache_files_are_only_accessible_by_their_owner(cache):
+    with cache.locked():
+        cache.store(KEY, "token", fetched_at=time.time(), expires_in=60)
+    assert _mode(cache.path) == 0o600
+    assert _mode(cache.lock_path) == 0o600
+    assert _mode(os.path.dirname(cache.path)) == 0o700
+
+
+def test_rewrite_restricts_an_existing_file(cache):
+    os.makedirs(os.path.dirname(cache.path))
+    with open(cache.path, "w") as f:
+        f.write("{}")
+    os.chmod(cache.path, 0o644)
+    cache.store(KEY, "token", fetched_at=time.time(), expires_in=60)
+    assert _mode(cache.path) == 0o600
+    assert not [
+        name for name in os.listdir(os.path.dirname(cache.path)) if "tmp" in name
+    ]
+
+
+def test_unreadable_cache_is_ignored(cache):
+    os.makedirs(os.path.dirname(cache.path))
+    with open(cache.path, "w") as f:
+        f.write("not json")
+    assert cache.load(KEY) is None
+    cache.store(KEY, "token", fetched_at=time.time(), expires_in=60)
+    assert cache.load(KEY)["token"] == "token"
+
+
+def _increment(path: str) -> None:
+    cache = FileTokenCache(path)
+    with cache.locked():
+        entry = cache.load(KEY)
+        count = int(entry["token"]) if entry else 0
+        time.sleep(0.01)
+        cache.store(KEY, str(count + 1), fetched_at=time.time(), expires_in=60)
+
+
+@pytest.mark.skipif(token_cache.fcntl is None, reason="locking needs fcntl")
+def test_lock_serializes_processes(cache):
+    context = multiprocessing.get_context("fork")
+    processes = [
+        context.Process(target=_increment, args=(cache.path,)) for _ in range(8)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert [process.exitcode for process in processes] == [0] * 8
+    assert cache.load(KEY)["token"] == "8"
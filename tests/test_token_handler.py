@@ -0,0 +1,188 @@
+import json
+import threading
+import time
+from types import SimpleNamespace
+from typing import List
+
+import pytest
+import requests
+
+import src.demo.api.token_handler as token_handler
+from src.demo.api.errors import AuthenticationError, ServerError, TransportError
+from src.demo.api.constants import TOKEN_REFRESH_RETRY_INTERVAL
+from src.demo.api.token_handler import TokenHandler, clear_token_cache
+
+EXPIRES_IN = 1000
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def time(self) -> float:
+        return self.now
+
+
+class FakeTokenSession:
+    """
+    Hands out token-1, token-2, ... or fails while fail is set. Every fetch takes
+    delay seconds, so that concurrent callers overlap.
+    """
+
+    def __init__(self, delay: float = 0.0) -> None:
+        self.delay = delay
+        self.fail = False
+        self.status_code = 503
+        self.fetches = 0
+        self._lock = threading.Lock()
+
+    def post(self, url, **kwargs) -> requests.Response:
+        time.sleep(self.delay)
+        with self._lock:
+            self.fetches += 1
+            fetches = self.fetches
+        response = requests.Response()
+        if self.fail:
+            response.status_code = self.status_code
+            response._content = b'{"error": "invalid_client"}'
+            return response
+        response.status_code = 200
+        response._content = json.dumps(
+            {"access_token": f"token-{fetches}", "expires_in": EXPIRES_IN}
+        ).encode()
+        return response
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    clock = FakeClock()
+    monkeypatch.setattr(token_handler, "time", SimpleNamespace(time=clock.time))
+    return clock
+
+
+@pytest.fixture(autouse=True)
+def _clear_token_cache():
+    clear_token_cache()
+    yield
+    clear_token_cache()
+
+
+def _handler(session: FakeTokenSession) -> TokenHandler:
+    return TokenHandler(session=session, token_url="https://connect.example.com/token")
+
+
+def _wait_for_refresh(handler: TokenHandler) -> None:
+    cached = handler._cached_token()
+    with cached.lock:
+        pass
+
+
+def test_concurrent_callers_share_one_fetch():
+    session = FakeTokenSession(delay=0.05)
+    barrier = threading.Barrier(20)
+    tokens: List[str] = []
+
+    def get_token() -> None:
+        barrier.wait()
+        tokens.append(_handler(session).get_token())
+
+    threads = [threading.Thread(target=get_token) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert session.fetches == 1
+    assert tokens == ["token-1"] * 20
+
+
+def test_token_is_refreshed_ahead_of_expiry(clock):
+    session = FakeTokenSession()
+    handler = _handler(session)
+    assert handler.get_token() == "token-1"
+
+    clock.now += EXPIRES_IN * 0.5
+    assert handler.get_token() == "token-1"
+    assert session.fetches == 1
+
+    # Past TOKEN_REFRESH_AHEAD, the old token is returned while a new one is fetched
+    clock.now += EXPIRES_IN * 0.35
+    assert handler.get_token() == "token-1"
+    _wait_for_refresh(handler)
+    assert session.fetches == 2
+    assert handler.get_token() == "token-2"
+
+
+def test_failed_refresh_is_retried_after_an_interval(clock):
+    session = FakeTokenSession()
+    handler = _handler(session)
+    handler.get_token()
+
+    session.fail = True
+    clock.now += EXPIRES_IN * 0.85
+    for _ in range(5):
+        assert handler.get_token() == "token-1"
+        _wait_for_refresh(handler)
+    assert session.fetches == 2
+
+    session.fail = False
+    clock.now += TOKEN_REFRESH_RETRY_INTERVAL
+    handler.get_token()
+    _wait_for_refresh(handler)
+    assert session.fetches == 3
+    assert handler.get_token() == "token-3"
+
+
+def test_expired_token_is_fetched_right_away(clock):
+    session = FakeTokenSession()
+    handler = _handler(session)
+    handler.get_token()
+    clock.now += EXPIRES_IN
+    assert handler.get_token() == "token-2"
+    assert session.fetches == 2
+
+
+@pytest.mark.parametrize(
+    "status_code, error_class",
+    [(400, AuthenticationError), (401, AuthenticationError), (503, ServerError)],
+)
+def test_failed_fetch_raises(status_code, error_class):
+    session = FakeTokenSession()
+    session.fail = True
+    session.status_code = status_code
+    with pytest.raises(error_class):
+        _handler(session).get_token()
+
+
+def test_connection_error_raises_transport_error():
+    class BrokenSession:
+        def post(self, url, **kwargs):
+            raise requests.ConnectionError("connection refused")
+
+    with pytest.raises(TransportError):
+        _handler(BrokenSession()).get_token()
+
+
+def test_api_calls_are_not_sent_without_a_token():
+    from src.demo.api.api_caller import ApiCaller
+
+    session = FakeTokenSession()
+    session.fail = True
+    session.status_code = 401
+    api_caller = ApiCaller("tenant", token_url="https://connect.example.com/token")
+    api_caller.token_handler.session = session
+    with pytest.raises(AuthenticationError):
+        api_caller.get_data_info("dataset")
+
+
+def test_token_in_the_cache_file_is_reused_by_another_process(tmp_path):
+    cache_file = str(tmp_path / "tokens.json")
+    token_url = "https://connect.example.com/token"
+    first = FakeTokenSession()
+    handler = TokenHandler(session=first, token_url=token_url, cache_file=cache_file)
+    assert handler.get_token() == "token-1"
+    # A new process starts without the in-memory tokens
+    clear_token_cache()
+    second = FakeTokenSession()
+    handler = TokenHandler(session=second, token_url=token_url, cache_file=cache_file)
+    assert handler.get_token() == "token-1"
+    assert (first.fetches, second.fetches) == (1, 0)
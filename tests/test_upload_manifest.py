@@ -0,0 +1,93 @@
+import json
+
+from src.demo.api.mock_server import MockTimeDetectServer
+from src.demo.api.upload_manifest import UploadManifest
+from src.demo.client_simulator.client_simulator import ClientSimulator
+
+
+def _ids(delta):
+    return [reg["registrationId"] for reg in delta.registrations]
+
+
+def test_only_new_and_changed_registrations_are_in_the_delta(registrations_df):
+    manifest = UploadManifest()
+    first, second = registrations_df.to_dict("records")
+    delta = manifest.delta("a", [first])
+    assert (_ids(delta), delta.inserted) == (["1"], 1)
+    manifest.commit("a", delta)
+
+    changed = dict(first, endTime=18)
+    delta = manifest.delta("a", [changed, second, first])
+    assert _ids(delta) == ["1", "2"]
+    assert (delta.inserted, delta.changed, delta.skipped) == (1, 1, 1)
+    assert str(delta) == "1 new, 1 changed and 1 unchanged registrations"
+
+
+def test_uncommitted_delta_is_sent_again(registrations_df):
+    manifest = UploadManifest()
+    registrations = registrations_df.to_dict("records")
+    manifest.delta("a", registrations)
+    assert manifest.delta("a", registrations).inserted == 2
+
+
+def test_duplicates_within_one_upload_are_skipped(registrations_df):
+    first = registrations_df.to_dict("records")[0]
+    delta = UploadManifest().delta("a", [first, dict(first)])
+    assert (_ids(delta), delta.skipped) == (["1"], 1)
+
+
+def test_datasets_are_tracked_separately_and_can_be_forgotten(registrations_df):
+    manifest = UploadManifest()
+    registrations = registrations_df.to_dict("records")
+    manifest.commit("a", manifest.delta("a", registrations))
+    assert manifest.delta("b", registrations).inserted == 2
+    manifest.forget("a")
+    assert manifest.delta("a", registrations).inserted == 2
+
+
+def test_manifest_file_is_loaded_again(tmp_path, registrations_df):
+    path = str(tmp_path / "manifests" / "uploads.json")
+    registrations = registrations_df.to_dict("records")
+    manifest = UploadManifest(path)
+    manifest.commit("a", manifest.delta("a", registrations))
+    with open(path) as f:
+        assert set(json.load(f)["a"]) == {"1", "2"}
+    assert UploadManifest(path).delta("a", registrations).skipped == 2
+
+
+def _simulator(server, job_waiter, manifest):
+    return ClientSimulator(
+        "tenant",
+        "dataset",
+        job_waiter=job_waiter,
+        upload_manifest=manifest,
+        base_url=server.base_url,
+        token_url=server.token_url,
+    )
+
+
+def test_unchanged_registrations_are_not_uploaded_again(
+    mock_server, job_waiter, registrations_df
+):
+    simulator = _simulator(mock_server, job_waiter, UploadManifest())
+    try:
+        assert simulator.upload_data(registrations_df)
+        assert simulator.upload_data(registrations_df)
+        assert mock_server.datasets == {("tenant", "dataset"): 2}
+        changed = registrations_df.assign(endTime=[16, 18])
+        assert simulator.upload_data(changed, batch_size=1)
+        assert mock_server.datasets == {("tenant", "dataset"): 3}
+    finally:
+        simulator.api_caller.close()
+
+
+def test_failed_upload_is_not_committed(job_waiter, registrations_df):
+    manifest = UploadManifest()
+    with MockTimeDetectServer(job_failure_rate=1) as server:
+        simulator = _simulator(server, job_waiter, manifest)
+        try:
+            assert not simulator.upload_data(registrations_df)
+        finally:
+            simulator.api_caller.close()
+    delta = manifest.delta("dataset", registrations_df.to_dict("records"))
+    assert delta.inserted == 2